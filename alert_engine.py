@@ -0,0 +1,174 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+from analytics import RollingAnalytics
+
+# Сработавшее правило: контракт, имя правила, ставка, опорное значение
+# (порог / прошлая ставка / z-score / медиана рынка — зависит от правила)
+Trigger = namedtuple("Trigger", "contract rule value ref")
+
+
+class EvalContext:
+    """Массивы, общие для всех правил одного прохода"""
+
+    __slots__ = ("values", "prev", "mean", "std", "count", "spread", "median", "mad")
+
+    def __init__(self, values, prev, mean, std, count, spread=None):
+        self.values = values
+        self.prev = prev
+        self.mean = mean
+        self.std = std
+        self.count = count
+        self.spread = spread
+        self.median = None
+        self.mad = None
+
+    def cross_section(self):
+        # Медиана и MAD считаются один раз и только если их запросило правило
+        if self.median is None:
+            valid = self.values[~np.isnan(self.values)]
+            self.median = float(np.median(valid)) if len(valid) else 0.0
+            self.mad = float(np.median(np.abs(valid - self.median))) if len(valid) else 0.0
+        return self.median, self.mad
+
+
+# ======================
+# RULES
+# ======================
+# Правило — объект с атрибутом name и методом evaluate(ctx) -> (mask, ref),
+# где mask — булев массив по всем контрактам, ref — массив или скаляр.
+
+class ThresholdRule:
+    """Ставка ниже (direction=-1) или выше (direction=1) порога"""
+
+    def __init__(self, name: str, threshold: float, direction: int):
+        self.name = name
+        self.threshold = threshold
+        self.direction = direction
+
+    def evaluate(self, ctx):
+        if self.direction < 0:
+            return ctx.values <= self.threshold, self.threshold
+        return ctx.values >= self.threshold, self.threshold
+
+
+class ChangeRule:
+    """Изменение ставки между двумя соседними снимками не меньше max_change"""
+
+    def __init__(self, name: str, max_change: float):
+        self.name = name
+        self.max_change = max_change
+
+    def evaluate(self, ctx):
+        return np.abs(ctx.values - ctx.prev) >= self.max_change, ctx.prev
+
+
+class ZScoreRule:
+    """Отклонение от среднего по собственной истории контракта, в сигмах"""
+
+    def __init__(self, name: str, z: float, min_count: int = 5, min_std: float = 1e-6):
+        self.name = name
+        self.z = z
+        self.min_count = min_count
+        self.min_std = min_std
+
+    def evaluate(self, ctx):
+        score = (ctx.values - ctx.mean) / np.maximum(ctx.std, self.min_std)
+        return (np.abs(score) >= self.z) & (ctx.count >= self.min_count), score
+
+
+class OutlierRule:
+    """Выброс относительно всего рынка: |ставка - медиана| >= k * MAD"""
+
+    def __init__(self, name: str, k: float, min_mad: float = 1e-6):
+        self.name = name
+        self.k = k
+        self.min_mad = min_mad
+
+    def evaluate(self, ctx):
+        median, mad = ctx.cross_section()
+        return np.abs(ctx.values - median) >= self.k * max(mad, self.min_mad), median
+
+
+class SpreadRule:
+    """Межбиржевой спред ставки (max - min по биржам) не меньше min_spread"""
+
+    def __init__(self, name: str, min_spread: float):
+        self.name = name
+        self.min_spread = min_spread
+
+    def evaluate(self, ctx):
+        if ctx.spread is None:
+            return np.zeros(len(ctx.values), dtype=bool), 0.0
+        return ctx.spread >= self.min_spread, ctx.spread
+
+
+# ======================
+# ENGINE
+# ======================
+
+class AlertEngine:
+    """Пакетная проверка правил по всему рынку за один векторный проход.
+
+    Контракты получают постоянный индекс в плотных массивах; статистика окна
+    для z-score и прошлая ставка берутся из RollingAnalytics (O(1) на точку).
+    """
+
+    def __init__(self, rules, window: int = 20, capacity: int = 1024, analytics: RollingAnalytics = None):
+        self.rules = list(rules)
+        self.analytics = analytics if analytics is not None else RollingAnalytics(window, capacity=capacity)
+        self.window = self.analytics.window
+
+    @property
+    def names(self):
+        return self.analytics.names
+
+    @property
+    def index(self):
+        return self.analytics.index
+
+    def load(self, rates: dict) -> np.ndarray:
+        """Раскладывает снимок в плотный массив по индексам контрактов (NaN — нет данных)"""
+        return self.analytics.load(rates)
+
+    def evaluate(self, values: np.ndarray, update: bool = True, ts: float = None, spread: np.ndarray = None):
+        """Проверяет все правила; возвращает только сработавшие пары (контракт, правило).
+
+        spread — межбиржевой спред по тем же индексам (NaN — контракт на одной бирже).
+        """
+        n = len(values)
+        stats = self.analytics
+        count = np.minimum(stats.count[:n], stats.window).astype(np.float64)
+        ctx = EvalContext(values, stats.last[:n], stats.mean[:n], stats.std[:n], count, spread)
+        masks = np.empty((len(self.rules), n), dtype=bool)
+        refs = []
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for row, rule in enumerate(self.rules):
+                mask, ref = rule.evaluate(ctx)
+                masks[row] = mask
+                refs.append(ref)
+        # Индексы ищем только в строках правил, где что-то сработало
+        triggers = []
+        for row in np.flatnonzero(masks.any(axis=1)).tolist():
+            ref = refs[row]
+            name = self.rules[row].name
+            for i in np.flatnonzero(masks[row]).tolist():
+                triggers.append(Trigger(self.names[i], name, float(values[i]),
+                                        float(ref[i] if isinstance(ref, np.ndarray) else ref)))
+        if update:
+            stats.update(values, ts if ts is not None else time.time())
+        return triggers
+
+    def evaluate_rates(self, rates: dict, update: bool = True, ts: float = None, spreads: dict = None):
+        values = self.load(rates)
+        spread = None
+        if spreads:
+            # Контракты, которых нет в снимке (только на других биржах), не проверяются
+            index = self.index
+            spread = np.full(len(values), np.nan)
+            known = [(index[c], s) for c, s in spreads.items() if c in index]
+            if known:
+                positions, spread_values = zip(*known)
+                spread[list(positions)] = spread_values
+        return self.evaluate(values, update, ts, spread)
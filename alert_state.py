@@ -0,0 +1,81 @@
+import time
+
+# Состояния алерта по ключу (chat_id, pair, rule).
+# ARMED не хранится: отсутствие ключа и есть «взведён».
+ARMED = "armed"
+FIRED = "fired"      # алерт отправлен, условие всё ещё держится
+COOLING = "cooling"  # условие ушло за полосу гистерезиса, ждём окончания cooldown
+
+
+class AlertStateMachine:
+    """Фронтовые алерты: одно сообщение на пересечение порога.
+
+    ARMED -> (условие) -> FIRED, сообщение отправляется
+    FIRED -> (условие снято с запасом, см. is_cleared в process) -> COOLING
+    COOLING -> (условие снова выполнено) -> FIRED без сообщения
+    COOLING -> (прошёл cooldown) -> ARMED, следующее пересечение снова алертит
+    """
+
+    def __init__(self, cooldown: float):
+        self.cooldown = cooldown
+        self.states = {}  # key -> [state, since]
+        self.stats = {"fired": 0, "suppressed": 0, "rearmed": 0}
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def state(self, key) -> str:
+        entry = self.states.get(key)
+        return entry[0] if entry else ARMED
+
+    def process(self, active, is_cleared, now: float = None):
+        """Один цикл.
+
+        active — ключи, условие которых выполнено в этом цикле;
+        is_cleared(key) — ушло ли условие за полосу гистерезиса (полосу и порог
+        чата знает вызывающий код).
+        Возвращает ключи, по которым нужно отправить алерт.
+        """
+        now = time.time() if now is None else now
+        fire = []
+        for key in active:
+            entry = self.states.get(key)
+            if entry is None:
+                self.states[key] = [FIRED, now]
+                self.stats["fired"] += 1
+                fire.append(key)
+            else:
+                if entry[0] == COOLING:
+                    entry[0] = FIRED
+                self.stats["suppressed"] += 1
+
+        # Работа пропорциональна числу активных алертов, а не всех ключей
+        for key, entry in list(self.states.items()):
+            if key in active:
+                continue
+            if entry[0] == FIRED:
+                if is_cleared(key):
+                    entry[0], entry[1] = COOLING, now
+            elif now - entry[1] >= self.cooldown:
+                del self.states[key]
+                self.stats["rearmed"] += 1
+        return fire
+
+    # --- persistence ---
+
+    def to_list(self):
+        return [[*key, state, since] for key, (state, since) in self.states.items()]
+
+    def load_list(self, rows):
+        for *key, state, since in rows or ():
+            self.states[tuple(key)] = [state, since]
+        return self
+
+    def merge_list(self, rows):
+        """Слияние с сохранённым состоянием: по каждому ключу побеждает более позднее since"""
+        for *key, state, since in rows or ():
+            key = tuple(key)
+            entry = self.states.get(key)
+            if entry is None or entry[1] < since:
+                self.states[key] = [state, since]
+        return self
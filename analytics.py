@@ -0,0 +1,216 @@
+from collections import namedtuple
+
+import numpy as np
+from config import ALERT_WINDOW, ANALYTICS_SPANS, TREND_THRESHOLD
+
+# Статистика одного контракта для интерфейса (low/high — минимум и максимум окна,
+# flip_ts — время последней смены знака, flipped=False — смены не было с flip_ts)
+ContractStats = namedtuple("ContractStats", "rate ema mean std slope low high flip_ts flipped count trend")
+
+# Код тренда -> подпись (0 — мало точек)
+TREND_LABELS = ("⏺️", "🔽 Падает", "⏹️ Стабильно", "🔼 Растёт")
+
+
+class RollingAnalytics:
+    """Скользящая статистика ставки по каждому контракту: O(1) времени и памяти на точку.
+
+    Состояние — плотные массивы по индексу контракта (как в AlertEngine):
+    EMA по нескольким периодам, среднее и дисперсия окна (Welford со сдвигом
+    окна), наклон МНК по окну, минимум/максимум окна (префикс текущего блока +
+    суффикс предыдущего, van Herk/Gil-Werman) и время смены знака.
+    Окно — последние window точек самого контракта; раз в окно суммы
+    пересчитываются точно, чтобы не копилась ошибка округления.
+    """
+
+    def __init__(self, window: int = ALERT_WINDOW, spans=ANALYTICS_SPANS, trend_threshold: float = TREND_THRESHOLD,
+                 capacity: int = 1024):
+        self.window = window
+        self.spans = tuple(spans)
+        self.alphas = np.array([2 / (span + 1) for span in self.spans])
+        self.trend_threshold = trend_threshold
+        self.names = []
+        self.index = {}
+        self.version = 0  # растёт с каждой точкой — по нему кэшируются экраны с трендами
+        self._alloc(capacity)
+
+    def _columns(self):
+        # атрибут -> (форма строки, dtype, начальное значение)
+        w = self.window
+        return {
+            "count": ((), np.int64, 0),
+            "last": ((), np.float64, np.nan),
+            "last_ts": ((), np.float64, np.nan),
+            "ema": ((len(self.spans),), np.float64, np.nan),
+            "mean": ((), np.float64, 0.0),
+            "std": ((), np.float64, 0.0),
+            "slope": ((), np.float64, 0.0),
+            "low": ((), np.float64, np.nan),
+            "high": ((), np.float64, np.nan),
+            "flip_ts": ((), np.float64, np.nan),
+            "flipped": ((), bool, False),
+            "trend": ((), np.int8, 0),
+            "_m2": ((), np.float64, 0.0),
+            "_sxy": ((), np.float64, 0.0),
+            "_sign": ((), np.int8, 0),
+            "_hist": ((w,), np.float64, 0.0),
+            "_pmin": ((), np.float64, np.nan),
+            "_pmax": ((), np.float64, np.nan),
+            "_smin": ((w,), np.float64, np.nan),
+            "_smax": ((w,), np.float64, np.nan),
+        }
+
+    def _alloc(self, capacity: int):
+        old = len(self.names)
+        for name, (shape, dtype, fill) in self._columns().items():
+            array = np.full((capacity,) + shape, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)[:old]
+            setattr(self, name, array)
+
+    def _intern(self, contract: str) -> int:
+        idx = self.index.get(contract)
+        if idx is None:
+            idx = len(self.names)
+            if idx >= len(self.count):
+                self._alloc(len(self.count) * 2)
+            self.names.append(contract)
+            self.index[contract] = idx
+        return idx
+
+    def load(self, rates: dict) -> np.ndarray:
+        """Раскладывает снимок в плотный массив по индексам контрактов (NaN — нет данных)"""
+        positions = np.fromiter((self._intern(c) for c in rates), dtype=np.intp, count=len(rates))
+        values = np.full(len(self.names), np.nan)
+        values[positions] = np.fromiter(rates.values(), dtype=np.float64, count=len(rates))
+        return values
+
+    # --- update ---
+
+    def update(self, values: np.ndarray, ts):
+        """Добавляет точку каждому контракту, у которого она есть (NaN — пропуск).
+
+        ts — время снимка (скаляр) или массив времени по контрактам.
+        """
+        rows = np.flatnonzero(~np.isnan(values))
+        if not len(rows):
+            return
+        # Обычно точка есть у всех контрактов — тогда срез (view) вместо выборки по индексам
+        idx = slice(0, len(values)) if len(rows) == len(values) else rows
+        x = values[idx]
+        ts = np.asarray(ts, dtype=np.float64)
+        ts = ts if ts.ndim == 0 else ts[idx]
+        w = self.window
+        count = self.count[idx].copy()
+        k = count.astype(np.float64)  # номер точки контракта — абсцисса для наклона
+        pos = count % w
+        full = count >= w
+        first = count == 0
+        n = np.minimum(count + 1, w).astype(np.float64)
+
+        ema = self.ema[idx]
+        self.ema[idx] = np.where(first[:, None], x[:, None], ema + self.alphas * (x[:, None] - ema))
+
+        # Welford: при полном окне новая точка замещает вытесняемую old
+        old = self._hist[rows, pos]
+        mean = self.mean[idx]
+        delta = np.where(full, x - old, x - mean)
+        new_mean = mean + delta / n
+        self._m2[idx] += delta * (x - new_mean + np.where(full, old - mean, 0.0))
+        self.mean[idx] = new_mean
+        self._sxy[idx] += k * x - np.where(full, (k - w) * old, 0.0)
+        self._hist[rows, pos] = x
+
+        self._pmin[idx] = np.where(pos == 0, x, np.fmin(self._pmin[idx], x))
+        self._pmax[idx] = np.where(pos == 0, x, np.fmax(self._pmax[idx], x))
+        # Окно = начало текущего блока [0, pos] + хвост предыдущего (pos, w)
+        tail = full & (pos < w - 1)
+        nxt = np.minimum(pos + 1, w - 1)
+        self.low[idx] = np.where(tail, np.fmin(self._pmin[idx], self._smin[rows, nxt]), self._pmin[idx])
+        self.high[idx] = np.where(tail, np.fmax(self._pmax[idx], self._smax[rows, nxt]), self._pmax[idx])
+
+        done = pos == w - 1
+        if done.any():
+            # Блок заполнен: суффиксы для следующего блока и точный пересчёт сумм
+            block = rows[done]
+            hist = self._hist[block]
+            self._smin[block] = np.minimum.accumulate(hist[:, ::-1], axis=1)[:, ::-1]
+            self._smax[block] = np.maximum.accumulate(hist[:, ::-1], axis=1)[:, ::-1]
+            block_mean = hist.mean(axis=1)
+            self.mean[block] = block_mean
+            self._m2[block] = ((hist - block_mean[:, None]) ** 2).sum(axis=1)
+            self._sxy[block] = (hist * (k[done, None] - (w - 1) + np.arange(w))).sum(axis=1)
+
+        sign = np.sign(x).astype(np.int8)
+        prev_sign = self._sign[idx]
+        flip = (sign != 0) & (prev_sign != 0) & (sign != prev_sign)
+        self.flip_ts[idx] = np.where(first | flip, ts, self.flip_ts[idx])
+        self.flipped[idx] |= flip
+        self._sign[idx] = np.where(sign != 0, sign, prev_sign)
+
+        self.count[idx] = count + 1
+        self.last[idx] = x
+        self.last_ts[idx] = ts
+        mean = self.mean[idx]
+        self.std[idx] = np.sqrt(np.maximum(self._m2[idx] / n, 0.0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Наклон МНК по точкам k-n+1..k: cov(k, x) / var(k), var — закрытая формула
+            slope = (self._sxy[idx] - (k - (n - 1) / 2) * n * mean) / (n * (n * n - 1) / 12)
+        slope = np.where(n >= 2, slope, 0.0)
+        self.slope[idx] = slope
+        # Тренд — изменение ставки по прямой МНК на всё окно
+        moved = slope * (n - 1)
+        trend = np.where(np.abs(moved) >= self.trend_threshold, np.sign(moved), 0).astype(np.int8) + 2
+        self.trend[idx] = np.where(n >= 3, trend, 0)
+        self.version += 1
+
+    def update_rates(self, rates: dict, ts: float):
+        self.update(self.load(rates), ts)
+
+    def warm(self, store, samples: int = None):
+        """Прогрев после рестарта по HistoryStore: последние samples точек каждого контракта"""
+        samples = samples or max(self.window, 4 * max(self.spans))  # вес отброшенного хвоста EMA < 0.1%
+        contracts = store.contracts()
+        if not contracts:
+            return self
+        values = np.full((len(contracts), samples), np.nan)
+        times = np.full((len(contracts), samples), np.nan)
+        for row, contract in enumerate(contracts):
+            ts, rates = store.last(contract, samples)
+            values[row, samples - len(rates):] = rates
+            times[row, samples - len(ts):] = ts
+        positions = np.fromiter((self._intern(c) for c in contracts), dtype=np.intp, count=len(contracts))
+        dense = np.full(len(self.names), np.nan)
+        dense_ts = np.full(len(self.names), np.nan)
+        for column in range(samples):
+            dense[positions] = values[:, column]
+            dense_ts[positions] = times[:, column]
+            self.update(dense, dense_ts)
+        # Смена знака — по всей сохранённой истории, а не только по точкам прогрева
+        for contract, i in zip(contracts, positions.tolist()):
+            ts, rates = store.range(contract)
+            sign = np.sign(rates)
+            ts, sign = ts[sign != 0], sign[sign != 0]
+            changes = np.flatnonzero(sign[1:] != sign[:-1])
+            if len(changes):
+                self.flip_ts[i] = ts[changes[-1] + 1]
+                self.flipped[i] = True
+            elif len(ts):
+                self.flip_ts[i] = ts[0]
+        return self
+
+    # --- read ---
+
+    def get(self, contract: str):
+        """Готовая статистика контракта; None — точек ещё не было"""
+        i = self.index.get(contract)
+        if i is None or not self.count[i]:
+            return None
+        return ContractStats(
+            float(self.last[i]), tuple(self.ema[i].tolist()), float(self.mean[i]), float(self.std[i]),
+            float(self.slope[i]), float(self.low[i]), float(self.high[i]), float(self.flip_ts[i]),
+            bool(self.flipped[i]), int(self.count[i]), TREND_LABELS[self.trend[i]]
+        )
+
+    def trend_label(self, contract: str) -> str:
+        i = self.index.get(contract)
+        return TREND_LABELS[self.trend[i]] if i is not None else TREND_LABELS[0]
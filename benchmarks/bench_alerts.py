@@ -0,0 +1,66 @@
+"""Время векторной проверки правил AlertEngine по всему рынку."""
+import statistics
+import time
+
+import numpy as np
+
+from alert_engine import AlertEngine, ThresholdRule, ChangeRule, ZScoreRule, OutlierRule
+
+CYCLES = 50
+EXTRA_THRESHOLDS = 20  # «много правил»: дополнительные уровни экстремальных порогов
+
+
+def make_rules():
+    rules = [
+        ThresholdRule("long", -0.001, -1),
+        ThresholdRule("short", 0.001, 1),
+        ChangeRule("change", 0.0005),
+        ZScoreRule("zscore", 4),
+        OutlierRule("outlier", 10),
+    ]
+    for i in range(EXTRA_THRESHOLDS):
+        level = 0.0015 + i * 0.0005
+        rules.append(ThresholdRule(f"above_{i}", level, 1))
+    return rules
+
+
+def python_loop(names, values, rules):
+    """Базовая линия: проверка тех же порогов циклом Python"""
+    hits = []
+    thresholds = [(r.name, r.threshold, r.direction) for r in rules if isinstance(r, ThresholdRule)]
+    for name, fr in zip(names, values):
+        for rule, level, direction in thresholds:
+            if (fr <= level) if direction < 0 else (fr >= level):
+                hits.append((name, rule))
+    return hits
+
+
+def bench(n: int, rng) -> dict:
+    names = [f"C{i}_USDT" for i in range(n)]
+    engine = AlertEngine(make_rules(), window=20)
+    base = rng.normal(0, 0.0003, n)
+    load_us, eval_us, loop_us, triggered = [], [], [], 0
+    for _ in range(CYCLES):
+        rates = dict(zip(names, (base + rng.normal(0, 0.00005, n)).tolist()))
+        started = time.perf_counter()
+        values = engine.load(rates)
+        load_us.append((time.perf_counter() - started) * 1e6)
+        started = time.perf_counter()
+        triggered = len(engine.evaluate(values))
+        eval_us.append((time.perf_counter() - started) * 1e6)
+        started = time.perf_counter()
+        python_loop(names, values.tolist(), engine.rules)
+        loop_us.append((time.perf_counter() - started) * 1e6)
+    return {
+        "contracts": n,
+        "rules": len(engine.rules),
+        "load_us_p50": round(statistics.median(load_us), 1),
+        "evaluate_us_p50": round(statistics.median(eval_us), 1),
+        "python_thresholds_only_us_p50": round(statistics.median(loop_us), 1),
+        "triggered_last_cycle": triggered,
+    }
+
+
+def main():
+    rng = np.random.default_rng(0)
+    return [bench(n, rng) for n in (100, 1000, 10000)]
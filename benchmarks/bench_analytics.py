@@ -0,0 +1,72 @@
+"""RollingAnalytics: обновление по снимку, тренды для страницы /all и прогрев из истории.
+
+Базовая линия — прежний get_trend: срез последних 3 точек из HistoryStore на каждую строку.
+"""
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from analytics import RollingAnalytics
+from history_store import HistoryStore
+from shared import FileChannel
+
+SAMPLES = 200
+ROWS = 500  # строк трендов «на рендер» (25 страниц /all)
+
+
+def history_trend(store, pair: str) -> str:
+    _, rates = store.last(pair, 3)
+    if len(rates) < 3:
+        return "⏺️"
+    if rates[-1] > rates[-2] > rates[-3]:
+        return "🔼 Растёт"
+    elif rates[-1] < rates[-2] < rates[-3]:
+        return "🔽 Падает"
+    else:
+        return "⏹️ Стабильно"
+
+
+def bench(n: int, rng, tmp: str) -> dict:
+    names = [f"C{i}_USDT" for i in range(n)]
+    store = HistoryStore(FileChannel(f"{tmp}/{n}"), capacity=2 * SAMPLES)
+    analytics = RollingAnalytics()
+    base = rng.normal(0, 0.0003, n)
+    update_us = []
+    for t in range(SAMPLES):
+        rates = dict(zip(names, (base + rng.normal(0, 0.00005, n)).tolist()))
+        store.append_snapshot(rates, 1_000_000 + t * 90)
+        values = analytics.load(rates)  # в боте load общий с AlertEngine
+        started = time.perf_counter()
+        analytics.update(values, 1_000_000 + t * 90)
+        update_us.append((time.perf_counter() - started) * 1e6)
+    store.close()
+
+    pairs = names[:ROWS]
+    started = time.perf_counter()
+    for pair in pairs:
+        history_trend(store, pair)
+    history_us = (time.perf_counter() - started) / len(pairs) * 1e6
+    started = time.perf_counter()
+    for pair in pairs:
+        analytics.trend_label(pair)
+    precomputed_us = (time.perf_counter() - started) / len(pairs) * 1e6
+
+    started = time.perf_counter()
+    RollingAnalytics().warm(store)
+    warm_ms = (time.perf_counter() - started) * 1000
+    return {
+        "contracts": n,
+        "update_us_p50": round(statistics.median(update_us), 1),
+        "update_ns_per_contract": round(statistics.median(update_us) * 1000 / n, 1),
+        "trend_history_slice_us_per_row": round(history_us, 2),
+        "trend_precomputed_us_per_row": round(precomputed_us, 2),
+        "warm_from_history_ms": round(warm_ms, 1),
+    }
+
+
+def main():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        return [bench(n, rng, tmp) for n in (100, 1000, 10000)]
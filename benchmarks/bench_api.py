@@ -0,0 +1,52 @@
+"""/api/funding: построение ответа на новый снимок, повтор из кэша и 304 по ETag."""
+import json
+import os
+import tempfile
+import time
+
+REQUESTS = 500
+
+
+def bench(n: int, tmp: str) -> dict:
+    from benchmarks.fake_gateio import synthetic_tickers
+    from data_fetcher import FundingSnapshot
+    from funding_api import FundingAPI, publish_snapshot
+    from shared import FileChannel
+    from ticker_parser import parse_tickers
+    import webapp
+
+    channel = FileChannel(os.path.join(tmp, f"shared-{n}"))
+    table = parse_tickers(json.dumps(synthetic_tickers(n)))
+    snapshot = FundingSnapshot(table.rates(), time.time(), table)
+    started = time.perf_counter()
+    publish_snapshot(snapshot, channel)
+    publish_ms = (time.perf_counter() - started) * 1000
+
+    webapp.funding_api = FundingAPI(channel)
+    client = webapp.app.test_client()
+    url = "/api/funding?sort=abs&limit=50"
+
+    started = time.perf_counter()
+    first = client.get(url)
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get(url)
+    cached_us = (time.perf_counter() - started) / REQUESTS * 1e6
+
+    headers = {"If-None-Match": first.headers["ETag"]}
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        assert client.get(url, headers=headers).status_code == 304
+    not_modified_us = (time.perf_counter() - started) / REQUESTS * 1e6
+
+    return {"contracts": n, "publish_ms": round(publish_ms, 2), "first_request_ms": round(cold_ms, 2),
+            "cached_200_us": round(cached_us, 1), "not_modified_304_us": round(not_modified_us, 1),
+            "body_kb": round(len(first.data) / 1024, 1), "stats": webapp.funding_api.stats}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("SHARED_DIR", os.path.join(tmp, "shared"))
+        return [bench(n, tmp) for n in (500, 5000)]
@@ -0,0 +1,57 @@
+"""Последовательная отправка алертов против MessageDispatcher с дайджестами."""
+import asyncio
+import time
+
+from telegram import Bot
+from telegram.error import TelegramError
+
+from benchmarks.fake_telegram import TOKEN, FakeTelegram
+from dispatcher import MessageDispatcher
+
+CHATS = 40
+ALERTS_PER_CHAT = 5
+
+
+def outbox():
+    return {chat_id: [f"⚠️ alert {i} for {chat_id}" for i in range(ALERTS_PER_CHAT)]
+            for chat_id in range(1, CHATS + 1)}
+
+
+async def run_sequential(base_url: str) -> dict:
+    """Старый путь: await send_message на каждый алерт подряд"""
+    failed = 0
+    async with Bot(TOKEN, base_url=base_url) as bot:
+        started = time.perf_counter()
+        for chat_id, alerts in outbox().items():
+            for alert in alerts:
+                try:
+                    await bot.send_message(chat_id=chat_id, text=alert)
+                except TelegramError:
+                    failed += 1
+        elapsed = time.perf_counter() - started
+    return {"elapsed_s": round(elapsed, 2), "lost_alerts": failed}
+
+
+async def run_dispatcher(base_url: str) -> dict:
+    async with Bot(TOKEN, base_url=base_url) as bot:
+        dispatcher = MessageDispatcher(bot)
+        dispatcher.start()
+        started = time.perf_counter()
+        for chat_id, alerts in outbox().items():
+            dispatcher.send_digest(chat_id, alerts)
+        await dispatcher.stop(timeout=60)
+        elapsed = time.perf_counter() - started
+    metrics = dispatcher.metrics()
+    return {"elapsed_s": round(elapsed, 2), "lost_alerts": (metrics["failed"] + metrics["dropped"]) * ALERTS_PER_CHAT,
+            "messages": metrics["sent"], "retries": metrics["retries"],
+            "latency_avg_s": round(metrics["latency_avg"], 3), "latency_max_s": round(metrics["latency_max"], 3)}
+
+
+def main():
+    results = {}
+    for name, runner in (("sequential", run_sequential), ("dispatcher", run_dispatcher)):
+        with FakeTelegram() as fake:
+            results[name] = asyncio.run(runner(fake.base_url))
+            results[name]["rejected_by_api"] = fake.rejected
+            results[name]["delivered"] = len(fake.delivered)
+    return results
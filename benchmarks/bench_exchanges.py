@@ -0,0 +1,96 @@
+"""Межбиржевые ставки: параллельный опрос с таймаутом, нормализация символов и рейтинг спредов.
+
+Все биржи — локальные заглушки (fake_gateio, fake_venues). Один прогон —
+с медленной биржей (Bybit отвечает дольше VENUE_TIMEOUT): цикл должен
+уложиться в таймаут, а не ждать её.
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.fake_gateio import FakeGateRest, synthetic_tickers
+from benchmarks.fake_venues import FakeVenue, binance_body, bybit_body, okx_body, venue_rates
+
+CONTRACTS = 1000
+OKX_INSTRUMENTS = 20  # у OKX нет запроса на все инструменты — только отслеживаемые
+TIMEOUT = 0.5
+SLOW_LATENCY = 3.0
+CYCLES = 5
+
+
+async def run(gate_url, binance, bybit, okx, tickers) -> dict:
+    os.environ["GATEIO_BASE_URL"] = gate_url
+    import data_fetcher
+    from exchanges import BinanceAdapter, BybitAdapter, GateAdapter, OkxAdapter, SpreadTable, VenueBoard
+
+    instruments = [t["contract"].replace("_", "-") + "-SWAP" for t in tickers[1:OKX_INSTRUMENTS + 1]]
+    adapters = [GateAdapter(), BinanceAdapter(binance.base_url), BybitAdapter(bybit.base_url),
+                OkxAdapter(okx.base_url, instruments)]
+    board = VenueBoard(adapters, timeout=TIMEOUT)
+
+    # Последовательный опрос — базовая линия
+    started = time.perf_counter()
+    for adapter in adapters:
+        await adapter.fetch()
+    sequential_ms = (time.perf_counter() - started) * 1000
+
+    cycles = []
+    for _ in range(CYCLES):
+        started = time.perf_counter()
+        table = await board.refresh()
+        cycles.append((time.perf_counter() - started) * 1000)
+
+    # Медленная биржа: отвечает дольше таймаута и выпадает из цикла
+    bybit.latency = SLOW_LATENCY
+    started = time.perf_counter()
+    slow_table = await board.refresh()
+    slow_ms = (time.perf_counter() - started) * 1000
+    bybit.latency = 0.0
+
+    # Нормализация: первый проход разбирает символы, дальше — поиск в таблице
+    raw = adapters[1].parse(binance_body(binance.rates, {}, {}))
+    cold = BinanceAdapter(binance.base_url)
+    started = time.perf_counter()
+    cold.symbols.normalize(raw)
+    cold_us = (time.perf_counter() - started) * 1e6
+    warm = []
+    for _ in range(20):
+        started = time.perf_counter()
+        cold.symbols.normalize(raw)
+        warm.append((time.perf_counter() - started) * 1e6)
+
+    ranking = []
+    for _ in range(20):
+        started = time.perf_counter()
+        SpreadTable(board.rates).top(20)
+        ranking.append((time.perf_counter() - started) * 1000)
+
+    best = table.top(1)[0]
+    await data_fetcher.close_client()
+    return {
+        "contracts": CONTRACTS,
+        "venues": table.venues,
+        "sequential_fetch_ms": round(sequential_ms, 1),
+        "concurrent_refresh_ms_p50": round(statistics.median(cycles), 1),
+        "slow_venue_latency_s": SLOW_LATENCY,
+        "slow_cycle_ms": round(slow_ms, 1),
+        "slow_cycle_venues": slow_table.venues,
+        "compared_contracts": len(table),
+        "with_all_four": int((table.listed == 4).sum()),
+        "normalize_cold_us": round(cold_us, 1),
+        "normalize_cached_us_p50": round(statistics.median(warm), 1),
+        "spread_table_ms_p50": round(statistics.median(ranking), 2),
+        "top_spread": best._asdict(),
+        "board_stats": board.stats,
+    }
+
+
+def main():
+    tickers = synthetic_tickers(CONTRACTS)
+    with FakeGateRest(tickers) as gate, \
+            FakeVenue(binance_body, venue_rates(tickers, seed=1)) as binance, \
+            FakeVenue(bybit_body, venue_rates(tickers, seed=2)) as bybit, \
+            FakeVenue(okx_body, venue_rates(tickers, seed=3)) as okx:
+        result = asyncio.run(run(gate.base_url, binance, bybit, okx, tickers))
+    return result
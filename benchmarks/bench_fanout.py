@@ -0,0 +1,47 @@
+"""Рассылка по порогам через ChatRegistry при тысячах чатов."""
+import random
+import time
+
+from chat_settings import ChatRegistry, ChatSettings
+
+CONTRACTS = 500
+PAIRS_PER_CHAT = 200
+MOVED_SHARE = 0.5  # доля контрактов, ставка которых изменилась за цикл
+
+
+def bench(chats: int) -> dict:
+    contracts = [f"C{i}_USDT" for i in range(CONTRACTS)]
+    data = {
+        str(chat_id): {
+            "critical_fr_long": -random.choice((5, 10, 20)) * 1e-4,
+            "critical_fr_short": random.choice((5, 10, 20)) * 1e-4,
+            "monitored_pairs": random.sample(contracts, PAIRS_PER_CHAT),
+        }
+        for chat_id in range(chats)
+    }
+    started = time.perf_counter()
+    registry = ChatRegistry.from_dict(data, ChatSettings(True, -0.001, 0.001, []))
+    load_s = time.perf_counter() - started
+
+    previous = {c: random.gauss(0, 0.0005) for c in contracts}
+    rates = {c: v + random.gauss(0, 0.0002) if random.random() < MOVED_SHARE else v for c, v in previous.items()}
+    started = time.perf_counter()
+    hits = sum(1 for _ in registry.match_thresholds(rates, previous))
+    match_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    registry.set_thresholds(0, long=-0.003)
+    click_s = time.perf_counter() - started
+    return {
+        "chats": chats,
+        "subscriptions": chats * PAIRS_PER_CHAT,
+        "load_ms": round(load_s * 1000, 1),
+        "cycle_match_ms": round(match_s * 1000, 1),
+        "notifications": hits,
+        "threshold_click_ms": round(click_s * 1000, 2),
+    }
+
+
+def main():
+    random.seed(0)
+    return [bench(n) for n in (100, 1000, 5000)]
@@ -0,0 +1,58 @@
+"""Разбор ответа /futures/usdt/tickers: json + dict ставок против TickerTable (ticker_parser).
+
+Время (лучшее из REPEAT) и пик памяти (tracemalloc) на синтетическом
+ответе той же формы, что у Gate.io. Вариант stdlib — ticker_parser без orjson.
+"""
+import json
+import time
+import tracemalloc
+
+import ticker_parser
+from benchmarks.fake_gateio import synthetic_tickers
+from ticker_parser import ContractIndex, parse_tickers
+
+REPEAT = 20
+
+
+def baseline(raw: bytes) -> dict:
+    # Прежний путь: response.json() + словарь ставок
+    return {item["contract"]: float(item["funding_rate"]) for item in json.loads(raw)}
+
+
+def table(raw: bytes, index: ContractIndex) -> dict:
+    return parse_tickers(raw, index).rates()
+
+
+def measure(fn, *args) -> dict:
+    fn(*args)  # прогрев (и заполнение индекса контрактов)
+    best = float("inf")
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    result = fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return {"ms": round(best * 1000, 2), "peak_kb": round(peak / 1024)}
+
+
+def bench(n: int) -> dict:
+    raw = json.dumps(synthetic_tickers(n)).encode()
+    assert baseline(raw) == table(raw, ContractIndex())
+
+    report = {"contracts": n, "payload_kb": round(len(raw) / 1024), "baseline": measure(baseline, raw)}
+    orjson = ticker_parser.orjson
+    ticker_parser.orjson = None
+    try:
+        report["stdlib"] = measure(table, raw, ContractIndex())
+    finally:
+        ticker_parser.orjson = orjson
+    if orjson is not None:
+        report["orjson"] = measure(table, raw, ContractIndex())
+    return report
+
+
+def main():
+    return [bench(n) for n in (500, 5000)]
@@ -0,0 +1,91 @@
+"""Сравнение синхронного save_to_gist и PersistenceEngine."""
+import asyncio
+import json
+import random
+import tempfile
+import time
+
+from storage import FileBackend, PersistenceEngine
+
+BACKEND_LATENCY = 0.05  # имитация round trip до api.github.com
+CYCLES = 20
+CLICKS_PER_CYCLE = 5
+PAIRS = [f"P{i}_USDT" for i in range(20)]
+
+
+class SlowBackend(FileBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.writes = 0
+
+    def save(self, blob):
+        time.sleep(BACKEND_LATENCY)
+        self.writes += 1
+        super().save(blob)
+
+
+def make_state():
+    return {
+        "settings": {"alerts_enabled": True, "critical_fr_long": -0.001,
+                     "critical_fr_short": 0.001, "monitored_pairs": PAIRS},
+        "history": {},
+        "daily_stats": {"alerts_count": 0, "max_long": [0, ""], "max_short": [0, ""]},
+    }
+
+
+def mutate(state, pair):
+    rows = state["history"].setdefault(pair, [])
+    rows.append(["12:00", random.uniform(-0.002, 0.002)])
+    if len(rows) > 12:
+        rows.pop(0)
+    return len(rows)
+
+
+async def run_sync(backend):
+    """Старый путь: полная запись с indent=2 прямо в event loop"""
+    state = make_state()
+    blocked = 0.0
+
+    def save():
+        nonlocal blocked
+        started = time.perf_counter()
+        backend.save(json.dumps(state, indent=2, ensure_ascii=False))
+        blocked += time.perf_counter() - started
+
+    for _ in range(CYCLES):
+        for _ in range(CLICKS_PER_CYCLE):
+            state["settings"]["critical_fr_long"] -= 0.0001
+            save()
+        for pair in PAIRS:
+            if mutate(state, pair) % 5 == 0:
+                save()
+        save()
+        await asyncio.sleep(0)
+    return blocked
+
+
+async def run_engine(backend):
+    state = make_state()
+    engine = PersistenceEngine(backend, lambda: state, debounce=0.05)
+    engine.load()
+    engine.start()
+    for _ in range(CYCLES):
+        for _ in range(CLICKS_PER_CYCLE):
+            state["settings"]["critical_fr_long"] -= 0.0001
+            engine.mark_dirty()
+        for pair in PAIRS:
+            mutate(state, pair)
+            engine.mark_dirty()
+        await asyncio.sleep(0.01)
+    await engine.close()
+    return engine.stats["loop_blocked_ms"] / 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, runner in (("sync", run_sync), ("engine", run_engine)):
+            backend = SlowBackend(f"{tmp}/{name}.json")
+            blocked = asyncio.run(runner(backend))
+            results[name] = {"writes": backend.writes, "loop_blocked_ms": round(blocked * 1000, 2)}
+    return results
@@ -0,0 +1,103 @@
+"""Адаптивный опрос: сколько запросов в сутки и насколько свежа ставка к моменту начисления.
+
+Сутки опроса моделируются на виртуальных часах (PollScheduler.next_delay
+с now): начисления каждые 8 ч, как у большинства контрактов Gate.io.
+Базовая линия — прежний фиксированный интервал UPDATE_INTERVAL=90.
+
+Отдельно — circuit breaker: Gate.io недоступен (закрытый порт), а бот и
+пользователи запрашивают снимок непрерывно; считаем реальные запросы.
+"""
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import time
+import types
+
+import numpy as np
+
+DAY = 86400
+SETTLEMENT = 8 * 3600
+FIXED_INTERVAL = 90
+
+
+class Table:
+    """Колонка next_apply — всё, что планировщик читает из снимка"""
+
+    def __init__(self, next_apply):
+        self.next_apply = next_apply
+
+    def __len__(self):
+        return len(self.next_apply)
+
+
+def snapshot_at(now: float, contracts: int = 1000):
+    next_apply = (now // SETTLEMENT + 1) * SETTLEMENT
+    return types.SimpleNamespace(table=Table(np.full(contracts, next_apply, dtype=np.int64)))
+
+
+def simulate(poll_times) -> dict:
+    polls = np.asarray(poll_times)
+    settlements = np.arange((polls[0] // SETTLEMENT + 1) * SETTLEMENT, polls[-1], SETTLEMENT)
+    before, after = [], []
+    for ts in settlements:
+        before.append(ts - polls[polls < ts].max())   # возраст ставки в момент начисления
+        after.append(polls[polls >= ts].min() - ts)   # задержка до новой ставки после него
+    return {
+        "polls_per_day": round(len(polls) * DAY / (polls[-1] - polls[0])),
+        "rate_age_at_settlement_s_avg": round(statistics.mean(before), 1),
+        "rate_age_at_settlement_s_max": round(max(before), 1),
+        "first_poll_after_settlement_s_avg": round(statistics.mean(after), 1),
+    }
+
+
+def bench_schedule() -> dict:
+    from data_fetcher import CircuitBreaker
+    from scheduler import PollScheduler
+
+    poller = PollScheduler(breaker=CircuitBreaker())  # breaker работает по реальным часам — здесь свой
+    start = 1_700_000_123.0
+    adaptive, now = [], start
+    while now < start + 7 * DAY:
+        adaptive.append(now)
+        now += poller.next_delay(snapshot_at(now), now=now)
+    fixed = np.arange(start, start + 7 * DAY, FIXED_INTERVAL)
+    return {
+        "settings": {"min": poller.min_interval, "max": poller.max_interval, "ratio": poller.ratio,
+                     "jitter": poller.jitter},
+        "fixed_90s": simulate(fixed),
+        "adaptive": simulate(adaptive),
+    }
+
+
+async def hammer(seconds: float) -> dict:
+    import data_fetcher
+
+    calls = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        await data_fetcher.get_snapshot(max_age=0)
+        calls += 1
+        await asyncio.sleep(0.05)
+    stats = data_fetcher.cache_stats()
+    await data_fetcher.close_client()
+    return {"calls": calls, "requests_to_gate": stats["misses"], "short_circuits": stats["short_circuits"],
+            "failures_in_a_row": data_fetcher.circuit_breaker().failures}
+
+
+def bench_breaker(seconds: float = 10) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]  # порт свободен — соединение будет отклонено
+    os.environ.update(GATEIO_BASE_URL=f"http://127.0.0.1:{port}", BREAKER_BASE="0.5", BREAKER_MAX_BACKOFF="4")
+    logging.disable(logging.CRITICAL)
+    result = asyncio.run(hammer(seconds))
+    result["outage_s"] = seconds
+    result["without_breaker_requests"] = result["calls"]
+    return result
+
+
+def main():
+    breaker = bench_breaker()
+    return {"schedule_7d": bench_schedule(), "breaker": breaker}
@@ -0,0 +1,45 @@
+"""Сортировка на каждый запрос против RankedView (один argsort на снимок)."""
+import random
+import time
+
+from ranking import RankedView
+
+REQUESTS_PER_SNAPSHOT = 50
+SNAPSHOTS = 20
+PAGE = 20
+
+
+def synthetic_rates(n: int) -> dict:
+    return {f"C{i}_USDT": random.gauss(0, 0.0005) for i in range(n)}
+
+
+def bench(n: int) -> dict:
+    snapshots = [synthetic_rates(n) for _ in range(SNAPSHOTS)]
+
+    started = time.perf_counter()
+    for rates in snapshots:
+        for r in range(REQUESTS_PER_SNAPSHOT):
+            sorted(rates.items(), key=lambda x: abs(x[1]), reverse=True)[:PAGE]
+    sort_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    previous = None
+    for rates in snapshots:
+        view = RankedView(rates, previous=previous)
+        for r in range(REQUESTS_PER_SNAPSHOT):
+            view.page("abs", (r % 3) * PAGE, PAGE)
+        previous = rates
+    view_s = time.perf_counter() - started
+
+    requests_total = SNAPSHOTS * REQUESTS_PER_SNAPSHOT
+    return {
+        "contracts": n,
+        "sort_per_request_us": round(sort_s / requests_total * 1e6, 1),
+        "ranked_view_us": round(view_s / requests_total * 1e6, 1),
+        "speedup": round(sort_s / view_s, 1),
+    }
+
+
+def main():
+    random.seed(0)
+    return [bench(n) for n in (500, 5000)]
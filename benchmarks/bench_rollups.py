@@ -0,0 +1,54 @@
+"""Суточные сводки: обновление по снимку, размер дневного файла и слияние 7/30 дней."""
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+SAMPLES = 960  # точек за сутки при UPDATE_INTERVAL=90
+
+
+def bench(n: int, rng, tmp: str) -> dict:
+    from rollups import Rollup, RollupStore, period_bounds
+    from shared import FileChannel
+
+    names = [f"C{i}_USDT" for i in range(n)]
+    base = rng.normal(0, 0.0003, n)
+    store = RollupStore(FileChannel(os.path.join(tmp, str(n))))
+    start, end = period_bounds(time.time())
+    day = Rollup(start, end)
+    update_us = []
+    for t in range(SAMPLES):
+        rates = dict(zip(names, (base + rng.normal(0, 0.00005, n)).tolist()))
+        started = time.perf_counter()
+        day.update(rates, start + t * 90)
+        update_us.append((time.perf_counter() - started) * 1e6)
+
+    # 30 одинаковых по объёму дней в канале
+    for i in range(30):
+        day.start, day.end = start - (i + 1) * 86400, end - (i + 1) * 86400
+        store._write(store._day_name(day), day)
+    size_kb = store.channel.size(store._day_name(day)) / 1024
+
+    merge_ms = {}
+    for days in (7, 30):
+        started = time.perf_counter()
+        summary = store.summary(days)
+        summary.rows()
+        merge_ms[days] = round((time.perf_counter() - started) * 1000, 1)
+    return {
+        "contracts": n,
+        "update_us_p50": round(statistics.median(update_us), 1),
+        "state_kb_per_contract": round(sum(a.nbytes for a in vars(day).values() if isinstance(a, np.ndarray))
+                                       / len(day.count) / 1024, 2),
+        "day_file_kb": round(size_kb, 1),
+        "summary_7d_ms": merge_ms[7],
+        "summary_30d_ms": merge_ms[30],
+    }
+
+
+def main():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        return [bench(n, rng, tmp) for n in (100, 1000)]
@@ -0,0 +1,172 @@
+"""SSE /api/stream под gunicorn -k gevent: тысячи простаивающих клиентов.
+
+Публикует снимки как воркер (меняется небольшая часть ставок), держит
+CLIENTS подключений и замеряет задержку доставки события всем клиентам,
+размер delta против полного снимка, возобновление по Last-Event-ID и RSS
+процесса gunicorn.
+"""
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+CLIENTS = 2000
+CONTRACTS = 1000
+CHANGED = 50    # ставок меняется между снимками
+EVENTS = 10
+INTERVAL = 1.0  # между снимками, с
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker_pids(master: int):
+    try:
+        with open(f"/proc/{master}/task/{master}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+
+
+class Client:
+    """Минимальный SSE-клиент на asyncio: запоминает время прихода каждого id"""
+
+    def __init__(self, port: int, last_event_id: str = None):
+        self.port = port
+        self.last_event_id = last_event_id
+        self.received = {}  # id -> (время, тип, байт)
+        self.writer = None
+
+    async def connect(self):
+        reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        headers = f"Last-Event-ID: {self.last_event_id}\r\n" if self.last_event_id else ""
+        self.writer.write(f"GET /api/stream HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n{headers}\r\n".encode())
+        await self.writer.drain()
+        return asyncio.create_task(self._read(reader))
+
+    async def _read(self, reader):
+        eid = kind = None
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"id: "):
+                eid = int(line[4:])
+            elif line.startswith(b"event: "):
+                kind = line[7:].strip().decode()
+            elif line.startswith(b"data: ") and eid is not None:
+                self.received[eid] = (time.time(), kind, len(line))
+                eid = kind = None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def run(port: int, publish, master: int) -> dict:
+    base_rss = sum(rss_mb(pid) for pid in worker_pids(master))
+    clients = [Client(port) for _ in range(CLIENTS)]
+    tasks = []
+    for i in range(0, CLIENTS, 200):
+        tasks += await asyncio.gather(*(c.connect() for c in clients[i:i + 200]))
+    await asyncio.sleep(2)
+    idle_rss = sum(rss_mb(pid) for pid in worker_pids(master))
+
+    published = {}
+    for _ in range(EVENTS):
+        eid, at = publish()
+        published[eid] = at
+        await asyncio.sleep(INTERVAL)
+
+    # Переподключение с Last-Event-ID третьего события: должен прийти delta, не снимок
+    resume_from = sorted(published)[2]
+    late = Client(port, str(resume_from))
+    tasks.append(await late.connect())
+    await asyncio.sleep(1.5)
+
+    latencies, delivered, sizes = [], 0, {"delta": [], "snapshot": []}
+    for client in clients:
+        for eid, (received_at, kind, size) in client.received.items():
+            sizes[kind].append(size)
+            if eid in published:
+                latencies.append(received_at - published[eid])
+                delivered += 1
+    for client in clients + [late]:
+        client.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "clients": CLIENTS, "contracts": CONTRACTS, "changed_per_event": CHANGED,
+        "events_published": EVENTS, "events_delivered": delivered,
+        "delivery_ms_p50": round(float(np.percentile(ms, 50)), 1) if len(ms) else None,
+        "delivery_ms_p99": round(float(np.percentile(ms, 99)), 1) if len(ms) else None,
+        "delta_bytes": int(np.median(sizes["delta"])) if sizes["delta"] else None,
+        "snapshot_bytes": int(np.median(sizes["snapshot"])) if sizes["snapshot"] else None,
+        "resume": sorted({kind for _, kind, _ in late.received.values()}),
+        "worker_rss_mb_before": round(base_rss, 1),
+        "worker_rss_mb_connected": round(idle_rss, 1),
+        "worker_rss_kb_per_client": round((idle_rss - base_rss) * 1024 / CLIENTS, 1),
+    }
+
+
+def main():
+    from benchmarks.fake_gateio import synthetic_tickers
+    from data_fetcher import FundingSnapshot
+    from funding_api import publish_snapshot
+    from shared import FileChannel
+    from ticker_parser import parse_tickers
+
+    rng = random.Random(0)
+    table = parse_tickers(json.dumps(synthetic_tickers(CONTRACTS)))
+    rates = table.rates()
+    contracts = list(rates)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, SHARED_DIR=os.path.join(tmp, "shared"),
+                   SSE_POLL_INTERVAL="0.1", SSE_MAX_CLIENTS=str(CLIENTS + 10))
+        os.environ.update(env)
+
+        def publish():
+            for contract in rng.sample(contracts, CHANGED):
+                rates[contract] += rng.gauss(0, 0.0005)
+            snapshot = FundingSnapshot(dict(rates), time.time(), table)
+            publish_snapshot(snapshot, FileChannel(env["SHARED_DIR"]))
+            return int(snapshot.fetched_at * 1000), snapshot.fetched_at
+
+        publish()
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--worker-class", "gevent", "--worker-connections", str(CLIENTS + 100),
+             "--workers", "1", "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "webapp:app"],
+            env=env)
+        try:
+            time.sleep(3)
+            # Первый запрос грузит приложение в процесс воркера — база для RSS
+            socket.create_connection(("127.0.0.1", port)).sendall(b"GET /health HTTP/1.0\r\n\r\n")
+            time.sleep(1)
+            result = asyncio.run(run(port, publish, server.pid))
+        finally:
+            server.terminate()
+            server.wait()
+    return result
@@ -0,0 +1,123 @@
+"""Холодный старт бота: время импорта bot.py и время до первого алерта.
+
+Заглушки Gate.io, GitHub Gist (с задержкой round trip) и Telegram Bot API;
+история за сутки по всем контрактам лежит на диске, настройки чата — в gist.
+Каждый сценарий — отдельный процесс, как при рестарте dyno:
+
+  no_local_snapshot — локальной копии состояния нет (новый dyno)
+  local_snapshot    — есть локальная копия, gist сверяется в фоне
+
+time_to_first_alert — от запуска процесса до постановки первого алерта в очередь.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import fake_gist
+from benchmarks.fake_gateio import FakeGateRest, synthetic_tickers
+from benchmarks.fake_gist import FakeGist
+from benchmarks.fake_telegram import TOKEN, FakeTelegram
+
+CHAT_ID = 7295147132
+SCENARIOS = ("no_local_snapshot", "local_snapshot")
+CHILD = "from benchmarks.bench_startup import child; child()"
+
+
+async def first_alert(bot, telegram_url: str) -> float:
+    from telegram.ext import Application
+
+    alerted = asyncio.get_running_loop().create_future()
+    send_digest = bot.dispatcher.send_digest
+
+    def record(chat_id, alerts):
+        if not alerted.done():
+            alerted.set_result(time.time())
+        send_digest(chat_id, alerts)
+
+    bot.dispatcher.send_digest = record
+    application = Application.builder().token(TOKEN).base_url(telegram_url).build()
+    await application.initialize()
+    await bot.post_init(application)
+    await application.start()
+    try:
+        return await asyncio.wait_for(alerted, 60)
+    finally:
+        await application.stop()
+        await bot.post_shutdown(application)
+        await application.shutdown()
+
+
+def child():
+    spawned_at = float(os.environ["BENCH_SPAWNED_AT"])
+    started = time.time()
+    import bot
+    imported = time.time()
+    bot.logging.getLogger().setLevel("WARNING")
+    alerted = asyncio.run(first_alert(bot, os.environ["BENCH_TELEGRAM_URL"]))
+    print(json.dumps({
+        "interpreter_start_ms": round((started - spawned_at) * 1000, 1),
+        "import_bot_ms": round((imported - started) * 1000, 1),
+        "time_to_first_alert_ms": round((alerted - spawned_at) * 1000, 1),
+    }))
+
+
+def write_history(directory: str, tickers, samples: int):
+    from history_store import HistoryStore
+    from shared import FileChannel
+
+    store = HistoryStore(FileChannel(directory)).load()
+    rates = {item["contract"]: float(item["funding_rate"]) for item in tickers}
+    now = int(time.time())
+    for t in range(samples):
+        store.append_snapshot(rates, now - (samples - t) * 90)
+    store.close()
+
+
+def main(contracts: int = 1000, samples: int = 960, gist_latency: float = 0.5):
+    """samples=960 — сутки истории при UPDATE_INTERVAL=90"""
+    from chat_settings import ChatSettings
+    from storage import GIST_FILENAME
+
+    tickers = synthetic_tickers(contracts)
+    # Чат следит за парами с высокой ставкой — первый же цикл даёт алерт, если настройки загружены
+    hot = [item["contract"] for item in tickers if abs(float(item["funding_rate"])) >= 0.001][:10]
+    state = {"chats": {str(CHAT_ID): ChatSettings(True, -0.001, 0.001, hot).to_dict()}, "alert_state": []}
+    results = {}
+    with FakeGateRest(tickers) as gate, FakeGist(gist_latency) as gist, FakeTelegram() as telegram, \
+            tempfile.TemporaryDirectory() as tmp:
+        write_history(os.path.join(tmp, "shared", "history"), tickers, samples)
+        for scenario in SCENARIOS:
+            gist.files = {GIST_FILENAME: json.dumps(state)}  # прошлый прогон сохранил своё состояние алертов
+            cache_path = os.path.join(tmp, f"{scenario}.json")
+            if scenario == "local_snapshot":
+                with open(cache_path, "w") as f:
+                    json.dump({"synced": True, "data": state}, f)
+            env = dict(os.environ, **{
+                "GATEIO_BASE_URL": gate.base_url,
+                "STORAGE_BACKEND": "gist",
+                "GITHUB_TOKEN": fake_gist.TOKEN,
+                "GITHUB_GIST_ID": fake_gist.GIST_ID,
+                "GITHUB_API_URL": gist.base_url,
+                "STATE_CACHE_PATH": cache_path,
+                "SHARED_DIR": os.path.join(tmp, "shared"),
+                "ALERT_CHAT_ID": str(CHAT_ID),
+                "MONITORED_PAIRS": tickers[0]["contract"],
+                "BENCH_TELEGRAM_URL": telegram.base_url,
+                "BENCH_SPAWNED_AT": repr(time.time()),
+            })
+            output = subprocess.run([sys.executable, "-c", CHILD], env=env,
+                                    capture_output=True, text=True, timeout=120)
+            if output.returncode:
+                results[scenario] = {"error": output.stderr.strip().splitlines()[-1:]}
+                continue
+            results[scenario] = json.loads(output.stdout.strip().splitlines()[-1])
+    return {
+        "contracts": contracts,
+        "history_samples": samples,
+        "gist_latency_s": gist_latency,
+        **results,
+    }
@@ -0,0 +1,57 @@
+"""Задержка «кадр WebSocket -> снимок в кэше» в потоковом режиме и проверка переподключения."""
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.fake_gateio import FakeGateRest, FakeGateWs, synthetic_tickers, update_frames
+
+CONTRACTS = 500
+FRAMES = 300
+APPLY_INTERVAL = 0.25
+
+
+async def run(tickers):
+    import data_fetcher
+    from streaming import TickerStream
+
+    frames = list(update_frames(tickers, FRAMES))
+    # Задержка кадра = время первой публикации снимка после его отправки
+    seen = {}
+    latencies = []
+
+    async with FakeGateWs(frames, interval=0.005, drop_after=FRAMES // 2) as ws:
+        def on_update(snapshot):
+            now = time.perf_counter()
+            for i, sent in list(ws.sent_at.items()):
+                if i not in seen:
+                    seen[i] = True
+                    latencies.append(now - sent)
+
+        stream = TickerStream(on_update=on_update, url=ws.url, apply_interval=APPLY_INTERVAL,
+                              stale_timeout=5, max_backoff=1)
+        stream.start()
+        deadline = time.monotonic() + 30
+        while len(ws.sent_at) < FRAMES and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(APPLY_INTERVAL * 2)
+        await stream.stop()
+        await data_fetcher.close_client()
+    return stream.stats, ws.connections, latencies
+
+
+def main():
+    tickers = synthetic_tickers(CONTRACTS)
+    with FakeGateRest(tickers) as rest:
+        os.environ["GATEIO_BASE_URL"] = rest.base_url
+        stats, connections, latencies = asyncio.run(run(tickers))
+        rest_requests = rest.requests
+    return {
+        "frames_sent": FRAMES,
+        "ws_connections": connections,
+        "rest_resyncs": rest_requests,
+        "stream_stats": stats,
+        "publish_latency_ms_p50": round(statistics.median(latencies) * 1000, 1),
+        "publish_latency_ms_max": round(max(latencies) * 1000, 1),
+        "polling_latency_ms_avg": 90 * 1000 / 2,
+    }
@@ -0,0 +1,115 @@
+"""Экран настроек при конкурентных пользователях: кэш экранов, пропуск пустых правок, debounce ➕/➖.
+
+Пользователи открывают настройки и жмут ➕/➖ сериями (CLICK_GAP между
+нажатиями, как быстрый палец), потом снова «Назад» — экран не изменился.
+Заглушка Telegram считает editMessageText. Режимы:
+
+  cache_off — ViewCache(size=0), MessageViews(delay=0): экран рисуется
+              на каждое нажатие, каждое ➕/➖ — своя правка
+  default   — VIEW_CACHE_SIZE и EDIT_DEBOUNCE из config.py
+
+Отдельно — стоимость отрисовки экрана настроек против попадания в кэш.
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fake_telegram import TOKEN, FakeTelegram
+from benchmarks.suite import callback_update
+
+USERS = 50
+BURSTS = 3
+CLICKS_PER_BURST = 6
+CLICK_GAP = 0.08
+STEPS = ("long_inc", "long_dec", "short_inc", "short_dec")
+
+
+async def user(bot, tg_bot, user_id: int, latencies: list):
+    from telegram import Update
+
+    n = 0
+
+    async def click(data: str):
+        nonlocal n
+        n += 1
+        update = Update.de_json(callback_update(user_id, data, n), tg_bot)
+        started = time.perf_counter()
+        await bot.button_handler(update, None)
+        latencies.append(time.perf_counter() - started)
+
+    for burst in range(BURSTS):
+        await click("back_to_settings")
+        for i in range(CLICKS_PER_BURST):
+            await click(STEPS[(burst + i // 3) % len(STEPS)])
+            await asyncio.sleep(CLICK_GAP)
+        await asyncio.sleep(bot.message_views.delay * 1.5)
+        await click("back_to_settings")  # серия уже показана — правка не нужна
+
+
+async def run_mode(bot, telegram, first_user: int) -> dict:
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+
+    latencies = []
+    edits_before = len(telegram.edits)
+    async with Bot(TOKEN, base_url=telegram.base_url, request=HTTPXRequest(connection_pool_size=256)) as tg_bot:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(bot, tg_bot, first_user + u, latencies) for u in range(USERS)))
+        await bot.message_views.flush()
+        wall = time.perf_counter() - started
+    ms = np.asarray(latencies) * 1000
+    return {
+        "clicks": len(latencies),
+        "click_p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "click_p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "wall_s": round(wall, 2),
+        "edit_requests": len(telegram.edits) - edits_before,
+        "edits_skipped": bot.message_views.stats["skipped"],
+        "view_cache": dict(bot.view_cache.stats),
+    }
+
+
+def bench_render(bot) -> dict:
+    from views import ViewCache
+
+    chat_id = 1
+    bot.registry.ensure(chat_id)
+    settings = bot.registry.get(chat_id)
+    cold, cached = [], []
+    cache = ViewCache()
+    for _ in range(200):
+        started = time.perf_counter()
+        bot.render_settings(settings)
+        cold.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        cache.get(("settings", bot.registry.version(chat_id)), lambda: bot.render_settings(settings))
+        cached.append(time.perf_counter() - started)
+    return {"render_us_p50": round(statistics.median(cold) * 1e6, 1),
+            "cached_us_p50": round(statistics.median(cached) * 1e6, 2)}
+
+
+def main():
+    with FakeTelegram() as telegram, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "STORAGE_BACKEND": "file",
+            "STORAGE_PATH": os.path.join(tmp, "data.json"),
+            "SHARED_DIR": os.path.join(tmp, "shared"),
+        })
+        import bot
+        from views import MessageViews, ViewCache
+
+        bot.logging.getLogger().setLevel("WARNING")
+        results = {"users": USERS, "clicks_per_burst": CLICKS_PER_BURST, "click_gap_s": CLICK_GAP,
+                   "telegram_latency_s": telegram.latency}
+        for mode, first_user in (("cache_off", 10_000), ("default", 20_000)):
+            if mode == "cache_off":
+                bot.view_cache, bot.message_views = ViewCache(size=0), MessageViews(delay=0)
+            else:
+                bot.view_cache, bot.message_views = ViewCache(), MessageViews()
+            results[mode] = asyncio.run(run_mode(bot, telegram, first_user))
+        results["settings_screen"] = bench_render(bot)
+    return results
@@ -0,0 +1,174 @@
+"""Локальные заглушки Gate.io: REST /futures/usdt/tickers (и /contracts — интервалы фандинга)
+и WebSocket futures.tickers.
+
+WebSocket-сервер проигрывает записанные (или синтетические) кадры update
+с заданным интервалом и может разрывать соединение, чтобы проверить
+переподключение и REST-ресинхронизацию.
+
+Запись кадров с боевого канала (для tests/fixtures):
+    python -m benchmarks.fake_gateio --record frames.jsonl --contracts BTC_USDT,ETH_USDT --count 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import websockets
+
+
+def synthetic_tickers(n: int, volatility: float = 0.0005, seed: int = 0):
+    rng = random.Random(seed)
+    now = int(time.time())
+    next_apply = now - now % 28800 + 28800
+    return [{
+        "contract": f"C{i}_USDT",
+        "last": f"{rng.uniform(0.01, 50000):.6f}",
+        "mark_price": f"{rng.uniform(0.01, 50000):.6f}",
+        "index_price": f"{rng.uniform(0.01, 50000):.6f}",
+        "funding_rate": f"{rng.gauss(0, volatility):.6f}",
+        "funding_rate_indicative": f"{rng.gauss(0, volatility):.6f}",
+        "funding_next_apply": next_apply,
+        "volume_24h": str(rng.randint(1000, 10**7)),
+        "volume_24h_quote": str(rng.randint(1000, 10**9)),
+        "volume_24h_settle": str(rng.randint(1000, 10**9)),
+        "change_percentage": f"{rng.uniform(-10, 10):.2f}",
+        "total_size": str(rng.randint(1000, 10**7)),
+        "high_24h": "0", "low_24h": "0", "lowest_ask": "0", "highest_bid": "0",
+        "quanto_base_rate": "", "contract_type": "", "volume_24h_base": "0",
+    } for i in range(n)]
+
+
+def update_frames(tickers, count: int, per_frame: int = 5, volatility: float = 0.0005, seed: int = 1):
+    rng = random.Random(seed)
+    for _ in range(count):
+        result = []
+        for item in rng.sample(tickers, min(per_frame, len(tickers))):
+            item = dict(item, funding_rate=f"{rng.gauss(0, volatility):.6f}")
+            result.append(item)
+        yield {"time": int(time.time()), "channel": "futures.tickers", "event": "update", "result": result}
+
+
+def load_frames(path: str):
+    """Кадры из JSONL-файла (по одному JSON-сообщению канала на строку)"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def record_frames(path: str, contracts, count: int, url: str = "wss://fx-ws.gateio.ws/v4/ws/usdt"):
+    """Записывает count кадров futures.tickers как есть, включая подтверждение подписки"""
+    from streaming import subscribe_messages
+
+    async with websockets.connect(url) as ws:
+        for message in subscribe_messages(contracts):
+            await ws.send(message)
+        with open(path, "w") as f:
+            for _ in range(count):
+                f.write((await ws.recv()).strip() + "\n")
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128  # пачка одновременных подключений без SYN-повторов
+    daemon_threads = True
+
+
+class FakeGateRest:
+    def __init__(self, tickers, latency: float = 0.0):
+        self.tickers = tickers
+        self.latency = latency
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests += 1
+                time.sleep(fake.latency)
+                body = fake.contracts_body if self.path.endswith("/futures/usdt/contracts") else fake.body
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+
+    @property
+    def tickers(self):
+        return self._tickers
+
+    @tickers.setter
+    def tickers(self, tickers):
+        # Тело ответа кодируется один раз на снимок, а не на каждый запрос
+        self._tickers = tickers
+        self.body = json.dumps(tickers).encode()
+        self.contracts_body = json.dumps([{"name": item["contract"], "funding_interval": 28800}
+                                          for item in tickers]).encode()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/api/v4"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeGateWs:
+    """Проигрывает кадры каждому подписчику; drop_after — разорвать после N кадров"""
+
+    def __init__(self, frames, interval: float = 0.01, drop_after: int = None):
+        self.frames = list(frames)
+        self.interval = interval
+        self.drop_after = drop_after
+        self.connections = 0
+        self.sent_at = {}  # номер кадра -> время отправки
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        port = self._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}"
+
+    async def _handler(self, ws, path=None):
+        self.connections += 1
+        await ws.recv()  # первый subscribe
+        start = len(self.sent_at)
+        for i, frame in enumerate(self.frames[start:], start):
+            if self.drop_after and self.connections == 1 and i == self.drop_after:
+                await ws.close()
+                return
+            frame = dict(frame, seq=i)
+            self.sent_at[i] = time.perf_counter()
+            await ws.send(json.dumps(frame))
+            await asyncio.sleep(self.interval)
+        await ws.wait_closed()  # держим соединение открытым
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handler, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запись кадров futures.tickers Gate.io")
+    parser.add_argument("--record", required=True, help="JSONL-файл для кадров")
+    parser.add_argument("--contracts", default="BTC_USDT,ETH_USDT,SOL_USDT")
+    parser.add_argument("--count", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(record_frames(args.record, args.contracts.split(","), args.count))
+
+
+if __name__ == "__main__":
+    main()
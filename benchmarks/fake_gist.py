@@ -0,0 +1,70 @@
+"""Локальная заглушка GitHub Gist API: GET и PATCH /gists/<id>.
+
+Хранит содержимое файлов в памяти; latency имитирует round trip
+до api.github.com, fail_every — каждый N-й PATCH отвечает 502.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GIST_ID = "bench"
+TOKEN = "bench-token"
+
+
+class FakeGist:
+    def __init__(self, latency: float = 0.05, fail_every: int = 0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.files = {}
+        self.saves = 0
+        self.failures = 0
+        self.bytes_written = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(fake.latency)
+                files = {name: {"filename": name, "content": content} for name, content in fake.files.items()}
+                self._reply(200, {"id": GIST_ID, "files": files})
+
+            def do_PATCH(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(fake.latency)
+                fake.saves += 1
+                if fake.fail_every and fake.saves % fake.fail_every == 0:
+                    fake.failures += 1
+                    return self._reply(502, {"message": "Server Error"})
+                fake.bytes_written += len(body)
+                for name, file in json.loads(body)["files"].items():
+                    fake.files[name] = file["content"]
+                self._reply(200, {"id": GIST_ID})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
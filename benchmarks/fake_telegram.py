@@ -0,0 +1,105 @@
+"""Локальная заглушка Telegram Bot API с проверкой flood-лимитов.
+
+Отвечает на getMe, sendMessage, editMessageText и answerCallbackQuery
+(правки и ответы на кнопки не лимитируются); при превышении 1 сообщения в секунду
+в чат или 30 в секунду на бота возвращает 429 с retry_after, как Telegram.
+"""
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+TOKEN = "123456:TEST"
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128  # конкурентные пользователи открывают соединения пачкой — без SYN-повторов
+    daemon_threads = True
+
+
+class FakeTelegram:
+    def __init__(self, latency: float = 0.02, chat_rate: float = 1.0, global_rate: int = 30):
+        self.latency = latency
+        self.chat_interval = 1.0 / chat_rate
+        self.global_rate = global_rate
+        self.lock = threading.Lock()
+        self.last_by_chat = {}
+        self.recent = deque()
+        self.delivered = []
+        self.edits = []
+        self.callbacks = 0
+        self.rejected = 0
+        self.server = _Server(("127.0.0.1", 0), self._handler())
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/bot"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _admit(self, chat_id: int):
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            last = self.last_by_chat.get(chat_id, -1e9)
+            if now - last < self.chat_interval or len(self.recent) >= self.global_rate:
+                self.rejected += 1
+                return False
+            self.last_by_chat[chat_id] = now
+            self.recent.append(now)
+            return True
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+                if "json" in (self.headers.get("Content-Type") or ""):
+                    params = json.loads(body or "{}")
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body).items()}
+                method = self.path.rsplit("/", 1)[-1]
+                time.sleep(fake.latency)
+                if method == "getMe":
+                    result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+                    return self._reply(200, {"ok": True, "result": result})
+                if method == "answerCallbackQuery":
+                    fake.callbacks += 1
+                    return self._reply(200, {"ok": True, "result": True})
+                chat_id = int(params["chat_id"])
+                if method == "editMessageText":
+                    fake.edits.append((chat_id, params.get("text", "")))
+                    result = {"message_id": int(params.get("message_id", 1)), "date": int(time.time()),
+                              "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+                    return self._reply(200, {"ok": True, "result": result})
+                if not fake._admit(chat_id):
+                    return self._reply(429, {"ok": False, "error_code": 429,
+                                             "description": "Too Many Requests: retry after 1",
+                                             "parameters": {"retry_after": 1}})
+                fake.delivered.append((chat_id, params.get("text", "")))
+                result = {"message_id": len(fake.delivered), "date": int(time.time()),
+                          "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+                return self._reply(200, {"ok": True, "result": result})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
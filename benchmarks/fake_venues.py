@@ -0,0 +1,139 @@
+"""Локальные заглушки Binance, Bybit и OKX: ставки фандинга в формате каждой биржи.
+
+Ставки строятся из тикеров Gate.io (synthetic_tickers) со сдвигом, чтобы
+были спреды; каждый десятый контракт — с множителем (1000C10USDT), плюс
+extra контрактов, которых на Gate.io нет. latency — задержка ответа,
+чтобы проверить отсечение медленной биржи по таймауту; failing — instId,
+на которые заглушка отвечает 500 (сбой одного инструмента OKX); intervals —
+{(база, множитель): часы} для контрактов с интервалом фандинга не 8 ч.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def venue_rates(tickers, shift: float = 0.0002, extra: int = 10, seed: int = 0):
+    """{(база, множитель): ставка} — общая основа для всех заглушек"""
+    rng = random.Random(seed)
+    rates = {}
+    for i, item in enumerate(tickers):
+        base = item["contract"].rsplit("_", 1)[0]
+        rates[(base, 1000 if i % 10 == 0 else 1)] = float(item["funding_rate"]) + rng.gauss(0, shift)
+    for i in range(extra):
+        rates[(f"ONLY{seed}X{i}", 1)] = rng.gauss(0, shift)
+    return rates
+
+
+def _prefix(multiplier: int) -> str:
+    return str(multiplier) if multiplier > 1 else ""
+
+
+def binance_body(rates, query, intervals) -> bytes:
+    items = [{"symbol": f"{_prefix(m)}{base}USDT", "lastFundingRate": f"{rate:.8f}", "nextFundingTime": 0}
+             for (base, m), rate in rates.items()]
+    items.append({"symbol": "BTCUSDT_260327", "lastFundingRate": "", "nextFundingTime": 0})  # квартальный
+    return json.dumps(items).encode()
+
+
+def bybit_body(rates, query, intervals) -> bytes:
+    items = [{"symbol": f"{_prefix(m)}{base}USDT", "fundingRate": f"{rate:.8f}"} for (base, m), rate in rates.items()]
+    items.append({"symbol": "BTCPERP", "fundingRate": "0.0001"})  # USDC-контракт
+    return json.dumps({"retCode": 0, "result": {"category": "linear", "list": items}}).encode()
+
+
+_okx_cache = {}
+
+
+def _okx_index(rates) -> dict:
+    # У OKX запрос на инструмент — индекс строится один раз на набор ставок
+    if id(rates) not in _okx_cache:
+        _okx_cache[id(rates)] = {f"{_prefix(m)}{base}-USDT-SWAP": rate for (base, m), rate in rates.items()}
+    return _okx_cache[id(rates)]
+
+
+def binance_info(intervals) -> bytes:
+    return json.dumps([{"symbol": f"{_prefix(m)}{base}USDT", "fundingIntervalHours": hours}
+                       for (base, m), hours in intervals.items()]).encode()
+
+
+def bybit_info(rates, intervals) -> bytes:
+    items = [{"symbol": f"{_prefix(m)}{base}USDT", "fundingInterval": int(intervals.get((base, m), 8) * 60)}
+             for base, m in rates]
+    return json.dumps({"retCode": 0, "result": {"category": "linear", "list": items}}).encode()
+
+
+def okx_body(rates, query, intervals) -> bytes:
+    by_inst = _okx_index(rates)
+    inst = query.get("instId", [""])[0]
+    data = []
+    if inst in by_inst:
+        base = inst[:-len("-USDT-SWAP")]
+        key = (base[4:], 1000) if base.startswith("1000") else (base, 1)
+        hours = intervals.get(key, 8)
+        funding_time = int(time.time()) // 3600 * 3_600_000
+        data.append({"instId": inst, "fundingRate": f"{by_inst[inst]:.8f}", "fundingTime": str(funding_time),
+                     "nextFundingTime": str(funding_time + int(hours * 3_600_000))})
+    return json.dumps({"code": "0", "data": data}).encode()
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 128  # пачка одновременных подключений без SYN-повторов
+    daemon_threads = True
+
+
+class FakeVenue:
+    """HTTP-заглушка одной биржи: render(rates, query) -> тело ответа"""
+
+    def __init__(self, render, rates, latency: float = 0.0):
+        self.render = render
+        self.rates = rates
+        self.latency = latency
+        self.failing = set()
+        self.intervals = {}
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: запросы OKX по инструментам идут пачкой
+
+            def do_GET(self):
+                fake.requests += 1
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if query.get("instId", [""])[0] in fake.failing:
+                    self.send_response(500)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if url.path == "/fapi/v1/fundingInfo":
+                    body = binance_info(fake.intervals)
+                elif url.path == "/v5/market/instruments-info":
+                    body = bybit_info(fake.rates, fake.intervals)
+                else:
+                    body = fake.render(fake.rates, query, fake.intervals)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
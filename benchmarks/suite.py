@@ -0,0 +1,429 @@
+"""Сквозной бенчмарк горячих путей бота на локальных заглушках.
+
+Каждый размер рынка прогоняется в отдельном процессе: заглушки Gate.io REST,
+GitHub Gist и Telegram Bot API поднимаются локально, переменные окружения
+направляют на них config.py, после чего импортируется bot.py и замеряются:
+
+  fetch              — запрос и разбор /futures/usdt/tickers (get_snapshot)
+  evaluate_alerts    — цикл алертов по снимку (история, правила, пороги, дайджесты)
+  alert_cycle        — send_funding_alerts целиком (fetch + evaluate_alerts)
+  history_append     — HistoryStore.append_snapshot
+  persistence_flush  — запись состояния в Gist (PersistenceEngine.flush)
+  format_funding_rate — строка одной пары
+  cmd_all            — render_all_page на свежем снимке и листание
+  settings_click     — button_handler при конкурентных нажатиях пользователей
+                       (плюс отправленные/пропущенные правки и попадания в кэш экранов)
+
+Плюс блокировка event loop (монитор лагов), отправка в Telegram через
+MessageDispatcher и пиковый RSS. Результат — JSON; --out сохраняет его,
+--compare сравнивает с сохранённым прогоном другого коммита.
+
+Отдельные сценарии (benchmarks/bench_*.py, список — --list) запускаются тоже
+отсюда, каждый в своём процессе; hot_paths — прогон выше по размерам рынка,
+all — он и все сценарии. Проверки поведения — в tests/, здесь только замеры.
+
+Запуск из корня репозитория:
+    python -m benchmarks.suite --sizes 100,1000,10000 --out bench.json
+    python -m benchmarks.suite --compare bench.json
+    python -m benchmarks.suite --scenarios parser,api
+    python -m benchmarks.suite --scenarios all --out bench.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+
+from benchmarks import fake_gist
+from benchmarks.fake_gateio import FakeGateRest, synthetic_tickers
+from benchmarks.fake_gist import FakeGist
+from benchmarks.fake_telegram import TOKEN, FakeTelegram
+
+HOT_PATHS = "hot_paths"
+SCENARIOS = ("alert_state", "alerts", "analytics", "api", "dispatch", "exchanges", "fanout", "parser",
+             "persistence", "polling", "ranking", "rollups", "sse", "startup", "streaming", "views")
+CLICKS = ("long_inc", "long_dec", "short_inc", "short_dec", "toggle_alerts",
+          "add_pair_menu", "addpage:1", "back_to_settings")
+
+
+def summarize(samples) -> dict:
+    """Латентности в мс: p50/p99/max и пропускная способность (операций в секунду)"""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "ops_per_s": round(len(ms) / (ms.sum() / 1000), 1) if ms.sum() else None,
+    }
+
+
+def drift(tickers, volatility: float, rng: random.Random):
+    """Случайное блуждание ставок между циклами"""
+    return [dict(item, funding_rate=f"{float(item['funding_rate']) + rng.gauss(0, volatility):.6f}")
+            for item in tickers]
+
+
+class LoopMonitor:
+    """Лаг event loop: насколько позже запланированного просыпается sleep(interval)"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> dict:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        lags = np.asarray(self.lags or [0.0]) * 1000
+        return {"blocked_ms": round(float(lags.sum()), 1), "lag_p99_ms": round(float(np.percentile(lags, 99)), 3),
+                "lag_max_ms": round(float(lags.max()), 3)}
+
+
+def callback_update(user_id: int, data: str, n: int) -> dict:
+    chat = {"id": user_id, "type": "private"}
+    return {"update_id": n, "callback_query": {
+        "id": str(n), "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+        "chat_instance": str(user_id), "data": data,
+        "message": {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "🔔 Настройки:"},
+    }}
+
+
+# ======================
+# CHILD: один размер рынка
+# ======================
+
+async def run_size(bot, gate, args) -> dict:
+    from telegram import Bot, Update
+    from telegram.request import HTTPXRequest
+    import data_fetcher
+    from data_fetcher import get_snapshot
+
+    rng = random.Random(args.seed)
+    report = {}
+    # Пул соединений как у Application по умолчанию, иначе запросы встают в очередь на одном соединении
+    request = HTTPXRequest(connection_pool_size=256)
+    async with Bot(TOKEN, base_url=os.environ["BENCH_TELEGRAM_URL"], request=request) as tg_bot:
+        monitor = LoopMonitor()
+        monitor.start()
+        await bot.persistence.reconcile(bot.apply_state)  # в боте — часть startup
+
+        # Чаты с собственными порогами и списками пар
+        contracts = [item["contract"] for item in gate.tickers]
+        for chat_id in range(1, args.chats + 1):
+            bot.registry.ensure(chat_id)
+            for pair in rng.sample(contracts, min(args.pairs_per_chat, len(contracts))):
+                bot.registry.add_pair(chat_id, pair)
+            bot.registry.set_thresholds(chat_id, long=-rng.uniform(0.0002, 0.002), short=rng.uniform(0.0002, 0.002))
+        bot.dispatcher.start(tg_bot)
+
+        # Цикл алертов: send_funding_alerts с замером evaluate_alerts внутри
+        evaluate_alerts, evaluate_s = bot.evaluate_alerts, []
+
+        def timed_evaluate(snapshot):
+            started = time.perf_counter()
+            evaluate_alerts(snapshot)
+            evaluate_s.append(time.perf_counter() - started)
+
+        bot.evaluate_alerts = timed_evaluate
+        # Каждый цикл — новый запрос к бирже и запись в историю, как раз в UPDATE_INTERVAL;
+        # следующий опрос планировщика не запускаем — циклы идут подряд
+        ttl, data_fetcher._cache.ttl = data_fetcher._cache.ttl, 0
+        min_interval, bot.poller.min_interval = bot.poller.min_interval, 0
+        record_interval, bot.RECORD_INTERVAL = bot.RECORD_INTERVAL, 0
+        context = types.SimpleNamespace(job_queue=types.SimpleNamespace(run_once=lambda *args, **kwargs: None))
+        cycle_s, fetch_s = [], []
+        for _ in range(args.cycles):
+            gate.tickers = drift(gate.tickers, args.volatility, rng)
+            started = time.perf_counter()
+            await bot.send_funding_alerts(context)
+            cycle_s.append(time.perf_counter() - started)
+            fetch_s.append(cycle_s[-1] - evaluate_s[-1])
+        bot.evaluate_alerts = evaluate_alerts
+        bot.RECORD_INTERVAL = record_interval
+        bot.poller.min_interval = min_interval
+        data_fetcher._cache.ttl = ttl
+        report["fetch"] = summarize(fetch_s)
+        report["evaluate_alerts"] = summarize(evaluate_s)
+        report["alert_cycle"] = summarize(cycle_s)
+        report["alert_cycle"]["contracts_per_s"] = round(len(contracts) / np.median(cycle_s))
+
+        snapshot = await get_snapshot(max_age=0)
+
+        samples = []
+        ts = bot.history_store.last_ts
+        for _ in range(args.cycles):
+            ts += 90
+            started = time.perf_counter()
+            bot.history_store.append_snapshot(snapshot.rates, ts)
+            samples.append(time.perf_counter() - started)
+        report["history_append"] = summarize(samples)
+
+        samples = []
+        for _ in range(args.saves):
+            bot.registry.set_alerts(1, not bot.registry.get(1).alerts_enabled)
+            bot.persistence.mark_dirty()
+            started = time.perf_counter()
+            await bot.persistence.flush()
+            samples.append(time.perf_counter() - started)
+        report["persistence_flush"] = summarize(samples)
+        report["persistence_flush"].update(
+            failures=bot.persistence.stats["failures"],
+            serialize_ms=round(bot.persistence.stats["loop_blocked_ms"] / max(1, len(samples)), 3),
+            blob_kb=round(len(bot.persistence._last_blob or "") / 1024, 1),
+        )
+
+        settings = bot.registry.get(1)
+        samples = []
+        for pair, rate in list(snapshot.rates.items())[:2000]:
+            started = time.perf_counter()
+            bot.format_funding_rate(pair, rate, settings)
+            samples.append(time.perf_counter() - started)
+        report["format_funding_rate"] = summarize(samples)
+
+        samples = []
+        for i in range(args.cycles):
+            # Свежий снимок: первая страница включает сортировку, дальше — листание
+            fresh = type(snapshot)(dict(snapshot.rates), snapshot.fetched_at + i + 1)
+            for order, page in (("abs", 0), ("abs", 1), ("neg", 0), ("change", 2)):
+                started = time.perf_counter()
+                bot.render_all_page(bot.ranked_view(fresh), order, page, settings)
+                samples.append(time.perf_counter() - started)
+        report["cmd_all"] = summarize(samples)
+
+        # Конкурентные пользователи жмут кнопки настроек
+        click_s = []
+
+        async def user(user_id: int):
+            for n in range(args.clicks):
+                update = Update.de_json(callback_update(user_id, rng.choice(CLICKS), n), tg_bot)
+                started = time.perf_counter()
+                await bot.button_handler(update, None)
+                click_s.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(10_000 + u) for u in range(args.users)))
+        wall = time.perf_counter() - started
+        await bot.message_views.flush()  # отложенные правки серий ➕/➖
+        report["settings_click"] = summarize(click_s)
+        report["settings_click"]["clicks_per_s"] = round(len(click_s) / wall, 1)
+        report["settings_click"].update(bot.message_views.stats, view_cache_hits=bot.view_cache.stats["hits"],
+                                        view_cache_misses=bot.view_cache.stats["misses"])
+
+        await bot.dispatcher.stop(timeout=args.drain)
+        metrics = bot.dispatcher.metrics()
+        report["telegram_send"] = {
+            "sent": metrics["sent"], "retries": metrics["retries"], "failed": metrics["failed"],
+            "queue_depth": metrics["queue_depth"], "latency_avg_ms": round(metrics["latency_avg"] * 1000, 1),
+            "latency_max_ms": round(metrics["latency_max"] * 1000, 1),
+        }
+        report["event_loop"] = await monitor.stop()
+        await bot.close_client()
+    return report
+
+
+def child(args) -> dict:
+    rng = random.Random(args.seed)
+    tickers = synthetic_tickers(args.size, args.volatility, args.seed)
+    with FakeGateRest(tickers) as gate, FakeGist(args.gist_latency) as gist, FakeTelegram() as telegram, \
+            tempfile.TemporaryDirectory() as tmp:
+        # Конфиг читается при импорте — окружение задаём до import bot
+        os.environ.update({
+            "GATEIO_BASE_URL": gate.base_url,
+            "STORAGE_BACKEND": "gist",
+            "GITHUB_TOKEN": fake_gist.TOKEN,
+            "GITHUB_GIST_ID": fake_gist.GIST_ID,
+            "GITHUB_API_URL": gist.base_url,
+            "SHARED_DIR": os.path.join(tmp, "shared"),
+            "STATE_CACHE_PATH": os.path.join(tmp, "state.json"),
+            "PERSIST_DEBOUNCE": "3600",
+            "MONITORED_PAIRS": ",".join(item["contract"] for item in rng.sample(tickers, min(3, len(tickers)))),
+            "BENCH_TELEGRAM_URL": telegram.base_url,
+        })
+        started = time.perf_counter()
+        import bot
+        import_s = time.perf_counter() - started
+        bot.logging.getLogger().setLevel("WARNING")
+        bot.warm_state()  # в боте — часть startup
+
+        report = {"contracts": args.size, "volatility": args.volatility, "import_ms": round(import_s * 1000, 1)}
+        report.update(asyncio.run(run_size(bot, gate, args)))
+        report["gist"] = {"saves": gist.saves, "kb_written": round(gist.bytes_written / 1024, 1)}
+        report["telegram_send"]["delivered"] = len(telegram.delivered)
+        report["telegram_send"]["rejected_429"] = telegram.rejected
+        report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+
+def scenario(name: str) -> dict:
+    return importlib.import_module(f"benchmarks.bench_{name}").main()
+
+
+# ======================
+# PARENT: прогон и сравнение
+# ======================
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {"commit": commit or None, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "timestamp": int(time.time())}
+
+
+def parse_scenarios(value: str) -> list:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    if "all" in names:
+        return [HOT_PATHS, *SCENARIOS]
+    unknown = [name for name in names if name != HOT_PATHS and name not in SCENARIOS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scenarios: {', '.join(unknown)} (see --list)")
+    return names
+
+
+def list_scenarios():
+    print(f"{HOT_PATHS:12} {__doc__.splitlines()[0]}")
+    for name in SCENARIOS:
+        doc = importlib.import_module(f"benchmarks.bench_{name}").__doc__ or ""
+        print(f"{name:12} {doc.strip().splitlines()[0] if doc.strip() else ''}")
+
+
+def run_scenarios(names) -> dict:
+    results = {}
+    for name in names:
+        proc = subprocess.run([sys.executable, "-m", "benchmarks.suite", "--child", "--scenario", name],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr[-4000:])
+            raise SystemExit(f"benchmark scenario {name} failed")
+        results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return results
+
+
+def run_sizes(args) -> list:
+    results = []
+    for size in args.sizes:
+        command = [sys.executable, "-m", "benchmarks.suite", "--child", "--size", str(size)]
+        for name in ("volatility", "cycles", "chats", "pairs_per_chat", "users", "clicks", "saves",
+                     "gist_latency", "drain", "seed"):
+            command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+        proc = subprocess.run(command, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr[-4000:])
+            raise SystemExit(f"benchmark for {size} contracts failed")
+        results.append(json.loads(proc.stdout))
+    return results
+
+
+def run_all(args) -> dict:
+    run = {"meta": metadata(), "results": run_sizes(args) if HOT_PATHS in args.scenarios else []}
+    names = [name for name in args.scenarios if name != HOT_PATHS]
+    if names:
+        run["scenarios"] = run_scenarios(names)
+    return run
+
+
+def flatten_values(prefix: str, values, flat: dict):
+    if isinstance(values, list):
+        # Прогоны по размерам рынка — по числу контрактов, как results
+        values = {str(item.get("contracts", i)): item for i, item in enumerate(values) if isinstance(item, dict)}
+    for key, value in values.items():
+        if isinstance(value, (dict, list)):
+            flatten_values(f"{prefix}.{key}", value, flat)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key != "count":
+            flat[f"{prefix}.{key}"] = value
+
+
+def flatten(run: dict) -> dict:
+    flat = {}
+    for result in run["results"]:
+        for section, values in result.items():
+            if isinstance(values, dict):
+                for key, value in values.items():
+                    if isinstance(value, (int, float)) and key != "count":
+                        flat[f"{result['contracts']}.{section}.{key}"] = value
+    for name, values in run.get("scenarios", {}).items():
+        flatten_values(name, values, flat)
+    return flat
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> dict:
+    """Метрики, изменившиеся больше чем на threshold (отношение current / baseline)"""
+    before, after = flatten(baseline), flatten(current)
+    changes = {}
+    for key, old in before.items():
+        new = after.get(key)
+        if new is None or not old:
+            continue
+        ratio = new / old
+        if abs(ratio - 1) > threshold:
+            changes[key] = {"before": old, "after": new, "ratio": round(ratio, 2)}
+    return {"baseline": baseline["meta"], "current": current["meta"], "changed": changes}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[100, 1000, 10000])
+    parser.add_argument("--volatility", type=float, default=0.0005)
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--pairs-per-chat", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20, help="одновременных пользователей в меню настроек")
+    parser.add_argument("--clicks", type=int, default=10, help="нажатий на пользователя")
+    parser.add_argument("--saves", type=int, default=10)
+    parser.add_argument("--gist-latency", type=float, default=0.05)
+    parser.add_argument("--drain", type=float, default=10, help="сколько ждать отправки очереди Telegram, с")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="сохранить результат в файл")
+    parser.add_argument("--compare", help="сравнить с сохранённым прогоном")
+    parser.add_argument("--threshold", type=float, default=0.1, help="порог изменения для --compare")
+    parser.add_argument("--scenarios", type=parse_scenarios, default=[HOT_PATHS],
+                        help=f"через запятую: {HOT_PATHS}, сценарии из --list или all")
+    parser.add_argument("--list", action="store_true", help="список сценариев")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.list:
+        return list_scenarios()
+    if args.child:
+        print(json.dumps(scenario(args.scenario) if args.scenario else child(args), ensure_ascii=False))
+        return
+    run = run_all(args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            run = compare(json.load(f), run, args.threshold)
+    print(json.dumps(run, indent=2))
+
+
+if __name__ == "__main__":
+    main()
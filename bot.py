@@ -1,15 +1,29 @@
 import asyncio
+import copy
 import logging
-import json
-import requests
-import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
     ContextTypes, filters
 )
-from data_fetcher import get_funding_rates
+from data_fetcher import get_snapshot, cache_stats, close_client
+from storage import ChannelBackend, PersistenceEngine, make_backend
+from shared import BackgroundWriter, make_channel
+from history_store import HistoryStore
+from ranking import ORDERS, ranked_view
+from alert_engine import AlertEngine, ChangeRule, ZScoreRule, OutlierRule, SpreadRule, Trigger
+from analytics import RollingAnalytics
+from rollups import RollupStore
+from exchanges import SPREAD_HOURS, VenueBoard, make_adapters
+from scheduler import PollScheduler
+from chat_settings import ChatSettings, ChatRegistry
+from dispatcher import MessageDispatcher
+from alert_state import AlertStateMachine
+from metrics import MetricsPublisher
+from views import ViewCache, MessageViews
+import metrics
 from config import (
     TELEGRAM_BOT_TOKEN,
     ALERT_CHAT_ID,
@@ -17,80 +31,100 @@ from config import (
     CRITICAL_FR_LONG as DEFAULT_LONG,
     CRITICAL_FR_SHORT as DEFAULT_SHORT,
     UPDATE_INTERVAL,
+    POLL_MAX_INTERVAL,
+    ALERT_CHANGE,
+    ALERT_ZSCORE,
+    ALERT_OUTLIER,
+    ALERT_WINDOW,
+    MARKET_ALERTS,
+    ALERT_COOLDOWN,
+    ALERT_HYSTERESIS,
+    ALERT_SPREAD,
+    DAILY_REPORT_TIME,
+    STREAM_MODE,
+    HTTP_TIMEOUT,
     DEBUG
 )
 
 # ======================
-# GITHUB GIST CONFIG
+# STORAGE
 # ======================
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-GITHUB_GIST_ID = os.getenv("GITHUB_GIST_ID")
-GIST_URL = f"https://api.github.com/gists/{GITHUB_GIST_ID}"
+DEFAULT_SETTINGS = ChatSettings(True, DEFAULT_LONG, DEFAULT_SHORT, DEFAULT_MONITORED_PAIRS)
 
 DEFAULT_DATA = {
-    "settings": {
-        "alerts_enabled": True,
-        "critical_fr_long": DEFAULT_LONG,
-        "critical_fr_short": DEFAULT_SHORT,
-        "monitored_pairs": list(DEFAULT_MONITORED_PAIRS)
-    },
-    "history": {},
-    "daily_stats": {
-        "alerts_count": 0,
-        "max_long": [0, ""],
-        "max_short": [0, ""]
-    }
+    "chats": {}
 }
 
-def load_data_from_gist():
-    if not GITHUB_TOKEN or not GITHUB_GIST_ID:
-        logging.warning("GITHUB_TOKEN or GITHUB_GIST_ID not set. Using defaults.")
-        return DEFAULT_DATA.copy()
-    try:
-        headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-        response = requests.get(GIST_URL, headers=headers, timeout=10)
-        response.raise_for_status()
-        gist = response.json()
-        content = gist["files"]["frate4bot-data.json"]["content"]
-        data = json.loads(content)
-        logging.info("✅ Data loaded from Gist")
-        return data
-    except Exception as e:
-        logging.error(f"❌ Failed to load from Gist: {e}. Using defaults.")
-        return DEFAULT_DATA.copy()
+def serialize_state() -> dict:
+    return {
+        "chats": registry.to_dict(),
+        "alert_state": alert_states.to_list()
+    }
 
-def save_data_to_gist(data):
-    if not GITHUB_TOKEN or not GITHUB_GIST_ID:
-        logging.warning("GITHUB_TOKEN or GITHUB_GIST_ID not set. Skip saving.")
-        return False
+# Общие данные для webapp.py (на Heroku — другой дайно): метрики, снимок, история;
+# запись — в фоновом потоке, циклы алертов не ждут сеть
+channel = BackgroundWriter(make_channel())
+# Локальная копия состояния для быстрого старта: файл STATE_CACHE_PATH на Heroku
+# стирается при каждом рестарте дайно, копия в redis — нет
+state_cache = ChannelBackend(channel.channel, "state.json") if channel.name == "redis" else None
+persistence = PersistenceEngine(make_backend(), serialize_state, cache=state_cache)
+
+def load_data():
+    # Удалённый бэкенд (gist) при старте не ждём: локальная копия сейчас, сверка — в фоне (startup)
+    if persistence.cache is not None:
+        data = persistence.load_cached()
+        if data is not None:
+            logging.info("✅ Data loaded from local snapshot")
+            return data
+        logging.warning(f"No local snapshot. Using defaults until {persistence.backend.name} is loaded.")
+        return copy.deepcopy(DEFAULT_DATA)
     try:
-        headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-        payload = {
-            "files": {
-                "frate4bot-data.json": {
-                    "content": json.dumps(data, indent=2, ensure_ascii=False)
-                }
-            }
-        }
-        response = requests.patch(GIST_URL, headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        logging.info("✅ Data saved to Gist")
-        return True
+        data = persistence.load()
+        if data is not None:
+            logging.info(f"✅ Data loaded from {persistence.backend.name}")
+            return data
+        logging.warning(f"No saved data in {persistence.backend.name}. Using defaults.")
     except Exception as e:
-        logging.error(f"❌ Failed to save to Gist: {e}")
-        return False
+        logging.error(f"❌ Failed to load from {persistence.backend.name}: {e}. Using defaults.")
+    return copy.deepcopy(DEFAULT_DATA)
+
+def apply_state(data, since: int = None):
+    """Подменяет настройки чатов данными бэкенда (после сверки).
+
+    since — registry.mark() на начало сверки: чаты, которые пользователи изменили
+    за время сверки, остаются локальными. Состояние алертов сливается по ключам.
+    Слитое состояние уходит на бэкенд следующей записью.
+    """
+    global registry
+    merged = load_registry(data)
+    for chat_id in registry.changed_since(since) if since is not None else ():
+        merged.put(chat_id, registry.chats[chat_id])
+    registry = merged
+    alert_states.merge_list(data.get("alert_state"))
+    persistence.mark_dirty()
+
+def load_registry(data) -> ChatRegistry:
+    chats = data.get("chats")
+    if chats is None and "settings" in data:
+        # Старый формат: общие настройки принадлежали ALERT_CHAT_ID
+        chats = {str(ALERT_CHAT_ID): data["settings"]}
+    registry = ChatRegistry.from_dict(chats, DEFAULT_SETTINGS)
+    registry.ensure(ALERT_CHAT_ID)
+    return registry
 
 # ======================
 # INIT DATA
 # ======================
-data = load_data_from_gist()
-user_settings = data["settings"]
-history = data["history"]
-daily_stats = data["daily_stats"]
-
-# Convert list → set for pairs
-if "monitored_pairs" in user_settings:
-    user_settings["monitored_pairs"] = set(user_settings["monitored_pairs"])
+data = load_data()
+# Настройки по чатам + индекс «пара -> подписанные чаты»
+registry = load_registry(data)
+# Состояние алертов (chat, pair, rule) переживает рестарт вместе с настройками
+alert_states = AlertStateMachine(ALERT_COOLDOWN).load_list(data.get("alert_state"))
+# Суточные сводки по всем контрактам (текущие сутки + закрытые дни в общем канале)
+rollups = RollupStore(channel.sub("rollups")).load()
+# История ставок по всем контрактам (кольцевые буферы + сегменты в общем канале);
+# читается в startup, параллельно с первым запросом к бирже
+history_store = HistoryStore(channel.sub("history"))
 
 # Logging
 logging.basicConfig(
@@ -100,57 +134,94 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 application = None
+startup_task = None
+
+HISTORY_ROWS = 12  # строк в ответе /history
+PAGE_SIZE = 20     # строк на странице /all и меню добавления пары
 
 # ======================
 # UTILS
 # ======================
 
-def get_trend(pair: str) -> str:
-    if pair not in history or len(history[pair]) < 3:
-        return "⏺️"
-    rates = [r for _, r in history[pair][-3:]]
-    if rates[-1] > rates[-2] > rates[-3]:
-        return "🔼 Растёт"
-    elif rates[-1] < rates[-2] < rates[-3]:
-        return "🔽 Падает"
-    else:
-        return "⏹️ Стабильно"
-
-def add_to_history(pair: str, rate: float):
-    now = datetime.utcnow().strftime("%H:%M")
-    if pair not in history:
-        history[pair] = []
-    history[pair].append([now, rate])
-    if len(history[pair]) > 12:
-        history[pair].pop(0)
-
-    if rate <= daily_stats["max_long"][0]:
-        daily_stats["max_long"] = [rate, pair]
-    if rate >= daily_stats["max_short"][0]:
-        daily_stats["max_short"] = [rate, pair]
-
-    if len(history[pair]) % 5 == 0:
-        save_to_gist()
-
-def save_to_gist():
-    serializable_data = {
-        "settings": {
-            "alerts_enabled": user_settings["alerts_enabled"],
-            "critical_fr_long": user_settings["critical_fr_long"],
-            "critical_fr_short": user_settings["critical_fr_short"],
-            "monitored_pairs": list(user_settings["monitored_pairs"])
-        },
-        "history": history,
-        "daily_stats": daily_stats
-    }
-    save_data_to_gist(serializable_data)
-
-def format_funding_rate(pair: str, fr: float) -> str:
-    alert_long = fr <= user_settings["critical_fr_long"]
-    alert_short = fr >= user_settings["critical_fr_short"]
+def format_age(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes >= 1440:
+        return f"{minutes // 1440}д {minutes % 1440 // 60}ч"
+    if minutes >= 60:
+        return f"{minutes // 60}ч {minutes % 60}м"
+    return f"{minutes}м"
+
+def format_funding_rate(pair: str, fr: float, settings: ChatSettings) -> str:
+    alert_long = fr <= settings.critical_fr_long
+    alert_short = fr >= settings.critical_fr_short
     emoji = "🔻" if alert_long else "🔺" if alert_short else "⬇️" if fr < 0 else "⬆️" if fr > 0 else "➖"
-    trend = get_trend(pair)
-    return f"{pair}: {fr:.6f} {emoji} {trend}"
+    # Тренд посчитан заранее в цикле алертов — здесь только поиск по индексу
+    return f"{pair}: {fr:.6f} {emoji} {analytics.trend_label(pair)}"
+
+def format_stats(stats) -> str:
+    flip = format_age(time.time() - stats.flip_ts)
+    return (f"   EMA {stats.ema[0]:.6f}/{stats.ema[-1]:.6f} · σ {stats.std:.6f} · "
+            f"окно {stats.low:.6f}…{stats.high:.6f} · знак {flip if stats.flipped else '≥ ' + flip}")
+
+def format_spread_legs(spread) -> str:
+    return f"   long {spread.low_venue} {spread.low:.6f} / short {spread.high_venue} {spread.high:.6f}"
+
+def format_alert(trigger) -> str:
+    pair, fr, ref = trigger.contract, trigger.value, trigger.ref
+    if trigger.rule == "long":
+        return f"⚠️ LONG funding alert!\n{pair}: {fr:.6f} ≤ {ref:.6f}"
+    if trigger.rule == "short":
+        return f"⚠️ SHORT funding alert!\n{pair}: {fr:.6f} ≥ {ref:.6f}"
+    if trigger.rule == "change":
+        return f"📊 Резкое изменение ставки!\n{pair}: {ref:.6f} → {fr:.6f}"
+    if trigger.rule == "zscore":
+        return f"📐 Аномалия относительно истории!\n{pair}: {fr:.6f} (z = {ref:+.1f})"
+    if trigger.rule == "spread":
+        spread = venues.table.get(pair) if venues.table is not None else None
+        detail = f"\n{format_spread_legs(spread)}" if spread is not None else ""
+        return f"↔️ Межбиржевой спред фандинга!\n{pair}: {ref:.6f} за {SPREAD_HOURS} ч{detail}"
+    return f"🎯 Выброс по рынку!\n{pair}: {fr:.6f} (медиана {ref:.6f})"
+
+# ======================
+# ALERT RULES
+# ======================
+
+# Скользящая статистика по всем контрактам (EMA, σ, наклон, мин/макс, смена знака);
+# после рестарта прогревается из истории до первого цикла — тренды и z-score доступны сразу
+analytics = RollingAnalytics(ALERT_WINDOW)
+
+# Рыночные правила общие для всех; пороги LONG/SHORT у каждого чата свои (см. ChatRegistry)
+alert_engine = AlertEngine([
+    ChangeRule("change", ALERT_CHANGE),
+    ZScoreRule("zscore", ALERT_ZSCORE),
+    OutlierRule("outlier", ALERT_OUTLIER),
+    SpreadRule("spread", ALERT_SPREAD),
+], analytics=analytics)
+
+# Ставки других бирж (EXCHANGES): опрашиваются параллельно, спреды ранжируются раз в цикл
+venues = VenueBoard(make_adapters())
+# Спреды старше двух циклов не проверяем: какая-то биржа давно не отвечала
+VENUE_MAX_AGE = 2 * (UPDATE_INTERVAL if STREAM_MODE else POLL_MAX_INTERVAL)
+
+# Опрос Gate.io: чаще перед начислением фандинга, реже между ними, с паузой при сбоях биржи
+poller = PollScheduler()
+
+# Исходящие сообщения: лимиты Telegram, повторы после 429, метрики очереди
+dispatcher = MessageDispatcher()
+
+# Экраны настроек и /all: отрисовка по версиям состояния, правки только при изменениях
+view_cache = ViewCache()
+message_views = MessageViews()
+
+# Ставки прошлого цикла: пороги проверяются только у изменившихся пар
+last_rates = {}
+last_evaluated_at = 0.0
+
+# В историю — не чаще UPDATE_INTERVAL: перед начислением опрос и поток дают точки чаще
+RECORD_INTERVAL = UPDATE_INTERVAL
+
+# Метрики воркера публикуются в канал для webapp.py (/metrics, /health)
+metrics_publisher = MetricsPublisher(channel, collect=lambda: metrics.set_gauge("telegram_queue_depth", dispatcher.depth))
 
 # ======================
 # MAIN MENU
@@ -170,59 +241,167 @@ MAIN_MENU = ReplyKeyboardMarkup(
 # HANDLERS
 # ======================
 
-async def send_funding_alerts(context: ContextTypes.DEFAULT_TYPE):
-    if not user_settings["alerts_enabled"]:
+def alert_cleared(key, rates: dict) -> bool:
+    chat_id, pair, rule = key
+    settings = registry.chats.get(chat_id)
+    rate = rates.get(pair)
+    if settings is None or rate is None or not settings.alerts_enabled or pair not in settings.monitored_pairs:
+        return True
+    if rule == "long":
+        return rate > settings.critical_fr_long + ALERT_HYSTERESIS
+    if rule == "short":
+        return rate < settings.critical_fr_short - ALERT_HYSTERESIS
+    return True  # рыночные правила — событие одного цикла
+
+def evaluate_alerts(snapshot):
+    """Цикл алертов по снимку: в режиме опроса — из джоба, в потоковом — на каждое обновление"""
+    global last_rates, last_evaluated_at
+    rates = snapshot.rates
+    if not rates or snapshot.fetched_at <= last_evaluated_at:
+        logger.debug("No new snapshot, skipping alert cycle")
         return
-
-    rates = get_funding_rates()
-    for pair in user_settings["monitored_pairs"]:
-        if pair not in rates:
-            continue
-        fr = rates[pair]
-        add_to_history(pair, fr)
-
-        alert = None
-        if fr <= user_settings["critical_fr_long"]:
-            alert = f"⚠️ LONG funding alert!\n{pair}: {fr:.6f} ≤ {user_settings['critical_fr_long']:.6f}"
-            daily_stats["alerts_count"] += 1
-        elif fr >= user_settings["critical_fr_short"]:
-            alert = f"⚠️ SHORT funding alert!\n{pair}: {fr:.6f} ≥ {user_settings['critical_fr_short']:.6f}"
-            daily_stats["alerts_count"] += 1
-
-        if alert:
-            try:
-                await context.bot.send_message(chat_id=ALERT_CHAT_ID, text=alert)
-                logger.info(f"Alert sent: {alert}")
-            except Exception as e:
-                logger.error(f"Failed to send alert: {e}")
-    save_to_gist()
-
-async def send_daily_report(context: ContextTypes.DEFAULT_TYPE):
-    global daily_stats
-    report = (
-        f"📆 Ежедневный отчёт ({datetime.utcnow().strftime('%Y-%m-%d %H:%M')} UTC):\n"
-        f"• Всего алертов: {daily_stats['alerts_count']}\n"
-        f"• Макс. LONG: {daily_stats['max_long'][0]:.6f} ({daily_stats['max_long'][1]})\n"
-        f"• Макс. SHORT: {daily_stats['max_short'][0]:.6f} ({daily_stats['max_short'][1]})\n"
-    )
-    if daily_stats["alerts_count"] == 0:
-        report += "• Рекомендация: спокойный день — можно искать новые пары."
-    elif daily_stats["max_short"][0] > 0.002:
-        report += "• Рекомендация: высокие SHORT ставки — возможен шорт-сквиз!"
-    else:
-        report += "• Рекомендация: следите за трендами."
-
+    last_evaluated_at = snapshot.fetched_at
+    started = time.perf_counter()
+
+    # В историю (и в окно z-score) пишем не чаще RECORD_INTERVAL
+    record = snapshot.fetched_at - history_store.last_ts >= RECORD_INTERVAL
+    if record:
+        history_store.append_snapshot(rates, snapshot.fetched_at)
+        rollups.update(rates, snapshot.fetched_at, snapshot.table)
+
+    # Правила проверяются по всему рынку всегда — история z-score не должна прерываться
+    triggers = alert_engine.evaluate_rates(rates, update=record, ts=snapshot.fetched_at, spreads=current_spreads())
+    logger.debug(f"Snapshot cache: {cache_stats()}")
+
+    active = {}  # (chat_id, pair, rule) -> текст алерта
+    for chat_id, pair, side, rate, threshold in registry.match_thresholds(rates, last_rates):
+        active[(chat_id, pair, side)] = format_alert(Trigger(pair, side, rate, threshold))
+    for trigger in triggers:
+        chats = [c for c in registry.subscribers(trigger.contract) if registry.chats[c].alerts_enabled]
+        if not chats and MARKET_ALERTS:
+            chats = [ALERT_CHAT_ID]
+        for chat_id in chats:
+            active[(chat_id, trigger.contract, trigger.rule)] = format_alert(trigger)
+    last_rates = rates
+
+    # Отправляем только новые пересечения; удержание за порогом и дребезг гасит state machine
+    outbox = {}  # chat_id -> тексты алертов
+    alerted = []  # пары отправленных алертов — в суточную сводку
+    for key in alert_states.process(active, lambda key: alert_cleared(key, rates)):
+        outbox.setdefault(key[0], []).append(active[key])
+        alerted.append(key[1])
+    rollups.add_alerts(alerted)
+
+    # Один дайджест на чат за цикл; отправка идёт через очередь с лимитами Telegram
+    for chat_id, alerts in outbox.items():
+        dispatcher.send_digest(chat_id, alerts)
+    if outbox:
+        queued = sum(map(len, outbox.values()))
+        metrics.inc("alerts_total", queued)
+        logger.info(f"Alerts queued: {queued} for {len(outbox)} chats")
+    logger.debug(f"Dispatcher: {dispatcher.metrics()}")
+    persistence.mark_dirty()
+
+    # Снимок для webapp.py (/api/funding): одна запись в канал на цикл вместо запросов к Gate.io из браузеров
     try:
-        await context.bot.send_message(chat_id=ALERT_CHAT_ID, text=report)
-        logger.info("Daily report sent.")
+        from funding_api import publish_snapshot  # модуль веб-API: грузится с первым циклом, не при импорте
+        publish_snapshot(snapshot, channel, alerts=triggers)
     except Exception as e:
-        logger.error(f"Failed to send daily report: {e}")
+        logger.error(f"❌ Failed to publish snapshot: {e}")
+
+    metrics.observe("alert_cycle_seconds", time.perf_counter() - started)
+    metrics.inc("alert_cycles_total")
+    metrics.set_gauge("last_cycle_timestamp", time.time())
+
+def current_spreads():
+    table = venues.table
+    if table is None or time.time() - table.fetched_at > VENUE_MAX_AGE:
+        return None
+    return table.as_dict()
+
+async def fetch_cycle():
+    # Перед начислением опрос чаще SNAPSHOT_TTL — снимок из кэша должен быть свежее интервала
+    max_age = poller.min_interval / 2
+    if venues.enabled:
+        # Снимок Gate.io и ставки остальных бирж — одновременно; GateAdapter берёт тот же снимок из кэша
+        snapshot, _ = await asyncio.gather(get_snapshot(max_age), venues.refresh())
+        return snapshot
+    return await get_snapshot(max_age)
+
+def schedule_poll(job_queue, snapshot, elapsed: float = 0.0):
+    # Интервал — по ближайшему начислению среди контрактов, по которым шлются алерты
+    contracts = None if MARKET_ALERTS else registry.pairs()
+    delay = poller.next_delay(snapshot, contracts)
+    poller.record_cycle(elapsed)
+    job_queue.run_once(send_funding_alerts, delay, name="poll")
+    logger.debug(f"Next poll in {delay:.0f}s")
 
-    daily_stats.update({"alerts_count": 0, "max_long": [0, ""], "max_short": [0, ""]})
-    save_to_gist()
+async def send_funding_alerts(context: ContextTypes.DEFAULT_TYPE):
+    started = time.perf_counter()
+    snapshot = None
+    try:
+        snapshot = await fetch_cycle()
+        evaluate_alerts(snapshot)
+    finally:
+        schedule_poll(context.job_queue, snapshot, time.perf_counter() - started)
+
+async def refresh_venues(context: ContextTypes.DEFAULT_TYPE):
+    await venues.refresh()
+
+# Потоковый режим: обновления из WebSocket сами запускают цикл алертов
+# (websockets импортируется только в этом режиме)
+if STREAM_MODE:
+    from streaming import TickerStream
+    ticker_stream = TickerStream(on_update=evaluate_alerts)
+else:
+    ticker_stream = None
+
+def format_report(title: str, rollup, settings: ChatSettings) -> str:
+    start = datetime.utcfromtimestamp(rollup.start)
+    end = datetime.utcfromtimestamp(min(rollup.end, time.time()))
+    lines = [f"{title} ({start:%d.%m %H:%M} – {end:%d.%m %H:%M} UTC):", f"• Всего алертов: {rollup.alerts_total}"]
+    low, high = rollup.extremes(registry.pairs())
+    if low is not None:
+        lines.append(f"• Макс. LONG: {low[0]:.6f} ({low[1]})")
+        lines.append(f"• Макс. SHORT: {high[0]:.6f} ({high[1]})")
+
+    rows = rollup.rows(sorted(settings.monitored_pairs))
+    if rows:
+        lines.append("\n📊 Пары (среднее · p10/p50/p90 · начислено):")
+        for r in rows:
+            lines.append(f"{r.contract}: {r.mean:.6f} · {r.p10:.6f}/{r.p50:.6f}/{r.p90:.6f} · "
+                         f"{r.realized:+.6f} ({r.settlements} выпл.)")
+    top = [r for r in rollup.top(5, "realized") if r.settlements]
+    if top:
+        lines.append("\n💰 Рынок — наибольший начисленный фандинг:")
+        for r in top:
+            lines.append(f"{r.contract}: {r.realized:+.6f} ({r.settlements} выпл.)")
+
+    if rollup.alerts_total == 0:
+        lines.append("\n• Рекомендация: спокойный день — можно искать новые пары.")
+    elif high is not None and high[0] > 0.002:
+        lines.append("\n• Рекомендация: высокие SHORT ставки — возможен шорт-сквиз!")
+    else:
+        lines.append("\n• Рекомендация: следите за трендами.")
+    return "\n".join(lines)
+
+async def send_daily_report(context: ContextTypes.DEFAULT_TYPE):
+    # Сутки сводки закрываются здесь же (или уже закрыты циклом, пришедшим после DAILY_REPORT_TIME)
+    rollups.roll(time.time())
+    day = rollups.last_finished
+    if day is None:
+        logger.warning("No finished rollup for the daily report")
+        return
+    dispatcher.enqueue(ALERT_CHAT_ID, format_report("📆 Ежедневный отчёт", day, registry.get(ALERT_CHAT_ID)))
+    logger.info("Daily report queued.")
 
 # --- Commands ---
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /start подписывает чат на алерты по парам по умолчанию
+    chat_id = update.effective_chat.id
+    if chat_id not in registry:
+        registry.ensure(chat_id)
+        persistence.mark_dirty()
     await update.message.reply_text(
         "👋 Привет! Я FRate Bot с расширенными настройками.\nВыберите действие:",
         reply_markup=MAIN_MENU
@@ -233,70 +412,147 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "📌 Возможности:\n"
         "• Настройки порогов и пар\n"
         "• История ставок (/history BTC_USDT)\n"
-        "• Ежедневный отчёт (09:00 UTC)\n"
+        f"• Ежедневный отчёт ({DAILY_REPORT_TIME} UTC)\n"
+        "• Сводка за неделю/месяц (/report 7, /report 30)\n"
+        "• Межбиржевые спреды фандинга (/spreads)\n"
         "• Умные тренды и алерты",
         reply_markup=MAIN_MENU
     )
 
 async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    rates = get_funding_rates()
+    settings = registry.get(update.effective_chat.id)
+    rates = (await get_snapshot()).rates
     lines = ["📊 Текущие ставки:"]
-    for pair in sorted(user_settings["monitored_pairs"]):
+    for pair in sorted(settings.monitored_pairs):
         fr = rates.get(pair)
         if fr is not None:
-            lines.append(format_funding_rate(pair, fr))
+            lines.append(format_funding_rate(pair, fr, settings))
+            stats = analytics.get(pair)
+            if stats is not None:
+                lines.append(format_stats(stats))
         else:
             lines.append(f"{pair}: ❌ Недоступен")
     await update.message.reply_text("\n".join(lines), reply_markup=MAIN_MENU)
 
+def render_all_page(view, order: str, page: int, settings: ChatSettings):
+    pages = max(1, -(-len(view) // PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    offset = page * PAGE_SIZE
+    lines = [f"🌐 Все пары — сортировка: {ORDERS[order]} ({offset + 1}–{min(offset + PAGE_SIZE, len(view))} из {len(view)}):"]
+    for pair, fr in view.page(order, offset, PAGE_SIZE):
+        lines.append(format_funding_rate(pair, fr, settings))
+    order_buttons = [
+        InlineKeyboardButton(("• " if key == order else "") + label, callback_data=f"all:{key}:0")
+        for key, label in (("abs", "|FR|"), ("neg", "🔻"), ("pos", "🔺"), ("change", "Δ"))
+    ]
+    keyboard = [order_buttons, page_buttons(f"all:{order}", page, pages)]
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+def page_buttons(prefix: str, page: int, pages: int):
+    return [
+        InlineKeyboardButton("◀️", callback_data=f"{prefix}:{max(page - 1, 0)}"),
+        InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="noop"),
+        InlineKeyboardButton("▶️", callback_data=f"{prefix}:{min(page + 1, pages - 1)}"),
+    ]
+
+def all_page_view(snapshot, order: str, page: int, chat_id: int):
+    # Страница зависит от снимка, трендов аналитики и порогов чата (значки)
+    key = ("all", snapshot.fetched_at, analytics.version, registry.version(chat_id), order, page)
+    return view_cache.get(key, lambda: render_all_page(ranked_view(snapshot), order, page, registry.get(chat_id)))
+
 async def cmd_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    rates = get_funding_rates()
-    if not rates:
+    snapshot = await get_snapshot()
+    if not snapshot:
         await update.message.reply_text("❌ Не удалось загрузить пары.", reply_markup=MAIN_MENU)
         return
-    lines = ["🌐 Все пары (топ-20 по |ставка|):"]
-    sorted_pairs = sorted(rates.items(), key=lambda x: abs(x[1]), reverse=True)
-    for pair, fr in sorted_pairs[:20]:
-        lines.append(format_funding_rate(pair, fr))
+    await message_views.reply(update.message, all_page_view(snapshot, "abs", 0, update.effective_chat.id))
+
+async def show_all_page(update: Update, context: ContextTypes.DEFAULT_TYPE, order: str, page: int):
+    # Листание использует тот же снимок, что и первая страница
+    snapshot = await get_snapshot(allow_stale=True)
+    if not snapshot or order not in ORDERS:
+        await update.callback_query.answer("Не удалось загрузить пары.", show_alert=True)
+        return
+    await message_views.edit(update.callback_query, all_page_view(snapshot, order, page, update.effective_chat.id))
+
+async def cmd_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Неделя/месяц — слияние дневных сводок с диска, без пересчёта по истории
+    try:
+        days = int(context.args[0]) if context.args else 0
+    except ValueError:
+        await update.message.reply_text("Использование: /report [дни], например: /report 7")
+        return
+    summary = rollups.summary(days, include_current=True)
+    title = "📆 Сводка за сегодня" if days <= 1 else f"📆 Сводка за {days} дн."
+    settings = registry.get(update.effective_chat.id)
+    await update.message.reply_text(format_report(title, summary, settings), reply_markup=MAIN_MENU)
+
+async def cmd_spreads(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not venues.enabled:
+        await update.message.reply_text("Подключена одна биржа — добавьте другие в EXCHANGES.", reply_markup=MAIN_MENU)
+        return
+    table = venues.table
+    if table is None or time.time() - table.fetched_at > UPDATE_INTERVAL:
+        table = await venues.refresh()
+    lines = [f"↔️ Межбиржевые спреды фандинга за {SPREAD_HOURS} ч ({', '.join(table.venues) or '—'}):"]
+    for spread in table.top(PAGE_SIZE):
+        lines.append(f"{spread.contract}: {spread.spread:.6f}")
+        lines.append(format_spread_legs(spread))
+    if not len(table):
+        lines.append("Нет контрактов, доступных хотя бы на двух биржах.")
+    missing = venues.missing()
+    if missing:
+        lines.append(f"⚠️ Не ответили в этом цикле: {', '.join(missing)}")
     await update.message.reply_text("\n".join(lines), reply_markup=MAIN_MENU)
 
 async def cmd_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
-        await update.message.reply_text("UsageId: /history BTC_USDT")
+        await update.message.reply_text("Использование: /history BTC_USDT [часы]")
         return
     pair = context.args[0].upper()
-    if pair not in history or not history[pair]:
+    if pair not in history_store:
         await update.message.reply_text(f"Нет истории для {pair}.")
         return
-    lines = [f"📈 История {pair} (последние {len(history[pair])} записей):"]
-    for ts, rate in history[pair]:
-        marker = " ⚠️" if (rate <= user_settings["critical_fr_long"] or rate >= user_settings["critical_fr_short"]) else ""
-        lines.append(f"{ts} → {rate:.6f}{marker}")
+    if len(context.args) > 1:
+        try:
+            hours = float(context.args[1])
+        except ValueError:
+            await update.message.reply_text("Часы должны быть числом, например: /history BTC_USDT 24")
+            return
+        timestamps, rates = history_store.range(pair, start=time.time() - hours * 3600)
+        title = f"📈 История {pair} за {hours:g} ч ({len(rates)} записей):"
+        # Длинный диапазон прореживаем до HISTORY_ROWS строк
+        step = max(1, -(-len(rates) // HISTORY_ROWS))
+        timestamps, rates = timestamps[::step], rates[::step]
+    else:
+        timestamps, rates = history_store.last(pair, HISTORY_ROWS)
+        title = f"📈 История {pair} (последние {len(rates)} записей):"
+    settings = registry.get(update.effective_chat.id)
+    lines = [title]
+    for ts, rate in zip(timestamps, rates):
+        marker = " ⚠️" if (rate <= settings.critical_fr_long or rate >= settings.critical_fr_short) else ""
+        lines.append(f"{datetime.utcfromtimestamp(int(ts)).strftime('%d.%m %H:%M')} → {rate:.6f}{marker}")
     await update.message.reply_text("\n".join(lines), reply_markup=MAIN_MENU)
 
 # --- Settings ---
-async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Получаем список всех доступных пар (можно кэшировать)
-    rates = get_funding_rates()
-    all_pairs = sorted(rates.keys()) if rates else []
-
+def render_settings(settings: ChatSettings):
     # Формируем текст настроек
     settings_text = (
         "🔔 Настройки:\n"
-        f"Алерты: {'✅ ВКЛ' if user_settings['alerts_enabled'] else '❌ ВЫКЛ'}\n"
-        f"Пары: {', '.join(sorted(user_settings['monitored_pairs'])) or '—'}\n\n"
+        f"Алерты: {'✅ ВКЛ' if settings.alerts_enabled else '❌ ВЫКЛ'}\n"
+        f"Пары: {', '.join(sorted(settings.monitored_pairs)) or '—'}\n\n"
         "Нажмите на кнопки для изменения:"
     )
 
     # Кнопки для LONG/SHORT
     long_buttons = [
         InlineKeyboardButton("➖", callback_data="long_dec"),
-        InlineKeyboardButton(f"{user_settings['critical_fr_long']:.4f}", callback_data="long_val"),
+        InlineKeyboardButton(f"{settings.critical_fr_long:.4f}", callback_data="long_val"),
         InlineKeyboardButton("➕", callback_data="long_inc")
     ]
     short_buttons = [
         InlineKeyboardButton("➖", callback_data="short_dec"),
-        InlineKeyboardButton(f"{user_settings['critical_fr_short']:.4f}", callback_data="short_val"),
+        InlineKeyboardButton(f"{settings.critical_fr_short:.4f}", callback_data="short_val"),
         InlineKeyboardButton("➕", callback_data="short_inc")
     ]
 
@@ -315,116 +571,132 @@ async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [reset_button]
     ]
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return settings_text, InlineKeyboardMarkup(keyboard)
+
+def settings_view(chat_id: int):
+    # Версии настроек уникальны по всем чатам; 0 — общий экран настроек по умолчанию
+    return view_cache.get(("settings", registry.version(chat_id)), lambda: render_settings(registry.get(chat_id)))
 
-    if isinstance(update, Update):
-        await update.message.reply_text(settings_text, reply_markup=reply_markup)
+async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    view = settings_view(update.effective_chat.id)
+    if update.callback_query is None:
+        await message_views.reply(update.message, view)
     else:
-        await update.callback_query.edit_message_text(settings_text, reply_markup=reply_markup)
+        await message_views.edit(update.callback_query, view)
 
 # --- INLINE MENU FOR ADDING PAIR ---
-async def show_add_pair_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    rates = get_funding_rates()
-    if not rates:
-        await update.callback_query.answer("Не удалось загрузить пары.", show_alert=True)
-        return
-
-    # Берём топ-20 пар по абсолютной ставке
-    sorted_pairs = sorted(rates.items(), key=lambda x: abs(x[1]), reverse=True)
-    top_pairs = [p for p, _ in sorted_pairs[:20]]
+def render_add_pair_menu(view, page: int):
+    # Пары по убыванию абсолютной ставки, постранично
+    pages = max(1, -(-len(view) // PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
 
     # Создаём кнопки для выбора пары
     buttons = []
-    for pair in top_pairs:
+    for pair, _ in view.page("abs", page * PAGE_SIZE, PAGE_SIZE):
         buttons.append([InlineKeyboardButton(pair, callback_data=f"add_{pair}")])
 
-    # Добавляем кнопку "Назад"
+    # Листание и кнопка "Назад"
+    buttons.append(page_buttons("addpage", page, pages))
     buttons.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_settings")])
 
-    reply_markup = InlineKeyboardMarkup(buttons)
-    await update.callback_query.edit_message_text("Выберите пару для добавления:", reply_markup=reply_markup)
+    return "Выберите пару для добавления:", InlineKeyboardMarkup(buttons)
 
-# --- INLINE MENU FOR REMOVING PAIR ---
-async def show_remove_pair_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not user_settings["monitored_pairs"]:
-        await update.callback_query.answer("Нет отслеживаемых пар.", show_alert=True)
+async def show_add_pair_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0):
+    snapshot = await get_snapshot(allow_stale=True)
+    if not snapshot:
+        await update.callback_query.answer("Не удалось загрузить пары.", show_alert=True)
         return
+    view = view_cache.get(("add", snapshot.fetched_at, page), lambda: render_add_pair_menu(ranked_view(snapshot), page))
+    await message_views.edit(update.callback_query, view)
 
+# --- INLINE MENU FOR REMOVING PAIR ---
+def render_remove_pair_menu(settings: ChatSettings):
     buttons = []
-    for pair in sorted(user_settings["monitored_pairs"]):
+    for pair in sorted(settings.monitored_pairs):
         buttons.append([InlineKeyboardButton(pair, callback_data=f"remove_{pair}")])
 
     buttons.append([InlineKeyboardButton("🔙 Назад", callback_data="back_to_settings")])
 
-    reply_markup = InlineKeyboardMarkup(buttons)
-    await update.callback_query.edit_message_text("Выберите пару для удаления:", reply_markup=reply_markup)
+    return "Выберите пару для удаления:", InlineKeyboardMarkup(buttons)
+
+async def show_remove_pair_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    if not registry.get(chat_id).monitored_pairs:
+        await update.callback_query.answer("Нет отслеживаемых пар.", show_alert=True)
+        return
+    view = view_cache.get(("remove", registry.version(chat_id)), lambda: render_remove_pair_menu(registry.get(chat_id)))
+    await message_views.edit(update.callback_query, view)
 
 # --- Button Handler ---
+THRESHOLD_STEPS = {
+    "long_dec": ("long", -0.0001),
+    "long_inc": ("long", 0.0001),
+    "short_dec": ("short", -0.0001),
+    "short_inc": ("short", 0.0001),
+}
+
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     data = query.data
+    chat_id = update.effective_chat.id
+    settings = registry.get(chat_id)
 
     if data == "toggle_alerts":
-        user_settings["alerts_enabled"] = not user_settings["alerts_enabled"]
-        save_to_gist()
-    elif data == "long_val":
-        pass  # Это просто отображение значения
-    elif data == "short_val":
-        pass  # Это просто отображение значения
-    elif data == "long_dec":
-        user_settings["critical_fr_long"] -= 0.0001
-        save_to_gist()
-    elif data == "long_inc":
-        user_settings["critical_fr_long"] += 0.0001
-        save_to_gist()
-    elif data == "short_dec":
-        user_settings["critical_fr_short"] -= 0.0001
-        save_to_gist()
-    elif data == "short_inc":
-        user_settings["critical_fr_short"] += 0.0001
-        save_to_gist()
+        registry.set_alerts(chat_id, not settings.alerts_enabled)
+        persistence.mark_dirty()
+    elif data in ("long_val", "short_val", "noop"):
+        return  # Это просто отображение значения
+    elif data in THRESHOLD_STEPS:
+        side, step = THRESHOLD_STEPS[data]
+        if side == "long":
+            registry.set_thresholds(chat_id, long=settings.critical_fr_long + step)
+        else:
+            registry.set_thresholds(chat_id, short=settings.critical_fr_short + step)
+        # Серия нажатий — одна правка и одна запись состояния (debounce PersistenceEngine)
+        persistence.mark_dirty()
+        message_views.defer(query, lambda: settings_view(chat_id))
+        return
+    elif data.startswith("all:"):
+        _, order, page = data.split(":")
+        await show_all_page(update, context, order, int(page))
+        return
+    elif data.startswith("addpage:"):
+        await show_add_pair_menu(update, context, int(data.split(":")[1]))
+        return
     elif data == "add_pair_menu":
-        await show_add_pair_menu(query, context)
+        await show_add_pair_menu(update, context)
         return
     elif data == "remove_pair_menu":
-        await show_remove_pair_menu(query, context)
+        await show_remove_pair_menu(update, context)
         return
     elif data.startswith("add_"):
         pair = data[4:]  # Убираем "add_"
-        user_settings["monitored_pairs"].add(pair)
-        save_to_gist()
+        registry.add_pair(chat_id, pair)
+        persistence.mark_dirty()
         await query.answer(f"✅ {pair} добавлена", show_alert=True)
-        await show_settings(query, context)
+        await show_settings(update, context)
         return
     elif data.startswith("remove_"):
         pair = data[7:]  # Убираем "remove_"
-        if pair in user_settings["monitored_pairs"]:
-            user_settings["monitored_pairs"].discard(pair)
-            save_to_gist()
+        if registry.remove_pair(chat_id, pair):
+            persistence.mark_dirty()
             await query.answer(f"✅ {pair} удалена", show_alert=True)
         else:
             await query.answer(f"❌ {pair} не в списке", show_alert=True)
-        await show_settings(query, context)
+        await show_settings(update, context)
         return
     elif data == "reset_settings":
-        user_settings.update({
-            "alerts_enabled": True,
-            "critical_fr_long": DEFAULT_LONG,
-            "critical_fr_short": DEFAULT_SHORT,
-            "monitored_pairs": set(DEFAULT_MONITORED_PAIRS)
-        })
-        history.clear()
-        daily_stats.update({"alerts_count": 0, "max_long": [0, ""], "max_short": [0, ""]})
-        save_to_gist()
+        registry.reset(chat_id)
+        persistence.mark_dirty()
         await query.answer("Настройки сброшены к значениям по умолчанию.", show_alert=True)
-        await show_settings(query, context)
+        await show_settings(update, context)
         return
     elif data == "back_to_settings":
-        await show_settings(query, context)
+        await show_settings(update, context)
         return
 
-    await show_settings(query, context)
+    await show_settings(update, context)
 
 # --- Misc ---
 async def handle_unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -434,17 +706,65 @@ async def handle_unknown(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Неизвестная команда. Используйте меню.", reply_markup=MAIN_MENU)
 
 # --- Init ---
+def warm_state():
+    # Тяжёлая часть старта — чтение истории и прогрев аналитики; идёт в потоке
+    history_store.load()
+    analytics.warm(history_store)
+
+async def startup(application: Application):
+    """Первый цикл алертов сразу после запуска: снимок, история и сверка состояния — параллельно"""
+    started = time.perf_counter()
+    snapshot = reconcile = None
+    if persistence.cache is not None or not persistence.loaded:
+        since = registry.mark()
+        reconcile = asyncio.create_task(persistence.reconcile(lambda data: apply_state(data, since)))
+    try:
+        snapshot, _ = await asyncio.gather(fetch_cycle(), asyncio.to_thread(warm_state))
+        if reconcile is not None and persistence.cached is None:
+            # Без локальной копии чаты и состояние алертов известны только после сверки. Если бэкенд
+            # недоступен, первая попытка укладывается в HTTP_TIMEOUT: цикл идёт на настройках
+            # по умолчанию, а сверка повторяется в фоне (запись на бэкенд до неё не идёт)
+            await asyncio.wait([reconcile], timeout=HTTP_TIMEOUT)
+        evaluate_alerts(snapshot)
+        logger.info(f"✅ First alert cycle in {time.perf_counter() - started:.2f}s after start")
+    except Exception as e:
+        logger.error(f"❌ First alert cycle failed: {e}")
+    finally:
+        if ticker_stream is not None:
+            ticker_stream.start()
+            if venues.enabled:
+                application.job_queue.run_repeating(refresh_venues, interval=UPDATE_INTERVAL)
+        else:
+            schedule_poll(application.job_queue, snapshot, time.perf_counter() - started)
+
 async def post_init(application: Application):
     if application.job_queue is None:
         logger.error("Job queue is None!")
         return
-    application.job_queue.run_repeating(send_funding_alerts, interval=UPDATE_INTERVAL, first=10)
-    application.job_queue.run_daily(send_daily_report, time=timedelta(hours=9))  # 09:00 UTC
+    global startup_task
+    # Первый запрос к бирже уходит до запуска остальных служб и не ждёт интервала опроса
+    startup_task = asyncio.create_task(startup(application))
+    persistence.start()
+    dispatcher.start(application.bot)
+    metrics_publisher.start()
+    application.job_queue.run_daily(send_daily_report, time=rollups.report_time)
     logger.info("✅ Мониторинг и ежедневный отчёт запущены.")
 
+async def post_shutdown(application: Application):
+    if ticker_stream is not None:
+        await ticker_stream.stop()
+    await message_views.flush()
+    await dispatcher.stop()
+    await persistence.close()
+    await metrics_publisher.stop()
+    rollups.checkpoint()
+    history_store.close()
+    await asyncio.to_thread(channel.close)
+    await close_client()
+
 def main():
     global application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
 
     # Commands
     application.add_handler(CommandHandler("start", cmd_start))
@@ -452,6 +772,8 @@ def main():
     application.add_handler(CommandHandler("status", cmd_status))
     application.add_handler(CommandHandler("all", cmd_all))
     application.add_handler(CommandHandler("history", cmd_history))
+    application.add_handler(CommandHandler("report", cmd_report))
+    application.add_handler(CommandHandler("spreads", cmd_spreads))
 
     # Menu buttons
     application.add_handler(MessageHandler(filters.Regex("^🔔 Настройки$"), show_settings))
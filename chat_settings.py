@@ -0,0 +1,268 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+
+INF = float("inf")
+
+# Общий счётчик версий: реестр, пересобранный из сохранённого состояния, не повторяет старые
+_versions = count(1)
+
+
+class ChatSettings:
+    """Настройки одного чата: алерты, пороги LONG/SHORT и отслеживаемые пары"""
+
+    __slots__ = ("alerts_enabled", "critical_fr_long", "critical_fr_short", "monitored_pairs")
+
+    def __init__(self, alerts_enabled: bool, critical_fr_long: float, critical_fr_short: float, monitored_pairs):
+        self.alerts_enabled = alerts_enabled
+        self.critical_fr_long = critical_fr_long
+        self.critical_fr_short = critical_fr_short
+        self.monitored_pairs = set(monitored_pairs)
+
+    def to_dict(self) -> dict:
+        return {
+            "alerts_enabled": self.alerts_enabled,
+            "critical_fr_long": self.critical_fr_long,
+            "critical_fr_short": self.critical_fr_short,
+            "monitored_pairs": sorted(self.monitored_pairs),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, defaults: "ChatSettings"):
+        return cls(
+            data.get("alerts_enabled", defaults.alerts_enabled),
+            data.get("critical_fr_long", defaults.critical_fr_long),
+            data.get("critical_fr_short", defaults.critical_fr_short),
+            data.get("monitored_pairs", defaults.monitored_pairs),
+        )
+
+    def copy(self) -> "ChatSettings":
+        return ChatSettings(self.alerts_enabled, self.critical_fr_long, self.critical_fr_short, self.monitored_pairs)
+
+
+class _PairSubscribers:
+    """Подписчики одного контракта, отсортированные по своим порогам"""
+
+    __slots__ = ("chats", "longs", "shorts")
+
+    def __init__(self):
+        self.chats = set()
+        self.longs = []   # (порог LONG, chat_id)
+        self.shorts = []  # (порог SHORT, chat_id)
+
+    def add(self, chat_id: int, settings: ChatSettings):
+        self.chats.add(chat_id)
+        insort(self.longs, (settings.critical_fr_long, chat_id))
+        insort(self.shorts, (settings.critical_fr_short, chat_id))
+
+    def remove(self, chat_id: int, settings: ChatSettings):
+        self.chats.discard(chat_id)
+        del self.longs[bisect_left(self.longs, (settings.critical_fr_long, chat_id))]
+        del self.shorts[bisect_left(self.shorts, (settings.critical_fr_short, chat_id))]
+
+    def long_hits(self, rate: float):
+        # ставка <= порога: все чаты с порогом от rate и выше
+        return self.longs[bisect_left(self.longs, (rate, -INF)):]
+
+    def short_hits(self, rate: float):
+        # ставка >= порога: все чаты с порогом до rate включительно
+        return self.shorts[:bisect_right(self.shorts, (rate, INF))]
+
+
+class ChatRegistry:
+    """Настройки всех чатов и обратный индекс «контракт -> подписанные чаты».
+
+    Чат регистрируется по /start или при первом изменении настроек; до этого
+    ему показываются настройки по умолчанию с выключенными алертами — он
+    ни на что не подписан. Каждое изменение чата выдаёт ему новую версию
+    (по ней кэшируются экраны) и перепроверку порогов в следующем цикле.
+    """
+
+    def __init__(self, defaults: ChatSettings):
+        self.defaults = defaults
+        self.chats = {}
+        self.versions = {}
+        self._index = {}
+        self._touched = set()  # чаты, изменённые после прошлого match_thresholds
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self.chats
+
+    def __len__(self) -> int:
+        return len(self.chats)
+
+    def get(self, chat_id: int) -> ChatSettings:
+        """Настройки чата (для незарегистрированного — копия настроек по умолчанию без алертов)"""
+        settings = self.chats.get(chat_id)
+        if settings is None:
+            settings = self.defaults.copy()
+            settings.alerts_enabled = False
+        return settings
+
+    def version(self, chat_id: int) -> int:
+        """Версия настроек чата; 0 — настройки по умолчанию"""
+        return self.versions.get(chat_id, 0)
+
+    def ensure(self, chat_id: int) -> ChatSettings:
+        settings = self.chats.get(chat_id)
+        if settings is None:
+            settings = self.chats[chat_id] = self.defaults.copy()
+            self._touch(chat_id)
+            self._subscribe_all(chat_id, settings)
+        return settings
+
+    def pairs(self):
+        """Контракты, на которые подписан хотя бы один чат"""
+        return self._index.keys()
+
+    def subscribers(self, pair: str):
+        subs = self._index.get(pair)
+        return subs.chats if subs is not None else ()
+
+    def _touch(self, chat_id: int):
+        self.versions[chat_id] = next(_versions)
+        self._touched.add(chat_id)
+
+    def mark(self) -> int:
+        """Отметка версий: changed_since(mark) — чаты, изменённые после неё"""
+        return next(_versions)
+
+    def changed_since(self, mark: int):
+        return [chat_id for chat_id, version in self.versions.items() if version > mark]
+
+    # --- index maintenance ---
+
+    def _subscribe(self, chat_id: int, settings: ChatSettings, pair: str):
+        subs = self._index.get(pair)
+        if subs is None:
+            subs = self._index[pair] = _PairSubscribers()
+        subs.add(chat_id, settings)
+
+    def _unsubscribe(self, chat_id: int, settings: ChatSettings, pair: str):
+        subs = self._index[pair]
+        subs.remove(chat_id, settings)
+        if not subs.chats:
+            del self._index[pair]
+
+    def _subscribe_all(self, chat_id: int, settings: ChatSettings):
+        for pair in settings.monitored_pairs:
+            self._subscribe(chat_id, settings, pair)
+
+    def _unsubscribe_all(self, chat_id: int, settings: ChatSettings):
+        for pair in settings.monitored_pairs:
+            self._unsubscribe(chat_id, settings, pair)
+
+    # --- mutations ---
+
+    def add_pair(self, chat_id: int, pair: str) -> bool:
+        settings = self.ensure(chat_id)
+        if pair in settings.monitored_pairs:
+            return False
+        settings.monitored_pairs.add(pair)
+        self._subscribe(chat_id, settings, pair)
+        self._touch(chat_id)
+        return True
+
+    def remove_pair(self, chat_id: int, pair: str) -> bool:
+        settings = self.ensure(chat_id)
+        if pair not in settings.monitored_pairs:
+            return False
+        self._unsubscribe(chat_id, settings, pair)
+        settings.monitored_pairs.discard(pair)
+        self._touch(chat_id)
+        return True
+
+    def set_thresholds(self, chat_id: int, long: float = None, short: float = None):
+        settings = self.ensure(chat_id)
+        # Пороги входят в ключи индекса — переиндексируем пары чата
+        self._unsubscribe_all(chat_id, settings)
+        if long is not None:
+            settings.critical_fr_long = round(long, 8)
+        if short is not None:
+            settings.critical_fr_short = round(short, 8)
+        self._subscribe_all(chat_id, settings)
+        self._touch(chat_id)
+        return settings
+
+    def set_alerts(self, chat_id: int, enabled: bool):
+        self.ensure(chat_id).alerts_enabled = enabled
+        self._touch(chat_id)
+
+    def put(self, chat_id: int, settings: ChatSettings) -> ChatSettings:
+        """Настройки чата целиком (перенос из другого реестра при слиянии состояний)"""
+        old = self.chats.get(chat_id)
+        if old is not None:
+            self._unsubscribe_all(chat_id, old)
+        settings = self.chats[chat_id] = settings.copy()
+        self._subscribe_all(chat_id, settings)
+        self._touch(chat_id)
+        return settings
+
+    def reset(self, chat_id: int):
+        settings = self.ensure(chat_id)
+        self._unsubscribe_all(chat_id, settings)
+        settings = self.chats[chat_id] = self.defaults.copy()
+        self._subscribe_all(chat_id, settings)
+        self._touch(chat_id)
+        return settings
+
+    # --- fan-out ---
+
+    def match_thresholds(self, rates: dict, previous: dict = None):
+        """Сработавшие пороги: (chat_id, pair, side, rate, threshold).
+
+        Проверяются контракты с подписчиками, ставка которых изменилась (для
+        каждого — бинарный поиск по отсортированным порогам подписчиков), плюс
+        все пары чатов, чьи настройки менялись с прошлого вызова: новый порог
+        или новая пара могут дать пересечение и при той же ставке. Повторы
+        гасит AlertStateMachine.
+        """
+        previous = previous or {}
+        touched, self._touched = self._touched, set()
+        for pair, subs in self._index.items():
+            rate = rates.get(pair)
+            if rate is None or previous.get(pair) == rate:
+                continue
+            for threshold, chat_id in subs.long_hits(rate):
+                if self.chats[chat_id].alerts_enabled:
+                    yield chat_id, pair, "long", rate, threshold
+            for threshold, chat_id in subs.short_hits(rate):
+                if self.chats[chat_id].alerts_enabled:
+                    yield chat_id, pair, "short", rate, threshold
+        for chat_id in touched:
+            settings = self.chats.get(chat_id)
+            if settings is None or not settings.alerts_enabled:
+                continue
+            for pair in settings.monitored_pairs:
+                rate = rates.get(pair)
+                if rate is None or previous.get(pair) != rate:
+                    continue  # уже проверена выше
+                if rate <= settings.critical_fr_long:
+                    yield chat_id, pair, "long", rate, settings.critical_fr_long
+                if rate >= settings.critical_fr_short:
+                    yield chat_id, pair, "short", rate, settings.critical_fr_short
+
+    # --- persistence ---
+
+    def to_dict(self) -> dict:
+        return {str(chat_id): settings.to_dict() for chat_id, settings in self.chats.items()}
+
+    @classmethod
+    def from_dict(cls, data: dict, defaults: ChatSettings):
+        registry = cls(defaults)
+        index = registry._index
+        for chat_id, raw in (data or {}).items():
+            chat_id = int(chat_id)
+            settings = registry.chats[chat_id] = ChatSettings.from_dict(raw, defaults)
+            registry._touch(chat_id)
+            for pair in settings.monitored_pairs:
+                subs = index.get(pair)
+                if subs is None:
+                    subs = index[pair] = _PairSubscribers()
+                subs.chats.add(chat_id)
+                subs.longs.append((settings.critical_fr_long, chat_id))
+                subs.shorts.append((settings.critical_fr_short, chat_id))
+        # Сортируем один раз при загрузке вместо вставки по одному
+        for subs in index.values():
+            subs.longs.sort()
+            subs.shorts.sort()
+        return registry
@@ -7,15 +7,121 @@ APP_NAME = os.getenv("APP_NAME", "frate4bot-monitor")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8300632768:AAHo4A6wLly2LrxHysgdAAgTFIeGsNrm7CM")
 ALERT_CHAT_ID = int(os.getenv("ALERT_CHAT_ID", "7295147132"))
 
+# Telegram rate limits (https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this)
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))  # сообщений в секунду на бота
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))      # сообщений в секунду в личный чат
+TG_GROUP_RATE = float(os.getenv("TG_GROUP_RATE", "20"))   # сообщений в минуту в группу
+TG_CONCURRENCY = int(os.getenv("TG_CONCURRENCY", "8"))
+TG_QUEUE_SIZE = int(os.getenv("TG_QUEUE_SIZE", "10000"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))
+
 # Gate.io
+GATEIO_BASE_URL = os.getenv("GATEIO_BASE_URL", "https://api.gateio.ws/api/v4")
+GATEIO_WS_URL = os.getenv("GATEIO_WS_URL", "wss://fx-ws.gateio.ws/v4/ws/usdt")
 GATEIO_API_KEY = os.getenv("GATEIO_API_KEY", "625abba4fb6164fb87db1ae951e8120e")
 GATEIO_SECRET_KEY = os.getenv("GATEIO_SECRET_KEY", "a1d4c5467d8f01a4c0cc19a7f906984b578cad01432459d75f76a8bc3dd5f7f8")
 
+# Storage: gist | file | sqlite (по умолчанию gist, если задан токен, иначе file)
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_GIST_ID = os.getenv("GITHUB_GIST_ID")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gist" if GITHUB_TOKEN and GITHUB_GIST_ID else "file")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "frate4bot-data.json")
+PERSIST_DEBOUNCE = float(os.getenv("PERSIST_DEBOUNCE", "15"))
+STATE_CACHE_PATH = os.getenv("STATE_CACHE_PATH", "frate4bot-state.json")  # локальная копия gist для быстрого старта
+
 # Monitoring
 MONITORED_PAIRS = os.getenv("MONITORED_PAIRS", "BTC_USDT,ETH_USDT,SOL_USDT").split(",")
 CRITICAL_FR_LONG = float(os.getenv("CRITICAL_FR_LONG", "-0.001"))
 CRITICAL_FR_SHORT = float(os.getenv("CRITICAL_FR_SHORT", "0.001"))
-UPDATE_INTERVAL = int(os.getenv("UPDATE_INTERVAL", "90"))
+UPDATE_INTERVAL = int(os.getenv("UPDATE_INTERVAL", "90"))  # запись в историю не чаще; опрос — см. POLL_*
+
+# Adaptive polling (интервал — доля времени до ближайшего начисления фандинга, в пределах MIN..MAX).
+# MAX не больше UPDATE_INTERVAL: окна истории, аналитики и z-score считаются в точках с шагом
+# UPDATE_INTERVAL — реже опрашивать нельзя, иначе ночью то же окно покрывало бы втрое больше времени
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "15"))
+POLL_MAX_INTERVAL = min(float(os.getenv("POLL_MAX_INTERVAL", str(UPDATE_INTERVAL))), UPDATE_INTERVAL)
+POLL_RATIO = float(os.getenv("POLL_RATIO", "0.1"))
+POLL_JITTER = float(os.getenv("POLL_JITTER", "0.1"))   # ± доля интервала
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "3"))  # ошибок Gate.io подряд до размыкания
+BREAKER_BASE = float(os.getenv("BREAKER_BASE", "30"))          # первая пауза, дальше x2
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", "600"))
+
+# Alert rules (проверяются по всему рынку; MARKET_ALERTS — слать и по неотслеживаемым парам)
+ALERT_CHANGE = float(os.getenv("ALERT_CHANGE", "0.0005"))
+ALERT_ZSCORE = float(os.getenv("ALERT_ZSCORE", "4"))
+ALERT_OUTLIER = float(os.getenv("ALERT_OUTLIER", "10"))
+ALERT_WINDOW = int(os.getenv("ALERT_WINDOW", "20"))
+MARKET_ALERTS = os.getenv("MARKET_ALERTS", "False").lower() == "true"
+ALERT_COOLDOWN = float(os.getenv("ALERT_COOLDOWN", "3600"))     # секунд до повторного взвода
+ALERT_HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS", "0.0001"))  # полоса снятия порога
+
+# Analytics (скользящая статистика по окну ALERT_WINDOW точек; периоды EMA — в точках)
+ANALYTICS_SPANS = [int(s) for s in os.getenv("ANALYTICS_SPANS", "5,20,60").split(",")]
+TREND_THRESHOLD = float(os.getenv("TREND_THRESHOLD", "0.00001"))  # изменение по наклону за окно для 🔼/🔽
+
+# Exchanges (межбиржевые спреды фандинга; gateio — основной источник, остальные опрашиваются параллельно)
+EXCHANGES = os.getenv("EXCHANGES", "gateio").split(",")
+BINANCE_BASE_URL = os.getenv("BINANCE_BASE_URL", "https://fapi.binance.com")
+BYBIT_BASE_URL = os.getenv("BYBIT_BASE_URL", "https://api.bybit.com")
+OKX_BASE_URL = os.getenv("OKX_BASE_URL", "https://www.okx.com")
+OKX_INSTRUMENTS = os.getenv("OKX_INSTRUMENTS", ",".join(p.replace("_", "-") + "-SWAP" for p in MONITORED_PAIRS)).split(",")
+VENUE_TIMEOUT = float(os.getenv("VENUE_TIMEOUT", "5"))   # не успела — биржа пропускает цикл
+ALERT_SPREAD = float(os.getenv("ALERT_SPREAD", "0.001"))  # межбиржевой спред ставок за 8 ч для алерта
+
+# History (сегменты — в общем канале, см. SHARED_BACKEND; в redis это ~16 байт на контракт
+# за точку: 600 контрактов за 3 дня при UPDATE_INTERVAL=90 — около 28 МБ)
+HISTORY_DAYS = float(os.getenv("HISTORY_DAYS", "3"))
+
+# Daily report и суточные сводки по контрактам (сутки закрываются в DAILY_REPORT_TIME UTC)
+DAILY_REPORT_TIME = os.getenv("DAILY_REPORT_TIME", "09:00")
+# Закрытые дни — в общем канале (SHARED_BACKEND), как история: около 0.6 КБ
+# на контракт в сутки, 600 контрактов за 35 дней — около 12 МБ
+ROLLUP_DAYS = float(os.getenv("ROLLUP_DAYS", "35"))          # хранение закрытых дней (месячная сводка)
+ROLLUP_ACCURACY = float(os.getenv("ROLLUP_ACCURACY", "0.02"))  # относительная точность квантилей
+
+# HTTP
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# Cache
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL", "30"))
+
+# Экраны бота (настройки, /all): готовые тексты и клавиатуры
+VIEW_CACHE_SIZE = int(os.getenv("VIEW_CACHE_SIZE", "1024"))       # отрисованных экранов
+VIEW_MESSAGES = int(os.getenv("VIEW_MESSAGES", "10000"))          # сообщений, чей экран помним
+EDIT_DEBOUNCE = float(os.getenv("EDIT_DEBOUNCE", "0.5"))          # серия ➕/➖ — одна правка
+
+# Streaming (WebSocket futures.tickers вместо опроса REST)
+STREAM_MODE = os.getenv("STREAM_MODE", "False").lower() == "true"
+STREAM_APPLY_INTERVAL = float(os.getenv("STREAM_APPLY_INTERVAL", "1"))   # как часто публиковать снимок
+STREAM_STALE_TIMEOUT = float(os.getenv("STREAM_STALE_TIMEOUT", "30"))    # тишина в канале = разрыв
+STREAM_MAX_BACKOFF = float(os.getenv("STREAM_MAX_BACKOFF", "60"))
+
+# Общие данные воркер -> webapp.py: file — каталог SHARED_DIR (оба процесса на одной машине),
+# redis — REDIS_URL (Heroku: web и worker — разные дайно без общего диска)
+REDIS_URL = os.getenv("REDIS_URL")
+SHARED_BACKEND = os.getenv("SHARED_BACKEND", "redis" if REDIS_URL else "file")
+SHARED_DIR = os.getenv("SHARED_DIR", "shared")
+
+# Metrics (воркер публикует в общий канал, webapp.py отдаёт /metrics и /health)
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "5"))
+HEALTH_MAX_AGE = float(os.getenv("HEALTH_MAX_AGE", str(3 * max(UPDATE_INTERVAL, POLL_MAX_INTERVAL))))  # без цикла дольше — stale
+
+# Web API (воркер публикует снимок в общий канал, webapp.py отдаёт /api/funding)
+API_CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", "256"))   # готовых ответов на снимок
+API_MAX_LIMIT = int(os.getenv("API_MAX_LIMIT", "1000"))    # строк в /api/funding
+API_MAX_POINTS = int(os.getenv("API_MAX_POINTS", "500"))   # точек в /history
+
+# Live stream (SSE /api/stream); WEB_CONNECTIONS — --worker-connections gunicorn из Procfile
+WEB_CONNECTIONS = int(os.getenv("WEB_CONNECTIONS", "5000"))
+SSE_BUFFER = int(os.getenv("SSE_BUFFER", "120"))              # событий для возобновления по Last-Event-ID
+SSE_POLL_INTERVAL = float(os.getenv("SSE_POLL_INTERVAL", "1"))  # как часто проверять снимок воркера
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+# Соединений на процесс: с запасом под /api/funding и /health, иначе поток занимает все слоты gunicorn
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", str(WEB_CONNECTIONS * 4 // 5)))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "5000"))
 
 # Debug
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
@@ -1,22 +1,251 @@
-import requests
-from config import GATEIO_API_KEY, GATEIO_SECRET_KEY
+import asyncio
+import logging
+import random
+import time
 
-BASE_URL = "https://api.gateio.ws/api/v4"
+import httpx
+from config import (
+    GATEIO_API_KEY,
+    GATEIO_SECRET_KEY,
+    GATEIO_BASE_URL,
+    HTTP_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    SNAPSHOT_TTL,
+    BREAKER_THRESHOLD,
+    BREAKER_BASE,
+    BREAKER_MAX_BACKOFF,
+)
+from ticker_parser import ContractIndex, parse_tickers
+import metrics
 
-def get_funding_rates():
-    """Получает ставки ТОЛЬКО для быстрых тикеров (публичный эндпоинт)"""
-    endpoint = "/futures/usdt/tickers"
-    url = BASE_URL + endpoint
-    headers = {"Accept": "application/json"}
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
+BASE_URL = GATEIO_BASE_URL
+TICKERS_ENDPOINT = "/futures/usdt/tickers"
+HEADERS = {"Accept": "application/json"}
+
+logger = logging.getLogger(__name__)
+
+# Один долгоживущий пул соединений на процесс (keep-alive к api.gateio.ws)
+_client = None
+# Индексы контрактов стабильны между снимками
+_contracts = ContractIndex()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Возвращает общий асинхронный HTTP-клиент, создавая его при первом вызове"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers=HEADERS,
+            timeout=httpx.Timeout(HTTP_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    """Закрывает пул соединений (вызывается при остановке бота)"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+async def _request_tickers(timeout: float = None):
+    with metrics.timer("fetch_seconds"):
+        response = await get_client().get(
+            TICKERS_ENDPOINT,
+            timeout=httpx.Timeout(timeout) if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        )
         response.raise_for_status()
-        data = response.json()
-        return {item["contract"]: float(item["funding_rate"]) for item in data}
+    metrics.observe("fetch_bytes", len(response.content))
+    # Разбираем сырые байты: без response.json() и промежуточных dict на тикер
+    with metrics.timer("parse_seconds"):
+        return parse_tickers(response.content, _contracts)
+
+
+async def fetch_funding_rates(timeout: float = None) -> dict:
+    """Асинхронно получает ставки для всех USDT-фьючерсов, не блокируя event loop"""
+    try:
+        return (await _request_tickers(timeout)).rates()
     except Exception as e:
-        print(f"[ERROR] Failed to fetch funding rates: {e}")
+        logger.error(f"Failed to fetch funding rates: {e!r}")
         return {}
 
-def get_all_pairs():
-    """То же, что и get_funding_rates, но для отображения всех пар в /all"""
-    return get_funding_rates()
+
+# ======================
+# SNAPSHOT CACHE
+# ======================
+
+class FundingSnapshot:
+    """Неизменяемый снимок ставок рынка с временем загрузки (epoch, UTC).
+
+    table — колоночный TickerTable последнего REST-запроса (mark price,
+    объём, время следующего начисления); None, если снимок собран не из REST.
+    previous — ставки снимка, который этот сменил в кэше (изменение за цикл).
+    """
+
+    __slots__ = ("rates", "fetched_at", "table", "previous")
+
+    def __init__(self, rates: dict, fetched_at: float, table=None, previous: dict = None):
+        self.rates = rates
+        self.fetched_at = fetched_at
+        self.table = table
+        self.previous = previous
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def __bool__(self):
+        return bool(self.rates)
+
+
+EMPTY_SNAPSHOT = FundingSnapshot({}, 0.0)
+
+
+class CircuitBreaker:
+    """Размыкается после threshold ошибок подряд: запросы к бирже не идут до retry_at.
+
+    Пауза растёт вдвое с каждой следующей ошибкой (до max_backoff), со случайным
+    разбросом 0.5–1.0, чтобы рестарты не били в биржу одновременно.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, base: float = BREAKER_BASE,
+                 max_backoff: float = BREAKER_MAX_BACKOFF):
+        self.threshold = threshold
+        self.base = base
+        self.max_backoff = max_backoff
+        self.failures = 0   # ошибок подряд
+        self.retry_at = 0.0
+
+    @property
+    def open(self) -> bool:
+        return self.failures >= self.threshold and time.time() < self.retry_at
+
+    def success(self):
+        if self.failures >= self.threshold:
+            logger.info("✅ Gate.io is back, circuit closed")
+        self.failures = 0
+        self.retry_at = 0.0
+        metrics.set_gauge("fetch_circuit_open", 0)
+
+    def failure(self):
+        self.failures += 1
+        if self.failures < self.threshold:
+            return
+        backoff = min(self.base * 2 ** (self.failures - self.threshold), self.max_backoff)
+        backoff *= random.uniform(0.5, 1.0)
+        self.retry_at = time.time() + backoff
+        if self.failures == self.threshold:
+            metrics.inc("fetch_circuit_trips_total")
+        metrics.set_gauge("fetch_circuit_open", 1)
+        logger.warning(f"Gate.io failed {self.failures} times in a row, next attempt in {backoff:.0f}s")
+
+
+class SnapshotCache:
+    """TTL-кэш снимка рынка: одновременные промахи объединяются в один запрос к бирже.
+
+    fetch — корутина, возвращающая TickerTable. Пока breaker разомкнут,
+    отдаётся последний снимок без обращения к бирже.
+    """
+
+    def __init__(self, fetch, ttl: float, breaker: CircuitBreaker = None):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._snapshot = None
+        self._inflight = None
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "short_circuits": 0}
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def put(self, rates: dict, fetched_at: float = None, table=None) -> FundingSnapshot:
+        if table is None and self._snapshot is not None:
+            # Потоковые обновления меняют только ставки — остальные поля берём из последнего REST
+            table = self._snapshot.table
+        previous = self._snapshot.rates if self._snapshot is not None else None
+        self._snapshot = FundingSnapshot(rates, time.time() if fetched_at is None else fetched_at, table, previous)
+        return self._snapshot
+
+    async def _refresh(self) -> FundingSnapshot:
+        try:
+            table = await self._fetch()
+            self.breaker.success()
+            return self.put(table.rates(), table=table)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.breaker.failure()
+            metrics.inc("fetch_errors_total")
+            logger.error(f"Failed to refresh funding snapshot: {e!r}")
+            # При ошибке отдаём последний удачный снимок (если есть)
+            return self._snapshot or EMPTY_SNAPSHOT
+        finally:
+            self._inflight = None
+
+    def _start_refresh(self):
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        return self._inflight
+
+    async def get(self, max_age: float = None, allow_stale: bool = False) -> FundingSnapshot:
+        """Возвращает снимок не старше max_age (по умолчанию TTL).
+
+        allow_stale=True — устаревший снимок тоже подходит: он отдаётся сразу,
+        а обновление запускается в фоне.
+        """
+        limit = self.ttl if max_age is None else max_age
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if snapshot.age <= limit:
+                self.stats["hits"] += 1
+                return snapshot
+            if allow_stale:
+                self.stats["stale_hits"] += 1
+                self._start_refresh()
+                return snapshot
+
+        if self._inflight is None and self.breaker.open:
+            self.stats["short_circuits"] += 1
+            return snapshot or EMPTY_SNAPSHOT
+        if self._inflight is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(self._start_refresh())
+
+
+_cache = SnapshotCache(_request_tickers, SNAPSHOT_TTL)
+
+
+async def get_snapshot(max_age: float = None, allow_stale: bool = False) -> FundingSnapshot:
+    """Снимок ставок через общий кэш (см. SnapshotCache.get)"""
+    return await _cache.get(max_age=max_age, allow_stale=allow_stale)
+
+
+def circuit_breaker() -> CircuitBreaker:
+    """Состояние запросов к Gate.io (для планировщика опроса)"""
+    return _cache.breaker
+
+
+def current_snapshot():
+    """Последний снимок из кэша без обращения к бирже (None — ещё не загружен)"""
+    return _cache.snapshot
+
+
+def put_snapshot(rates: dict, fetched_at: float = None) -> FundingSnapshot:
+    """Заменяет снимок в кэше (используется потоковым режимом)"""
+    return _cache.put(rates, fetched_at)
+
+
+def cache_stats() -> dict:
+    """Счётчики попаданий/промахов/объединённых запросов кэша"""
+    return dict(_cache.stats)
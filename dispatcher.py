@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from config import (
+    TG_GLOBAL_RATE,
+    TG_CHAT_RATE,
+    TG_GROUP_RATE,
+    TG_CONCURRENCY,
+    TG_QUEUE_SIZE,
+    TG_MAX_RETRIES,
+)
+import metrics
+
+MESSAGE_LIMIT = 4096  # максимальная длина сообщения Telegram
+DROP_LOG_INTERVAL = 60  # не чаще раза в минуту: при переполнении сброс идёт на каждом сообщении
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до следующего токена (0 — токен уже взят)"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            wait = self.delay()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def refund(self):
+        """Вернуть взятый токен (отправка не состоялась)"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity and time.monotonic() >= self.paused_until
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT):
+    """Режет текст по строкам на части не длиннее limit"""
+    parts, current = [], ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            parts.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def format_digest(alerts) -> str:
+    if len(alerts) == 1:
+        return alerts[0]
+    return f"🚨 Алерты за цикл ({len(alerts)}):\n\n" + "\n\n".join(alerts)
+
+
+class MessageDispatcher:
+    """Очередь исходящих сообщений с лимитами Telegram.
+
+    Глобальный bucket (TG_GLOBAL_RATE/с) и bucket на чат (TG_CHAT_RATE/с,
+    для групп — TG_GROUP_RATE/мин), не больше TG_CONCURRENCY одновременных
+    запросов, повтор после RetryAfter (429) и сетевых ошибок. Сообщения
+    (и части длинного дайджеста) одного чата уходят строго по порядку очереди.
+
+    У каждого чата своя очередь; воркеры берут из общей очереди id готовых
+    чатов, и чат в каждый момент обслуживает не больше одного воркера.
+    Группа, упёршаяся в свой лимит, занимает один воркер, а не все.
+    """
+
+    def __init__(self, bot=None, concurrency: int = TG_CONCURRENCY, max_queue: int = TG_QUEUE_SIZE,
+                 max_retries: int = TG_MAX_RETRIES):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.max_queue = max_queue
+        self.global_bucket = TokenBucket(TG_GLOBAL_RATE)  # без всплесков: ровно TG_GLOBAL_RATE/с
+        self._chat_buckets = {}
+        self._chats = {}  # chat_id -> deque сообщений; есть ключ — чат в ready или у воркера
+        self._ready = asyncio.Queue()  # id чатов, ждущих свободного воркера
+        self._depth = 0
+        self._drops_logged = (0.0, 0)  # (когда, stats["dropped"] на тот момент)
+        self._workers = []
+        self.stats = {"enqueued": 0, "sent": 0, "retries": 0, "dropped": 0, "failed": 0,
+                      "latency_sum": 0.0, "latency_max": 0.0}
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    def metrics(self) -> dict:
+        sent = self.stats["sent"]
+        return dict(self.stats, queue_depth=self.depth,
+                    latency_avg=self.stats["latency_sum"] / sent if sent else 0.0)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 10000:
+                # Забываем простаивающие чаты, чтобы словарь не рос бесконечно
+                self._chat_buckets = {c: b for c, b in self._chat_buckets.items() if not b.idle}
+            # Отрицательный chat_id — группа/канал: лимит в минуту
+            rate = TG_GROUP_RATE / 60 if chat_id < 0 else TG_CHAT_RATE
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate)
+        return bucket
+
+    def enqueue(self, chat_id: int, text: str, **kwargs) -> bool:
+        """Ставит сообщение в очередь; False — очередь переполнена, сообщение отброшено"""
+        for part in split_message(text):
+            if self._depth >= self.max_queue:
+                self._drop(chat_id)
+                return False
+            messages = self._chats.get(chat_id)
+            if messages is None:
+                messages = self._chats[chat_id] = deque()
+                self._ready.put_nowait(chat_id)
+            messages.append((part, kwargs, time.monotonic()))
+            self._depth += 1
+            self.stats["enqueued"] += 1
+        return True
+
+    def _drop(self, chat_id: int):
+        self.stats["dropped"] += 1
+        metrics.inc("telegram_dropped_total")
+        now = time.monotonic()
+        logged_at, logged = self._drops_logged
+        if now - logged_at >= DROP_LOG_INTERVAL:
+            logger.warning(f"Outbound queue full, dropped {self.stats['dropped'] - logged} messages "
+                           f"(last to {chat_id})")
+            self._drops_logged = (now, self.stats["dropped"])
+
+    def send_digest(self, chat_id: int, alerts) -> bool:
+        """Все алерты чата за цикл — одним сообщением"""
+        return self.enqueue(chat_id, format_digest(alerts))
+
+    def start(self, bot=None):
+        if bot is not None:
+            self.bot = bot
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = 5.0):
+        """Дожидается отправки очереди (не дольше timeout) и останавливает воркеры"""
+        try:
+            await asyncio.wait_for(self._ready.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Outbound queue not drained, {self.depth} messages lost")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            messages = self._chats[chat_id]
+            text, kwargs, enqueued_at = messages[0]
+            try:
+                await self._deliver(chat_id, text, kwargs, enqueued_at)
+            except Exception as e:
+                self.stats["failed"] += 1
+                metrics.inc("telegram_failed_total")
+                logger.error(f"Failed to send message to {chat_id}: {e}")
+            finally:
+                # Следующее сообщение чата — только после доставки (или отказа от) предыдущего;
+                # чат встаёт в конец ready, чтобы не держать воркер, пока другие ждут
+                messages.popleft()
+                self._depth -= 1
+                if messages:
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._chats[chat_id]
+                self._ready.task_done()
+
+    async def _acquire(self, bucket: TokenBucket):
+        # Оба токена берутся в один момент прямо перед отправкой: токен чата, взятый
+        # до ожидания глобального, позволил бы двум сообщениям в чат уйти почти подряд
+        while True:
+            await bucket.acquire()
+            wait = self.global_bucket.delay()
+            if not wait:
+                return
+            bucket.refund()
+            await asyncio.sleep(wait)
+
+    async def _deliver(self, chat_id: int, text: str, kwargs: dict, enqueued_at: float):
+        bucket = self._chat_bucket(chat_id)
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(bucket)
+            started = time.monotonic()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            except RetryAfter as e:
+                self.stats["retries"] += 1
+                metrics.inc("telegram_retries_total")
+                logger.warning(f"Flood control for {chat_id}: retry in {e.retry_after}s")
+                bucket.pause(float(e.retry_after))
+                continue
+            except (Forbidden, BadRequest):
+                raise  # бот заблокирован или чат не существует — повтор не поможет
+            except TelegramError:
+                if attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                metrics.inc("telegram_retries_total")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            metrics.observe("telegram_send_seconds", time.monotonic() - started)
+            metrics.inc("telegram_sent_total")
+            latency = time.monotonic() - enqueued_at
+            self.stats["sent"] += 1
+            self.stats["latency_sum"] += latency
+            self.stats["latency_max"] = max(self.stats["latency_max"], latency)
+            return
+        raise TelegramError(f"Gave up after {self.max_retries} retries")
@@ -0,0 +1,366 @@
+import asyncio
+import logging
+import re
+import time
+from collections import namedtuple
+
+import numpy as np
+from config import EXCHANGES, BINANCE_BASE_URL, BYBIT_BASE_URL, OKX_BASE_URL, OKX_INSTRUMENTS, VENUE_TIMEOUT
+from data_fetcher import get_client, get_snapshot
+from ticker_parser import loads
+import metrics
+
+# Множитель в тикере (1000PEPEUSDT): ставка фандинга от размера контракта не зависит
+_MULTIPLIER = re.compile(r"^(1000000|10000|1000)(?=[A-Z])")
+_MISSING = object()
+
+# Интервал фандинга у бирж разный (1/4/8 ч, по контракту): ставки сравниваются
+# в пересчёте на SPREAD_HOURS. Без данных об интервале — DEFAULT_INTERVAL
+SPREAD_HOURS = 8
+DEFAULT_INTERVAL = 8
+INTERVALS_TTL = 3600  # интервалы меняются редко — перечитываются раз в час
+
+# Спред по контракту (за SPREAD_HOURS): long на бирже с меньшей ставкой, short — с большей
+Spread = namedtuple("Spread", "contract spread low_venue low high_venue high venues")
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolMap:
+    """Таблица «тикер биржи -> канонический BASE_QUOTE» (формат Gate.io).
+
+    Символ разбирается один раз за жизнь процесса, дальше — поиск в dict;
+    None в таблице — символ не сравнивается (не USDT, не бессрочный).
+    """
+
+    def __init__(self, split):
+        self._split = split
+        self.table = {}
+
+    def _compute(self, native: str):
+        parts = self._split(native)
+        canonical = None
+        if parts is not None:
+            base, quote = parts
+            canonical = f"{_MULTIPLIER.sub('', base)}_{quote}"
+        self.table[native] = canonical
+        return canonical
+
+    def get(self, native: str):
+        canonical = self.table.get(native, _MISSING)
+        return self._compute(native) if canonical is _MISSING else canonical
+
+    def normalize(self, rates: dict) -> dict:
+        table = self.table
+        normalized = {}
+        for native, rate in rates.items():
+            canonical = table.get(native, _MISSING)
+            if canonical is _MISSING:
+                canonical = self._compute(native)
+            if canonical is not None:
+                normalized[canonical] = rate
+        return normalized
+
+
+# ======================
+# ADAPTERS
+# ======================
+# Адаптер — атрибут name, корутина fetch() -> {канонический контракт: ставка за выплату}
+# и intervals — {канонический контракт: интервал фандинга в часах} после fetch().
+
+class ExchangeAdapter:
+    """Биржа с одним публичным эндпоинтом на все контракты.
+
+    Интервалы фандинга — отдельный эндпоинт (intervals_endpoint), читается
+    не чаще INTERVALS_TTL; ошибка не роняет цикл — остаются прошлые значения.
+    """
+
+    name = ""
+    endpoint = ""
+    params = None
+    intervals_endpoint = None
+    intervals_params = None
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.symbols = SymbolMap(self.split)
+        self.intervals = {}
+        self._intervals_at = 0.0
+
+    @staticmethod
+    def split(native: str):
+        # BTCUSDT -> (BTC, USDT); датированные (BTCUSDT_240628) и не-USDT не сравниваем
+        if native.endswith("USDT") and native.isalnum():
+            return native[:-4], "USDT"
+        return None
+
+    def parse(self, raw: bytes) -> dict:
+        raise NotImplementedError
+
+    def parse_intervals(self, raw: bytes) -> dict:
+        """{тикер биржи: интервал в часах}"""
+        raise NotImplementedError
+
+    async def _refresh_intervals(self):
+        if self.intervals_endpoint is None or time.time() - self._intervals_at < INTERVALS_TTL:
+            return
+        try:
+            response = await get_client().get(self.base_url + self.intervals_endpoint, params=self.intervals_params)
+            response.raise_for_status()
+            self.intervals = self.symbols.normalize(self.parse_intervals(response.content))
+            self._intervals_at = time.time()
+        except Exception as e:
+            logger.warning(f"{self.name}: failed to fetch funding intervals: {e!r}")
+
+    async def _fetch_rates(self) -> dict:
+        response = await get_client().get(self.base_url + self.endpoint, params=self.params)
+        response.raise_for_status()
+        return self.symbols.normalize(self.parse(response.content))
+
+    async def fetch(self) -> dict:
+        rates, _ = await asyncio.gather(self._fetch_rates(), self._refresh_intervals())
+        return rates
+
+
+class GateAdapter(ExchangeAdapter):
+    """Gate.io — основной источник: берёт снимок из общего кэша, без второго запроса.
+    Интервалы — funding_interval (секунды) из списка контрактов"""
+
+    name = "Gate"
+    intervals_endpoint = "/futures/usdt/contracts"
+
+    def __init__(self, base_url: str = ""):
+        # Пустой base_url: путь относительный, общий клиент уже настроен на Gate.io
+        super().__init__(base_url)
+
+    @staticmethod
+    def split(native: str):
+        base, _, quote = native.rpartition("_")
+        return (base, quote) if base else None
+
+    def parse_intervals(self, raw: bytes) -> dict:
+        return {item["name"]: item["funding_interval"] / 3600 for item in loads(raw) if item.get("funding_interval")}
+
+    async def _fetch_rates(self) -> dict:
+        return self.symbols.normalize((await get_snapshot()).rates)
+
+
+class BinanceAdapter(ExchangeAdapter):
+    """USDⓈ-M фьючерсы: lastFundingRate из premiumIndex (все символы одним запросом)"""
+
+    name = "Binance"
+    endpoint = "/fapi/v1/premiumIndex"
+    intervals_endpoint = "/fapi/v1/fundingInfo"
+
+    def __init__(self, base_url: str = BINANCE_BASE_URL):
+        super().__init__(base_url)
+
+    def parse(self, raw: bytes) -> dict:
+        return {item["symbol"]: float(item["lastFundingRate"]) for item in loads(raw) if item.get("lastFundingRate")}
+
+    def parse_intervals(self, raw: bytes) -> dict:
+        # В fundingInfo только символы с нестандартным интервалом, остальные — 8 ч
+        return {item["symbol"]: float(item["fundingIntervalHours"]) for item in loads(raw)
+                if item.get("fundingIntervalHours")}
+
+
+class BybitAdapter(ExchangeAdapter):
+    """Linear-контракты: fundingRate из v5 market/tickers"""
+
+    name = "Bybit"
+    endpoint = "/v5/market/tickers"
+    params = {"category": "linear"}
+    # fundingInterval — в минутах; 1000 — максимум страницы (linear-контрактов меньше)
+    intervals_endpoint = "/v5/market/instruments-info"
+    intervals_params = {"category": "linear", "limit": 1000}
+
+    def __init__(self, base_url: str = BYBIT_BASE_URL):
+        super().__init__(base_url)
+
+    def parse(self, raw: bytes) -> dict:
+        items = loads(raw)["result"]["list"]
+        return {item["symbol"]: float(item["fundingRate"]) for item in items if item.get("fundingRate")}
+
+    def parse_intervals(self, raw: bytes) -> dict:
+        items = loads(raw)["result"]["list"]
+        return {item["symbol"]: item["fundingInterval"] / 60 for item in items if item.get("fundingInterval")}
+
+
+class OkxAdapter(ExchangeAdapter):
+    """Бессрочные свопы OKX: у funding-rate нет запроса на все инструменты,
+    поэтому опрашиваются OKX_INSTRUMENTS (по умолчанию — MONITORED_PAIRS) параллельно.
+    Интервал — из того же ответа (nextFundingTime - fundingTime)"""
+
+    name = "OKX"
+    endpoint = "/api/v5/public/funding-rate"
+
+    def __init__(self, base_url: str = OKX_BASE_URL, instruments=OKX_INSTRUMENTS):
+        super().__init__(base_url)
+        self.instruments = [i for i in instruments if i]
+
+    @staticmethod
+    def split(native: str):
+        # BTC-USDT-SWAP -> (BTC, USDT)
+        parts = native.split("-")
+        if len(parts) == 3 and parts[2] == "SWAP":
+            return parts[0], parts[1]
+        return None
+
+    def parse(self, raw: bytes) -> dict:
+        return {item["instId"]: float(item["fundingRate"]) for item in loads(raw)["data"] if item.get("fundingRate")}
+
+    def parse_intervals(self, raw: bytes) -> dict:
+        return {item["instId"]: (int(item["nextFundingTime"]) - int(item["fundingTime"])) / 3_600_000
+                for item in loads(raw)["data"] if item.get("fundingTime") and item.get("nextFundingTime")}
+
+    async def _fetch_one(self, instrument: str):
+        response = await get_client().get(self.base_url + self.endpoint, params={"instId": instrument})
+        response.raise_for_status()
+        return self.parse(response.content), self.parse_intervals(response.content)
+
+    async def fetch(self) -> dict:
+        # Ошибка одного инструмента не роняет биржу: его ставки просто нет в этом цикле
+        results = await asyncio.gather(*(self._fetch_one(i) for i in self.instruments), return_exceptions=True)
+        rates, intervals = {}, {}
+        failed = {}
+        for instrument, result in zip(self.instruments, results):
+            if isinstance(result, Exception):
+                failed[instrument] = result
+            else:
+                rates.update(result[0])
+                intervals.update(result[1])
+        if failed:
+            if len(failed) == len(self.instruments):
+                raise next(iter(failed.values()))
+            instrument, error = next(iter(failed.items()))
+            logger.warning(f"{self.name}: {len(failed)} of {len(self.instruments)} instruments failed "
+                           f"({instrument}: {error!r})")
+        self.intervals.update(self.symbols.normalize(intervals))
+        return self.symbols.normalize(rates)
+
+
+ADAPTERS = {"gateio": GateAdapter, "binance": BinanceAdapter, "bybit": BybitAdapter, "okx": OkxAdapter}
+
+
+def make_adapters(names=EXCHANGES):
+    adapters = []
+    for name in names:
+        factory = ADAPTERS.get(name.strip().lower())
+        if factory is None:
+            logger.warning(f"Unknown exchange in EXCHANGES: {name!r}")
+            continue
+        adapters.append(factory())
+    return adapters
+
+
+# ======================
+# SPREADS
+# ======================
+
+class SpreadTable:
+    """Межбиржевые спреды одного цикла: матрица контракт x биржа, ранжирование один раз.
+
+    intervals — {биржа: {контракт: интервал фандинга в часах}}: ставка за выплату
+    пересчитывается на SPREAD_HOURS, иначе спред мерил бы разницу интервалов.
+    """
+
+    def __init__(self, venue_rates: dict, fetched_at: float = 0.0, intervals: dict = None):
+        self.venues = list(venue_rates)
+        self.fetched_at = fetched_at
+        intervals = intervals or {}
+        index = {}
+        for rates in venue_rates.values():
+            for contract in rates:
+                index.setdefault(contract, len(index))
+        matrix = np.full((len(index), len(self.venues)), np.nan)
+        for column, (venue, rates) in enumerate(venue_rates.items()):
+            rows = np.fromiter((index[c] for c in rates), dtype=np.intp, count=len(rates))
+            hours = intervals.get(venue, {})
+            scale = np.fromiter((SPREAD_HOURS / hours.get(c, DEFAULT_INTERVAL) for c in rates), dtype=np.float64,
+                                count=len(rates))
+            matrix[rows, column] = np.fromiter(rates.values(), dtype=np.float64, count=len(rates)) * scale
+
+        # Сравниваются только контракты, торгующиеся хотя бы на двух биржах
+        listed = np.count_nonzero(~np.isnan(matrix), axis=1)
+        keep = np.flatnonzero(listed >= 2)
+        names = list(index)
+        self.contracts = [names[i] for i in keep.tolist()]
+        matrix = matrix[keep]
+        self.listed = listed[keep]
+        rows = np.arange(len(keep))
+        self.low_venue = np.nanargmin(matrix, axis=1) if len(keep) else np.empty(0, dtype=np.intp)
+        self.high_venue = np.nanargmax(matrix, axis=1) if len(keep) else np.empty(0, dtype=np.intp)
+        self.low = matrix[rows, self.low_venue]
+        self.high = matrix[rows, self.high_venue]
+        self.spread = self.high - self.low
+        self.order = np.argsort(-self.spread, kind="stable")
+        self.index = {contract: i for i, contract in enumerate(self.contracts)}
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    def _row(self, i: int) -> Spread:
+        return Spread(self.contracts[i], float(self.spread[i]), self.venues[self.low_venue[i]], float(self.low[i]),
+                      self.venues[self.high_venue[i]], float(self.high[i]), int(self.listed[i]))
+
+    def get(self, contract: str):
+        i = self.index.get(contract)
+        return self._row(i) if i is not None else None
+
+    def top(self, k: int = 20):
+        return [self._row(i) for i in self.order[:k].tolist()]
+
+    def as_dict(self) -> dict:
+        """{контракт: спред} — для правила SpreadRule"""
+        return dict(zip(self.contracts, self.spread.tolist()))
+
+
+class VenueBoard:
+    """Ставки всех бирж за цикл: запросы параллельно, у каждой биржи свой таймаут.
+
+    Биржа, не ответившая за timeout (или с ошибкой), выпадает из цикла —
+    остальные не ждут её и не используют её прошлые ставки.
+    """
+
+    def __init__(self, adapters, timeout: float = VENUE_TIMEOUT):
+        self.adapters = list(adapters)
+        self.timeout = timeout
+        self.rates = {}   # биржа -> {контракт: ставка за выплату} последнего цикла
+        self.table = None
+        self.stats = {a.name: {"ok": 0, "timeouts": 0, "errors": 0, "seconds": None} for a in self.adapters}
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.adapters) > 1
+
+    async def _fetch(self, adapter):
+        stats = self.stats[adapter.name]
+        started = time.perf_counter()
+        try:
+            rates = await asyncio.wait_for(adapter.fetch(), self.timeout)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            metrics.inc("venue_timeouts_total")
+            logger.warning(f"{adapter.name}: no funding rates within {self.timeout:g}s, skipped this cycle")
+            return None
+        except Exception as e:
+            stats["errors"] += 1
+            metrics.inc("venue_errors_total")
+            logger.error(f"{adapter.name}: failed to fetch funding rates: {e!r}")
+            return None
+        elapsed = time.perf_counter() - started
+        stats["ok"] += 1
+        stats["seconds"] = round(elapsed, 3)
+        metrics.observe("venue_fetch_seconds", elapsed)
+        return rates
+
+    async def refresh(self) -> SpreadTable:
+        results = await asyncio.gather(*(self._fetch(adapter) for adapter in self.adapters))
+        self.rates = {adapter.name: rates for adapter, rates in zip(self.adapters, results) if rates}
+        intervals = {adapter.name: adapter.intervals for adapter in self.adapters if adapter.name in self.rates}
+        self.table = SpreadTable(self.rates, time.time(), intervals)
+        return self.table
+
+    def missing(self):
+        """Биржи, выпавшие из последнего цикла"""
+        return [a.name for a in self.adapters if a.name not in self.rates]
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from config import API_CACHE_SIZE, API_MAX_LIMIT, API_MAX_POINTS
+from history_store import HistoryStore
+from ranking import ORDERS, RankedView
+from ticker_parser import dumps, loads
+
+# Поля тикера в ответе /api/funding (кроме contract и funding_rate)
+FIELDS = ("funding_rate_indicative", "mark_price", "volume_24h_quote", "funding_next_apply")
+_TABLE_COLUMNS = ("funding_rate_indicative", "mark_price", "volume", "next_apply")
+SNAPSHOT_KEY = "snapshot.json"
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(data) -> bytes:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _bounded(name: str, value, maximum: int) -> int:
+    """Параметр запроса в [1, maximum]; не задан — maximum"""
+    if value is None:
+        return maximum
+    if value < 1:
+        raise ValueError(f"{name} must be at least 1")
+    return min(value, maximum)
+
+
+def _clean(value):
+    # NaN не является валидным JSON для браузеров
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+
+# ======================
+# WORKER: публикация снимка
+# ======================
+
+def snapshot_payload(snapshot, alerts=()) -> dict:
+    """Снимок в колоночном виде: ставки из кэша плюс поля последнего REST-ответа.
+
+    alerts — рыночные срабатывания цикла (Trigger), для live-потока webapp.py.
+    """
+    contracts = list(snapshot.rates)
+    payload = {"fetched_at": snapshot.fetched_at, "contract": contracts,
+               "funding_rate": list(snapshot.rates.values()),
+               "alerts": [[t.contract, t.rule, float(t.value), float(t.ref)] for t in alerts]}
+    if snapshot.previous:
+        # Ставка прошлого цикла — для сортировки по изменению в webapp.py
+        payload["previous_rate"] = [snapshot.previous.get(c) for c in contracts]
+    table = snapshot.table
+    if table is not None:
+        # Строка таблицы для каждого контракта снимка (-1 — контракта нет в таблице)
+        rows = np.full(len(table.index), -1, dtype=np.int64)
+        rows[table.ids] = np.arange(len(table))
+        index = table.index.index
+        ids = np.fromiter((index.get(c, -1) for c in contracts), dtype=np.int64, count=len(contracts))
+        positions = np.where(ids >= 0, rows[np.maximum(ids, 0)], -1)
+        missing = positions < 0
+        for field, column in zip(FIELDS, _TABLE_COLUMNS):
+            values = getattr(table, column)[np.maximum(positions, 0)].tolist()
+            payload[field] = [None if m else v for m, v in zip(missing.tolist(), values)]
+    return payload
+
+
+def publish_snapshot(snapshot, channel, alerts=()):
+    """Кладёт снимок для webapp.py в общий канал (shared.py)"""
+    channel.put(SNAPSHOT_KEY, dumps(snapshot_payload(snapshot, alerts)))
+
+
+# ======================
+# WEB: ответы API
+# ======================
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "last_modified")
+
+    def __init__(self, body: bytes, last_modified: float):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.last_modified = last_modified
+
+
+class FundingAPI:
+    """Ответы /api/funding и /api/funding/<contract>/history.
+
+    Снимок перечитывается из канала только при смене его версии; ответы
+    считаются один раз на снимок (LRU по параметрам запроса) и отдаются
+    с ETag/Last-Modified, так что повторный запрос клиента — 304 без тела.
+    История читается из канала при первом запросе к ней, а не при старте.
+    """
+
+    def __init__(self, channel, store: HistoryStore = None, cache_size: int = API_CACHE_SIZE):
+        self.channel = channel
+        self.store = store
+        self.cache_size = cache_size
+        self._store_loaded = False
+        self._store_lock = threading.Lock()
+        self._version = None
+        self._payload = None
+        self._view = None
+        self._rows = None
+        self._cache = OrderedDict()
+        self.stats = {"reloads": 0, "hits": 0, "misses": 0}
+
+    def _reload(self) -> bool:
+        try:
+            version = self.channel.version(SNAPSHOT_KEY)
+            if version is None or version == self._version:
+                return self._payload is not None
+            payload = loads(self.channel.get(SNAPSHOT_KEY))
+        except Exception as e:
+            # Канал недоступен или снимок битый — отвечаем прошлым снимком
+            logger.warning(f"Failed to read snapshot: {e!r}")
+            return self._payload is not None
+        rates = dict(zip(payload["contract"], payload["funding_rate"]))
+        previous = {c: p for c, p in zip(payload["contract"], payload.get("previous_rate") or ()) if p is not None}
+        self._view = RankedView(rates, payload["fetched_at"], previous)
+        change = self._view.change()
+        columns = [payload.get(field) or [None] * len(rates) for field in FIELDS]
+        self._rows = [
+            {"contract": contract, "funding_rate": rate,
+             **{field: _clean(column[i]) for field, column in zip(FIELDS, columns)},
+             "change": float(change[i])}
+            for i, (contract, rate) in enumerate(rates.items())
+        ]
+        self._payload = payload
+        self._version = version
+        self._cache.clear()
+        self.stats["reloads"] += 1
+        if self._store_loaded:
+            try:
+                self.store.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh history: {e!r}")
+        return True
+
+    def _history(self) -> HistoryStore:
+        if not self._store_loaded:
+            with self._store_lock:
+                if not self._store_loaded:
+                    self.store.load()
+                    self._store_loaded = True
+        return self.store
+
+    @property
+    def fetched_at(self):
+        return self._payload["fetched_at"] if self._payload else None
+
+    @property
+    def rates(self) -> dict:
+        return self._view.rates if self._view is not None else {}
+
+    @property
+    def alerts(self):
+        return self._payload.get("alerts", []) if self._payload else []
+
+    def refresh(self) -> bool:
+        """Перечитывает снимок, если воркер опубликовал новый; False — снимка ещё нет"""
+        return self._reload()
+
+    def _cached(self, key, build):
+        response = self._cache.get(key)
+        if response is not None:
+            self.stats["hits"] += 1
+            self._cache.move_to_end(key)
+            return response
+        self.stats["misses"] += 1
+        response = self._cache[key] = CachedResponse(build(), self.fetched_at)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return response
+
+    def funding(self, sort: str = "abs", limit: int = None, offset: int = 0, contracts=None, q: str = None,
+                min_rate: float = None, max_rate: float = None):
+        """Снимок рынка: фильтр (список контрактов, подстрока, диапазон ставки), сортировка, top-K.
+
+        None — снимок ещё не опубликован воркером.
+        """
+        if sort not in ORDERS:
+            raise ValueError(f"sort must be one of: {', '.join(ORDERS)}")
+        limit = _bounded("limit", limit, API_MAX_LIMIT)
+        if not self._reload():
+            return None
+        offset = max(offset, 0)
+        contracts = frozenset(c.upper() for c in contracts) if contracts else None
+        q = q.upper() if q else None
+        key = ("funding", sort, limit, offset, contracts, q, min_rate, max_rate)
+
+        def build():
+            rows = (self._rows[i] for i in self._view.indices(sort))
+            if contracts is not None:
+                rows = (row for row in rows if row["contract"] in contracts)
+            if q:
+                rows = (row for row in rows if q in row["contract"])
+            if min_rate is not None:
+                rows = (row for row in rows if row["funding_rate"] >= min_rate)
+            if max_rate is not None:
+                rows = (row for row in rows if row["funding_rate"] <= max_rate)
+            rows = list(rows)
+            return _dumps({"fetched_at": self.fetched_at, "sort": sort, "total": len(rows),
+                           "offset": offset, "items": rows[offset:offset + limit]})
+
+        return self._cached(key, build)
+
+    def history(self, contract: str, start: float = None, end: float = None, hours: float = None,
+                points: int = None):
+        """История ставки: диапазон [start, end] или последние hours часов, не больше points точек.
+
+        Прореживание — среднее по равным корзинам; время точки — начало корзины.
+        None — контракт неизвестен.
+        """
+        points = _bounded("points", points, API_MAX_POINTS)
+        if not self._reload() or self.store is None:
+            return None
+        store = self._history()
+        contract = contract.upper()
+        if contract not in store:
+            return None
+        if hours is not None and start is None:
+            # Относительно последней записи, а не текущего времени — ответ стабилен в пределах снимка
+            start = store.last_ts - hours * 3600
+        key = ("history", contract, start, end, points)
+
+        def build():
+            ts, rates = store.range(contract, start, end)
+            if len(rates) > points:
+                edges = np.linspace(0, len(rates), points + 1).astype(np.int64)[:-1]
+                counts = np.diff(np.append(edges, len(rates)))
+                ts, rates = ts[edges], np.add.reduceat(rates, edges) / counts
+            return _dumps({"contract": contract, "fetched_at": self.fetched_at,
+                           "points": [[int(t), float(r)] for t, r in zip(ts, rates)]})
+
+        return self._cached(key, build)
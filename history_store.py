@@ -0,0 +1,229 @@
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from config import HISTORY_DAYS, UPDATE_INTERVAL
+
+# Запись сегмента в канале: индекс контракта, epoch-секунды, ставка
+RECORD = np.dtype([("idx", "<u4"), ("ts", "<u4"), ("rate", "<f8")])
+SEGMENT_SUFFIX = ".seg"
+CONTRACTS_FILE = "contracts.txt"
+
+logger = logging.getLogger(__name__)
+
+
+def default_capacity(days: float = HISTORY_DAYS, interval: float = UPDATE_INTERVAL) -> int:
+    return int(math.ceil(days * 86400 / interval))
+
+
+class _Ring:
+    """Кольцевой буфер фиксированного размера: epoch-время и ставка"""
+
+    __slots__ = ("ts", "rates", "head", "size")
+
+    def __init__(self, capacity: int):
+        self.ts = np.zeros(capacity, dtype=np.uint32)
+        self.rates = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # позиция следующей записи
+        self.size = 0
+
+    def append(self, ts: int, rate: float):
+        self.ts[self.head] = ts
+        self.rates[self.head] = rate
+        self.head = (self.head + 1) % len(self.ts)
+        if self.size < len(self.ts):
+            self.size += 1
+
+    def extend(self, ts, rates):
+        capacity = len(self.ts)
+        ts, rates = ts[-capacity:], rates[-capacity:]
+        positions = (self.head + np.arange(len(ts))) % capacity
+        self.ts[positions] = ts
+        self.rates[positions] = rates
+        self.head = (self.head + len(ts)) % capacity
+        self.size = min(capacity, self.size + len(ts))
+
+    def ordered(self):
+        """Данные в хронологическом порядке (копия только при переполнении)"""
+        if self.size < len(self.ts):
+            return self.ts[:self.size], self.rates[:self.size]
+        return (np.concatenate((self.ts[self.head:], self.ts[:self.head])),
+                np.concatenate((self.rates[self.head:], self.rates[:self.head])))
+
+
+class HistoryStore:
+    """История ставок по всем контрактам: кольцевые буферы в памяти
+    и дневные append-only сегменты в общем канале (shared.py) для восстановления
+    после рестарта. channel=None — только память.
+
+    read_only=True — для других процессов (webapp.py): сегменты не удаляются
+    и не пишутся, новые записи воркера подхватываются через refresh().
+    """
+
+    def __init__(self, channel=None, capacity: int = None, retention_days: float = HISTORY_DAYS,
+                 read_only: bool = False):
+        self.channel = channel
+        self.read_only = read_only
+        self.capacity = capacity or default_capacity(retention_days)
+        self.retention = timedelta(days=retention_days)
+        self._rings = {}
+        self._names = []   # индекс -> контракт (как в contracts.txt)
+        self._index = {}   # контракт -> индекс
+        self._new_names = []  # ещё не записанные в contracts.txt
+        self._segment_day = None
+        self._offsets = {}  # сегмент -> сколько записей уже прочитано
+        self.last_ts = 0
+
+    def __contains__(self, contract: str) -> bool:
+        ring = self._rings.get(contract)
+        return ring is not None and ring.size > 0
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def contracts(self):
+        return list(self._rings)
+
+    # --- channel ---
+
+    def _intern(self, contract: str) -> int:
+        idx = self._index.get(contract)
+        if idx is None:
+            idx = len(self._names)
+            self._names.append(contract)
+            self._index[contract] = idx
+            self._new_names.append(contract)
+        return idx
+
+    def _segments(self):
+        return [name for name in self.channel.keys() if name.endswith(SEGMENT_SUFFIX)]
+
+    def _prune(self, now: datetime):
+        cutoff = (now - self.retention).strftime("%Y%m%d")
+        for name in self._segments():
+            if name[:-len(SEGMENT_SUFFIX)] < cutoff:
+                self.channel.delete(name)
+
+    def _read_names(self):
+        blob = self.channel.get(CONTRACTS_FILE)
+        if blob is not None:
+            self._names = [line for line in blob.decode().split("\n") if line.strip()]
+            self._index = {name: i for i, name in enumerate(self._names)}
+
+    def _read_segments(self):
+        """Записи, появившиеся в сегментах с прошлого чтения"""
+        chunks = []
+        segments = self._segments()
+        for name in segments:
+            count = self.channel.size(name) // RECORD.itemsize  # хвост после сбоя (или недописанный) отбрасываем
+            offset = self._offsets.get(name, 0)
+            if count > offset:
+                blob = self.channel.read(name, offset * RECORD.itemsize, count * RECORD.itemsize)
+                chunks.append(np.frombuffer(blob, dtype=RECORD))
+                self._offsets[name] = count
+        self._offsets = {name: self._offsets[name] for name in segments if name in self._offsets}
+        return np.concatenate(chunks) if chunks else None
+
+    def _ingest(self, records) -> int:
+        records = records[records["idx"] < len(self._names)]
+        if not len(records):
+            return 0
+        # Группируем по контракту, сохраняя порядок времени внутри группы
+        records = records[np.argsort(records["idx"], kind="stable")]
+        indices, starts = np.unique(records["idx"], return_index=True)
+        for idx, group in zip(indices, np.split(records, starts[1:])):
+            ring = self._rings.setdefault(self._names[idx], _Ring(self.capacity))
+            ring.extend(group["ts"], group["rate"])
+        self.last_ts = max(self.last_ts, int(records["ts"].max()))
+        return len(indices)
+
+    def load(self):
+        """Восстанавливает буферы из сегментов за период хранения"""
+        if self.channel is None:
+            return self
+        if not self.read_only:
+            self._prune(datetime.utcnow())
+        self._read_names()
+        records = self._read_segments()
+        if records is None:
+            return self
+        contracts = self._ingest(records)
+        logger.info(f"✅ History restored: {len(records)} samples, {contracts} contracts")
+        return self
+
+    def refresh(self) -> int:
+        """Дочитывает новые записи воркера (для read_only); возвращает их число"""
+        if self.channel is None:
+            return 0
+        records = self._read_segments()
+        if records is None:
+            return 0
+        if records["idx"].max() >= len(self._names):
+            self._read_names()
+        self._ingest(records)
+        return len(records)
+
+    def _write_segment(self, records: np.ndarray, ts: int):
+        if self._new_names:
+            # Имена пишем раньше записей, которые на них ссылаются
+            self.channel.append(CONTRACTS_FILE, "".join(name + "\n" for name in self._new_names).encode())
+            self._new_names.clear()
+        day = datetime.utcfromtimestamp(ts)
+        key = day.strftime("%Y%m%d")
+        if key != self._segment_day:
+            self._segment_day = key
+            self._prune(day)
+        self.channel.append(key + SEGMENT_SUFFIX, records.tobytes())
+
+    def close(self):
+        self._segment_day = None
+
+    # --- write ---
+
+    def append_snapshot(self, rates: dict, ts: float = None) -> bool:
+        """Добавляет снимок рынка; повторный снимок с тем же временем игнорируется"""
+        ts = int(ts if ts is not None else time.time())
+        if self.read_only or ts <= self.last_ts or not rates:
+            return False
+        records = np.empty(len(rates), dtype=RECORD)
+        for i, (contract, rate) in enumerate(rates.items()):
+            ring = self._rings.get(contract)
+            if ring is None:
+                ring = self._rings[contract] = _Ring(self.capacity)
+            ring.append(ts, rate)
+            records[i] = (self._intern(contract), ts, rate)
+        self.last_ts = ts
+        if self.channel is not None:
+            self._write_segment(records, ts)
+        return True
+
+    def clear(self):
+        self.close()
+        self._rings.clear()
+        self.last_ts = 0
+        if self.channel is not None:
+            for name in self._segments():
+                self.channel.delete(name)
+
+    # --- read ---
+
+    def last(self, contract: str, n: int):
+        """Последние n точек (ts, rates) в хронологическом порядке"""
+        ring = self._rings.get(contract)
+        if ring is None or not ring.size:
+            return np.empty(0, np.uint32), np.empty(0, np.float64)
+        n = min(n, ring.size)
+        positions = (ring.head - n + np.arange(n)) % len(ring.ts)
+        return ring.ts[positions], ring.rates[positions]
+
+    def range(self, contract: str, start: float = None, end: float = None):
+        """Точки с start <= ts <= end (epoch-секунды), бинарный поиск по времени"""
+        ring = self._rings.get(contract)
+        if ring is None or not ring.size:
+            return np.empty(0, np.uint32), np.empty(0, np.float64)
+        ts, rates = ring.ordered()
+        lo = 0 if start is None else np.searchsorted(ts, start, side="left")
+        hi = len(ts) if end is None else np.searchsorted(ts, end, side="right")
+        return ts[lo:hi], rates[lo:hi]
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from config import METRICS_INTERVAL
+
+PREFIX = "frate4bot_"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+# name -> (тип, описание, границы корзин для гистограмм)
+DEFINITIONS = {
+    "fetch_seconds": ("histogram", "Gate.io tickers request latency", LATENCY_BUCKETS),
+    "fetch_bytes": ("histogram", "Gate.io tickers payload size", SIZE_BUCKETS),
+    "fetch_errors_total": ("counter", "Failed Gate.io snapshot refreshes", None),
+    "fetch_circuit_open": ("gauge", "1 while Gate.io requests are suspended by the circuit breaker", None),
+    "fetch_circuit_trips_total": ("counter", "Circuit breaker openings", None),
+    "poll_interval_seconds": ("gauge", "Current poll interval (alert cycle budget)", None),
+    "poll_budget_used": ("gauge", "Last alert cycle duration as a fraction of its poll interval", None),
+    "next_settlement_seconds": ("gauge", "Seconds until the nearest funding settlement", None),
+    "parse_seconds": ("histogram", "Tickers payload parse time", LATENCY_BUCKETS),
+    "venue_fetch_seconds": ("histogram", "Funding rates request latency per exchange", LATENCY_BUCKETS),
+    "venue_timeouts_total": ("counter", "Exchanges dropped from a cycle by VENUE_TIMEOUT", None),
+    "venue_errors_total": ("counter", "Failed exchange funding rate requests", None),
+    "alert_cycle_seconds": ("histogram", "Alert cycle duration", LATENCY_BUCKETS),
+    "alert_cycles_total": ("counter", "Completed alert cycles", None),
+    "alerts_total": ("counter", "Alerts queued for delivery", None),
+    "last_cycle_timestamp": ("gauge", "Unix time of the last completed alert cycle", None),
+    "event_loop_lag_seconds": ("histogram", "Event loop scheduling lag", LATENCY_BUCKETS),
+    "persist_save_seconds": ("histogram", "State save latency (gist/file/sqlite)", LATENCY_BUCKETS),
+    "persist_writes_total": ("counter", "Successful state saves", None),
+    "persist_failures_total": ("counter", "Failed state saves", None),
+    "telegram_send_seconds": ("histogram", "Telegram sendMessage latency", LATENCY_BUCKETS),
+    "telegram_sent_total": ("counter", "Messages delivered to Telegram", None),
+    "telegram_failed_total": ("counter", "Messages given up on", None),
+    "telegram_dropped_total": ("counter", "Messages dropped because the outbound queue was full", None),
+    "telegram_retries_total": ("counter", "Telegram send retries (429 and network errors)", None),
+    "telegram_queue_depth": ("gauge", "Outbound message queue depth", None),
+    "published_timestamp": ("gauge", "Unix time the worker published these metrics", None),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: observe — bisect и два сложения"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя корзина — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+class Metrics:
+    def __init__(self, definitions: dict = DEFINITIONS):
+        self.definitions = definitions
+        self.values = {}
+        for name, (kind, _, buckets) in definitions.items():
+            self.values[name] = Histogram(buckets) if kind == "histogram" else 0
+
+    def inc(self, name: str, value: float = 1):
+        self.values[name] += value
+
+    def set(self, name: str, value: float):
+        self.values[name] = value
+
+    def observe(self, name: str, value: float):
+        self.values[name].observe(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.values[name].observe(time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        return {name: value.to_dict() if isinstance(value, Histogram) else value
+                for name, value in self.values.items()}
+
+
+_metrics = Metrics()
+inc = _metrics.inc
+set_gauge = _metrics.set
+observe = _metrics.observe
+timer = _metrics.timer
+
+
+def snapshot() -> dict:
+    """Текущие значения всех метрик процесса"""
+    return _metrics.snapshot()
+
+
+# ======================
+# PUBLISHING
+# ======================
+# Воркер периодически кладёт снимок метрик в общий канал (shared.py),
+# веб-процесс читает его и отдаёт /metrics и /health.
+
+METRICS_KEY = "metrics.json"
+
+
+def encode() -> bytes:
+    set_gauge("published_timestamp", time.time())
+    return json.dumps(snapshot(), separators=(",", ":")).encode()
+
+
+def read_published(channel):
+    """Последний опубликованный снимок (None — воркер ещё ничего не публиковал или канал недоступен)"""
+    try:
+        blob = channel.get(METRICS_KEY)
+        return json.loads(blob) if blob is not None else None
+    except Exception as e:
+        logger.warning(f"Failed to read published metrics: {e!r}")
+        return None
+
+
+def _format(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def render_prometheus(data: dict, definitions: dict = DEFINITIONS) -> str:
+    """Снимок метрик в текстовом формате Prometheus (exposition format 0.0.4)"""
+    lines = []
+    for name, (kind, help_text, _) in definitions.items():
+        if name not in data:
+            continue
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+        value = data[name]
+        if kind == "histogram":
+            cumulative = 0
+            for bound, count in zip([*value["buckets"], float("inf")], value["counts"]):
+                cumulative += count
+                lines.append(f'{full}_bucket{{le="{_format(bound)}"}} {cumulative}')
+            lines.append(f"{full}_sum {_format(value['sum'])}")
+            lines.append(f"{full}_count {value['count']}")
+        else:
+            lines.append(f"{full} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsPublisher:
+    """Фоновая задача воркера: замер лага event loop и публикация метрик.
+
+    collect() (если задан) вызывается перед каждой публикацией —
+    для метрик, которые проще снять, чем считать (глубина очереди и т.п.).
+    """
+
+    def __init__(self, channel, collect=None, interval: float = METRICS_INTERVAL, lag_interval: float = 0.5):
+        self.channel = channel
+        self.collect = collect
+        self.interval = interval
+        self.lag_interval = lag_interval
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._watch_lag()), asyncio.create_task(self._run())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._publish()
+
+    async def _watch_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            observe("event_loop_lag_seconds", max(0.0, loop.time() - started - self.lag_interval))
+
+    async def _publish(self):
+        try:
+            if self.collect is not None:
+                self.collect()
+            # Канал может быть сетевым (redis): запись — в потоке, не в event loop
+            await asyncio.to_thread(self.channel.put, METRICS_KEY, encode())
+        except Exception as e:
+            logger.error(f"Failed to publish metrics: {e!r}")
+
+    async def _run(self):
+        while True:
+            await self._publish()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,76 @@
+import numpy as np
+
+# Порядки сортировки: ключ -> подпись для интерфейса
+ORDERS = {
+    "abs": "|ставка|",
+    "neg": "самые отрицательные",
+    "pos": "самые положительные",
+    "change": "изменение за цикл",
+}
+
+
+class RankedView:
+    """Ранжированное представление одного снимка рынка.
+
+    Каждый порядок сортируется один раз (лениво, при первом запросе),
+    после чего любая страница — срез индекса за O(K).
+    """
+
+    def __init__(self, rates: dict, fetched_at: float = 0.0, previous: dict = None):
+        self.rates = rates
+        self.fetched_at = fetched_at
+        self.contracts = list(rates)
+        self.values = np.fromiter(rates.values(), dtype=np.float64, count=len(rates))
+        self.previous = previous or {}
+        self._orders = {}
+
+    def __len__(self) -> int:
+        return len(self.contracts)
+
+    def change(self):
+        """Изменение ставки с предыдущего снимка (0 для новых контрактов)"""
+        prev = np.fromiter((self.previous.get(c, np.nan) for c in self.contracts),
+                           dtype=np.float64, count=len(self.contracts))
+        return np.nan_to_num(self.values - prev, nan=0.0)
+
+    def _order(self, order: str):
+        index = self._orders.get(order)
+        if index is None:
+            if order == "abs":
+                key = -np.abs(self.values)
+            elif order == "neg":
+                key = self.values
+            elif order == "pos":
+                key = -self.values
+            elif order == "change":
+                key = -np.abs(self.change())
+            else:
+                raise ValueError(f"Unknown order: {order}")
+            index = self._orders[order] = np.argsort(key, kind="stable")
+        return index
+
+    def indices(self, order: str = "abs"):
+        """Позиции контрактов (в self.contracts) в порядке сортировки"""
+        return self._order(order)
+
+    def page(self, order: str = "abs", offset: int = 0, limit: int = 20):
+        """Строки (контракт, ставка) в позициях [offset, offset + limit)"""
+        return [(self.contracts[i], float(self.values[i])) for i in self._order(order)[offset:offset + limit]]
+
+    def top(self, order: str = "abs", k: int = 20):
+        return self.page(order, 0, k)
+
+
+_view = None
+
+
+def ranked_view(snapshot) -> RankedView:
+    """Представление для снимка из кэша; пересоздаётся только при новом снимке.
+
+    Изменение считается к предыдущему снимку цикла (snapshot.previous),
+    а не к тому, что кто-то смотрел последним.
+    """
+    global _view
+    if _view is None or _view.fetched_at != snapshot.fetched_at or _view.rates is not snapshot.rates:
+        _view = RankedView(snapshot.rates, snapshot.fetched_at, snapshot.previous)
+    return _view
@@ -0,0 +1,422 @@
+import io
+import logging
+import math
+from collections import namedtuple
+from datetime import datetime, time as dtime, timedelta, timezone
+
+import numpy as np
+from config import ROLLUP_DAYS, ROLLUP_ACCURACY, DAILY_REPORT_TIME
+
+# Скетч квантилей: логарифмические корзины со знаком (как DDSketch), относительная
+# точность ROLLUP_ACCURACY; |ставка| < MIN_RATE — нулевая корзина, больше MAX_RATE — крайняя
+MIN_RATE = 1e-6
+MAX_RATE = 0.05
+CURRENT_FILE = "current.npz"
+DAY_SUFFIX = ".npz"
+CHECKPOINT_INTERVAL = 300  # секунд между сохранениями незакрытого дня
+_SAVED_COLUMNS = ("count", "min", "max", "sum", "realized", "settlements", "alerts", "_next_apply", "_last")
+# Строка контракта в файле дня (скетч — отдельным плоским массивом, диапазон bucket_lo/bucket_len)
+ROW = np.dtype([("count", "<u4"), ("min", "<f8"), ("max", "<f8"), ("sum", "<f8"), ("realized", "<f8"),
+                ("settlements", "<u4"), ("alerts", "<u4"), ("_next_apply", "<f8"), ("_last", "<f8"),
+                ("bucket_lo", "<i4"), ("bucket_len", "<i4")])
+
+REPORT_TIME = dtime.fromisoformat(DAILY_REPORT_TIME).replace(tzinfo=timezone.utc)
+
+# Сводка по контракту за период (p10/p50/p90 — из скетча)
+RollupRow = namedtuple("RollupRow", "contract count min max mean realized settlements alerts p10 p50 p90")
+
+logger = logging.getLogger(__name__)
+
+
+class Sketch:
+    """Параметры корзин: номер корзины <-> значение ставки"""
+
+    def __init__(self, accuracy: float = ROLLUP_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.half = int(math.ceil(math.log(MAX_RATE / MIN_RATE) / self.log_gamma))
+        self.size = 2 * self.half + 1
+        # Середина корзины (в смысле относительной ошибки) — ошибка не больше accuracy
+        i = np.arange(-self.half, self.half + 1)
+        self.values = np.sign(i) * MIN_RATE * 2 * self.gamma ** np.abs(i) / (self.gamma + 1)
+
+    def bucket(self, rates: np.ndarray) -> np.ndarray:
+        magnitude = np.maximum(np.abs(rates), MIN_RATE)
+        i = np.minimum(np.ceil(np.log(magnitude / MIN_RATE) / self.log_gamma), self.half)
+        return (self.half + np.sign(rates) * i).astype(np.intp)
+
+
+SKETCH = Sketch()
+
+
+def period_bounds(ts: float, report_time: dtime = REPORT_TIME):
+    """Сутки отчёта, содержащие ts: [последнее report_time <= ts, +1 день)"""
+    now = datetime.fromtimestamp(ts, timezone.utc)
+    start = now.replace(hour=report_time.hour, minute=report_time.minute, second=0, microsecond=0)
+    if start > now:
+        start -= timedelta(days=1)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+class Rollup:
+    """Агрегат за период по всем контрактам: плотные массивы по индексу контракта.
+
+    count/min/max/sum, реализованный фандинг (ставка на момент выплаты),
+    число алертов и скетч квантилей. Память на контракт постоянна и не зависит
+    от числа точек; два агрегата сливаются поэлементно (неделя/месяц = сумма дней).
+    """
+
+    def __init__(self, start: float, end: float, capacity: int = 1024):
+        self.start = start
+        self.end = end
+        self.alerts_total = 0
+        self.names = []
+        self.index = {}
+        self._alloc(capacity)
+
+    def _columns(self):
+        # атрибут -> (форма строки, dtype, начальное значение)
+        return {
+            "count": ((), np.uint32, 0),
+            "min": ((), np.float64, np.nan),
+            "max": ((), np.float64, np.nan),
+            "sum": ((), np.float64, 0.0),
+            "realized": ((), np.float64, 0.0),
+            "settlements": ((), np.uint32, 0),
+            "alerts": ((), np.uint32, 0),
+            "buckets": ((SKETCH.size,), np.uint32, 0),
+            # Состояние потока, переходит в следующий период: ближайшая выплата и последняя ставка
+            "_next_apply": ((), np.float64, np.nan),
+            "_last": ((), np.float64, np.nan),
+        }
+
+    def _alloc(self, capacity: int):
+        old = len(self.names)
+        for name, (shape, dtype, fill) in self._columns().items():
+            array = np.full((capacity,) + shape, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)[:old]
+            setattr(self, name, array)
+
+    def _intern(self, contract: str) -> int:
+        idx = self.index.get(contract)
+        if idx is None:
+            idx = len(self.names)
+            if idx >= len(self.count):
+                self._alloc(len(self.count) * 2)
+            self.names.append(contract)
+            self.index[contract] = idx
+        return idx
+
+    def _positions(self, contracts) -> np.ndarray:
+        return np.fromiter((self._intern(c) for c in contracts), dtype=np.intp, count=len(contracts))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def follow(self, previous: "Rollup"):
+        """Новый период после previous: тот же индекс контрактов и состояние потока"""
+        self._alloc(max(len(previous.count), len(self.count)))
+        for contract in previous.names:
+            self._intern(contract)
+        n = len(previous)
+        self._next_apply[:n] = previous._next_apply[:n]
+        self._last[:n] = previous._last[:n]
+        return self
+
+    # --- update ---
+
+    def update(self, rates: dict, ts: float, table=None):
+        """Точка по всем контрактам снимка; table — колонки REST для учёта выплат"""
+        rows = self._positions(rates)
+        x = np.fromiter(rates.values(), dtype=np.float64, count=len(rates))
+        keep = ~np.isnan(x)
+        rows, x = rows[keep], x[keep]
+        self.count[rows] += 1
+        self.sum[rows] += x
+        self.min[rows] = np.fmin(self.min[rows], x)
+        self.max[rows] = np.fmax(self.max[rows], x)
+        self.buckets[rows, SKETCH.bucket(x)] += 1
+
+        # Выплата прошла: начисляется последняя ставка до неё (funding_rate — ставка ближайшей выплаты)
+        due = rows[(self._next_apply[rows] <= ts) & ~np.isnan(self._last[rows])]
+        self.realized[due] += self._last[due]
+        self.settlements[due] += 1
+        self._next_apply[due] = np.nan
+        if table is not None and len(table):
+            # Только будущие выплаты: в потоковом режиме таблица может быть от прошлого REST
+            positions = self._positions(table.contracts)
+            upcoming = table.next_apply > ts
+            self._next_apply[positions[upcoming]] = table.next_apply[upcoming]
+        self._last[rows] = x
+
+    def add_alerts(self, contracts):
+        contracts = list(contracts)
+        if contracts:
+            np.add.at(self.alerts, self._positions(contracts), 1)
+            self.alerts_total += len(contracts)
+
+    def merge(self, other: "Rollup"):
+        """Добавляет другой период (слияние поэлементное, без пересчёта по точкам)"""
+        n = len(other)
+        rows = self._positions(other.names)
+        self.count[rows] += other.count[:n]
+        self.sum[rows] += other.sum[:n]
+        self.min[rows] = np.fmin(self.min[rows], other.min[:n])
+        self.max[rows] = np.fmax(self.max[rows], other.max[:n])
+        self.realized[rows] += other.realized[:n]
+        self.settlements[rows] += other.settlements[:n]
+        self.alerts[rows] += other.alerts[:n]
+        self.buckets[rows] += other.buckets[:n]
+        self.alerts_total += other.alerts_total
+        self.start = min(self.start, other.start)
+        self.end = max(self.end, other.end)
+        return self
+
+    # --- read ---
+
+    def quantiles(self, rows, qs=(0.1, 0.5, 0.9)) -> np.ndarray:
+        """Квантили по скетчу (строки x qs), в пределах точных min/max"""
+        buckets = self.buckets[rows]
+        cumulative = buckets.cumsum(axis=1)
+        total = cumulative[:, -1].astype(np.float64)
+        result = np.full((len(rows), len(qs)), np.nan)
+        for column, q in enumerate(qs):
+            rank = q * (total - 1)
+            values = SKETCH.values[(cumulative > rank[:, None]).argmax(axis=1)]
+            result[:, column] = np.clip(values, self.min[rows], self.max[rows])
+        result[total == 0] = np.nan
+        return result
+
+    def rows(self, contracts=None):
+        """Сводки RollupRow по контрактам (по умолчанию — по всем с данными)"""
+        if contracts is None:
+            rows = np.flatnonzero(self.count[:len(self)])
+        else:
+            rows = np.array([self.index[c] for c in contracts if c in self.index], dtype=np.intp)
+        quantiles = self.quantiles(rows)
+        count = self.count[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum[rows] / count
+        return [
+            RollupRow(self.names[i], int(count[k]), float(self.min[i]), float(self.max[i]), float(mean[k]),
+                      float(self.realized[i]), int(self.settlements[i]), int(self.alerts[i]), *quantiles[k].tolist())
+            for k, i in enumerate(rows.tolist())
+        ]
+
+    def top(self, k: int = 5, key: str = "realized"):
+        """k контрактов с наибольшим |key| (realized, min, max, alerts)"""
+        n = len(self)
+        values = np.abs(np.nan_to_num(getattr(self, key)[:n].astype(np.float64)))
+        values[self.count[:n] == 0] = -1
+        order = np.argsort(-values, kind="stable")[:k]
+        return self.rows([self.names[i] for i in order.tolist() if values[i] >= 0])
+
+    def extremes(self, contracts):
+        """(min, контракт), (max, контракт) по списку контрактов; None — данных нет"""
+        rows = [r for r in self.rows(contracts) if r.count]
+        if not rows:
+            return None, None
+        low = min(rows, key=lambda r: r.min)
+        high = max(rows, key=lambda r: r.max)
+        return (low.min, low.contract), (high.max, high.contract)
+
+    # --- serialization ---
+
+    def to_arrays(self) -> dict:
+        """Разреженный вид для диска: только контракты с данными и занятые диапазоны корзин"""
+        n = len(self)
+        rows = np.flatnonzero((self.count[:n] > 0) | (self.alerts[:n] > 0) | (self.settlements[:n] > 0))
+        # Скетч контракта — диапазон корзин [lo, lo + len), все диапазоны подряд в одном массиве
+        occupied = self.buckets[rows] > 0
+        used = occupied.any(axis=1)
+        lo = np.where(used, occupied.argmax(axis=1), 0)
+        lengths = np.where(used, SKETCH.size - occupied[:, ::-1].argmax(axis=1), 0) - lo
+        records = np.empty(len(rows), dtype=ROW)
+        for name in _SAVED_COLUMNS:
+            records[name] = getattr(self, name)[rows]
+        records["bucket_lo"] = lo - SKETCH.half
+        records["bucket_len"] = lengths
+        flat_rows = np.repeat(rows, lengths)
+        return {
+            "meta": np.array([self.start, self.end, self.alerts_total, SKETCH.accuracy]),
+            "contract": np.array([self.names[i] for i in rows.tolist()], dtype=str),
+            "rows": records,
+            "buckets": self.buckets[flat_rows, _flat_buckets(lo, lengths)],
+        }
+
+    @classmethod
+    def from_arrays(cls, parts) -> "Rollup":
+        """Один агрегат из нескольких сохранённых периодов — слияние одним векторным проходом"""
+        parts = list(parts)
+        names, inverse = np.unique(np.concatenate([p["contract"] for p in parts]), return_inverse=True)
+        meta = np.array([p["meta"] for p in parts])
+        rollup = cls(float(meta[:, 0].min()), float(meta[:, 1].max()), capacity=max(len(names), 1))
+        for contract in names.tolist():
+            rollup._intern(contract)
+        rollup.alerts_total = int(meta[:, 2].sum())
+        records = np.concatenate([p["rows"] for p in parts])
+        n = len(names)
+        for name in ("count", "sum", "realized", "settlements", "alerts"):
+            getattr(rollup, name)[:n] = np.bincount(inverse, weights=records[name], minlength=n)
+        if len(records):
+            # Группы по контракту; порядок периодов внутри группы сохраняется
+            order = np.argsort(inverse, kind="stable")
+            starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+            ends = np.r_[starts[1:], len(order)] - 1
+            rollup.min[:n] = np.fmin.reduceat(records["min"][order], starts)
+            rollup.max[:n] = np.fmax.reduceat(records["max"][order], starts)
+            # Состояние потока — из последнего периода
+            rollup._next_apply[:n] = records["_next_apply"][order][ends]
+            rollup._last[:n] = records["_last"][order][ends]
+
+        flat_rows, flat_buckets, offset = [], [], 0
+        for part, accuracy in zip(parts, meta[:, 3]):
+            rows = inverse[offset:offset + len(part["contract"])]
+            offset += len(part["contract"])
+            lengths = part["rows"]["bucket_len"]
+            buckets = _flat_buckets(part["rows"]["bucket_lo"], lengths)
+            if accuracy != SKETCH.accuracy:
+                # Скетч с другой точностью: перекладываем по значению середины старой корзины
+                old = Sketch(float(accuracy))
+                buckets = SKETCH.bucket(old.values[buckets + old.half])
+            else:
+                buckets = buckets + SKETCH.half
+            flat_rows.append(np.repeat(rows, lengths))
+            flat_buckets.append(buckets)
+        cells = np.concatenate(flat_rows) * SKETCH.size + np.concatenate(flat_buckets)
+        counts = np.concatenate([p["buckets"] for p in parts])
+        rollup.buckets[:n] = np.bincount(cells, weights=counts, minlength=n * SKETCH.size).reshape(n, SKETCH.size)
+        return rollup
+
+
+def _flat_buckets(lo, lengths) -> np.ndarray:
+    """Номера корзин для подряд записанных диапазонов [lo, lo + len)"""
+    lengths = np.asarray(lengths, dtype=np.intp)
+    return np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - lo, lengths)
+
+
+class RollupStore:
+    """Текущие сутки отчёта в памяти + закрытые дни в общем канале (shared.py).
+
+    Сутки закрываются в DAILY_REPORT_TIME (UTC); недельная и месячная сводка —
+    слияние дневных записей. Незакрытый день периодически сохраняется и
+    продолжается после рестарта. Канал, а не локальный диск: диск dyno
+    очищается при каждом рестарте и деплое. channel=None — только память.
+    """
+
+    def __init__(self, channel=None, retention_days: float = ROLLUP_DAYS, report_time: dtime = REPORT_TIME):
+        self.channel = channel
+        self.retention = timedelta(days=retention_days)
+        self.report_time = report_time
+        self.current = Rollup(*period_bounds(datetime.now(timezone.utc).timestamp(), report_time))
+        self.last_finished = None
+        self._saved_at = 0.0
+
+    def _days(self):
+        if self.channel is None:
+            return []
+        return [name for name in self.channel.keys() if name.endswith(DAY_SUFFIX) and name != CURRENT_FILE]
+
+    def _write(self, name: str, rollup: Rollup):
+        buffer = io.BytesIO()
+        np.savez(buffer, **rollup.to_arrays())
+        self.channel.put(name, buffer.getvalue())
+
+    def _read(self, name: str) -> dict:
+        blob = self.channel.get(name)
+        if blob is None:
+            raise FileNotFoundError(name)
+        with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+
+    @staticmethod
+    def _day_name(rollup: Rollup) -> str:
+        return datetime.fromtimestamp(rollup.start, timezone.utc).strftime("%Y%m%d") + DAY_SUFFIX
+
+    def _prune(self, now: datetime):
+        cutoff = (now - self.retention).strftime("%Y%m%d")
+        for name in self._days():
+            if name[:-len(DAY_SUFFIX)] < cutoff:
+                self.channel.delete(name)
+
+    def load(self):
+        """Продолжает незакрытый день после рестарта (или закрывает его, если сутки прошли)"""
+        if self.channel is None:
+            return self
+        try:
+            saved = Rollup.from_arrays([self._read(CURRENT_FILE)])
+        except FileNotFoundError:
+            return self
+        except Exception as e:
+            logger.error(f"❌ Failed to load rollup checkpoint: {e!r}")
+            return self
+        if saved.end > datetime.now(timezone.utc).timestamp():
+            self.current = saved
+        else:
+            self.current = Rollup(*period_bounds(datetime.now(timezone.utc).timestamp(), self.report_time)).follow(saved)
+            self._finish(saved)
+        logger.info(f"✅ Rollup restored: {len(saved)} contracts since "
+                    f"{datetime.fromtimestamp(saved.start, timezone.utc):%Y-%m-%d %H:%M} UTC")
+        return self
+
+    def _finish(self, rollup: Rollup):
+        self.last_finished = rollup
+        if self.channel is not None:
+            self._write(self._day_name(rollup), rollup)
+            self._prune(datetime.fromtimestamp(rollup.end, timezone.utc))
+
+    def update(self, rates: dict, ts: float, table=None):
+        if ts >= self.current.end:
+            self.roll(ts)
+        self.current.update(rates, ts, table)
+        if ts - self._saved_at >= CHECKPOINT_INTERVAL:
+            self.checkpoint(ts)
+
+    def add_alerts(self, contracts):
+        self.current.add_alerts(contracts)
+
+    def roll(self, ts: float, tolerance: float = 60):
+        """Закрывает текущие сутки, если они кончились (с допуском на срабатывание джоба)"""
+        if ts < self.current.end - tolerance:
+            return None
+        finished = self.current
+        self.current = Rollup(*period_bounds(max(ts, finished.end), self.report_time)).follow(finished)
+        try:
+            self._finish(finished)
+            self.checkpoint(ts)
+        except Exception as e:
+            logger.error(f"❌ Failed to save daily rollup: {e!r}")
+        return finished
+
+    def checkpoint(self, ts: float = None):
+        if self.channel is None:
+            return
+        try:
+            self._write(CURRENT_FILE, self.current)
+            self._saved_at = ts if ts is not None else datetime.now(timezone.utc).timestamp()
+        except Exception as e:
+            logger.error(f"❌ Failed to save rollup checkpoint: {e!r}")
+
+    def summary(self, days: int, include_current: bool = False) -> Rollup:
+        """Сводка за последние days суток: закрытые дни из канала, с include_current —
+        текущие сутки плюс days - 1 закрытых (всего days, как в заголовке /report)"""
+        closed = days - 1 if include_current else days
+        parts = []
+        try:
+            names = self._days()[-closed:] if closed > 0 else []
+        except Exception as e:
+            logger.warning(f"Failed to list rollups: {e!r}")
+            names = []
+        for name in names:
+            try:
+                parts.append(self._read(name))
+            except Exception as e:
+                logger.warning(f"Skipping rollup {name}: {e!r}")
+        summary = Rollup.from_arrays(parts) if parts else Rollup(self.current.start, self.current.end)
+        if include_current:
+            summary.merge(self.current)
+        elif not parts:
+            return None
+        return summary
@@ -0,0 +1,64 @@
+import random
+import time
+
+import numpy as np
+from config import POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_RATIO, POLL_JITTER
+from data_fetcher import circuit_breaker
+import metrics
+
+
+class PollScheduler:
+    """Интервал опроса Gate.io по времени до ближайшего начисления фандинга.
+
+    Интервал — доля ratio от времени до начисления в пределах [min, max]:
+    между начислениями опрос идёт с шагом истории (max — не больше UPDATE_INTERVAL),
+    к начислению сгущается, а последний короткий интервал приходится уже
+    на новую ставку после него. Пока
+    breaker разомкнут, следующий опрос — не раньше его retry_at.
+    """
+
+    def __init__(self, min_interval: float = POLL_MIN_INTERVAL, max_interval: float = POLL_MAX_INTERVAL,
+                 ratio: float = POLL_RATIO, jitter: float = POLL_JITTER, breaker=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.ratio = ratio
+        self.jitter = jitter
+        self.breaker = breaker if breaker is not None else circuit_breaker()
+        self.delay = max_interval  # бюджет текущего цикла
+
+    @staticmethod
+    def until_settlement(snapshot, now: float, contracts=None):
+        """Секунды до ближайшего начисления по контрактам снимка (contracts — только по ним); None — неизвестно"""
+        table = snapshot.table if snapshot is not None else None
+        if table is None or not len(table):
+            return None
+        next_apply = table.next_apply
+        if contracts is not None:
+            index = table.index.index
+            ids = np.fromiter((index[c] for c in contracts if c in index), dtype=table.ids.dtype)
+            next_apply = next_apply[np.isin(table.ids, ids)]
+        upcoming = next_apply[next_apply > now]
+        return float(upcoming.min()) - now if len(upcoming) else None
+
+    def interval(self, until) -> float:
+        if until is None:
+            return self.max_interval
+        return min(max(until * self.ratio, self.min_interval), self.max_interval)
+
+    def next_delay(self, snapshot, contracts=None, now: float = None) -> float:
+        """Пауза до следующего опроса (с разбросом ±jitter); публикует бюджет цикла в метрики"""
+        now = time.time() if now is None else now
+        until = self.until_settlement(snapshot, now, contracts)
+        # Разброс не выводит за max_interval: шаг точек истории не должен расти
+        delay = min(self.interval(until) * random.uniform(1 - self.jitter, 1 + self.jitter), self.max_interval)
+        if self.breaker.open:
+            delay = max(delay, self.breaker.retry_at - now)
+        self.delay = delay
+        metrics.set_gauge("poll_interval_seconds", delay)
+        if until is not None:
+            metrics.set_gauge("next_settlement_seconds", until)
+        return delay
+
+    def record_cycle(self, seconds: float):
+        """Доля бюджета, ушедшая на цикл (запрос + алерты)"""
+        metrics.set_gauge("poll_budget_used", seconds / self.delay if self.delay else 0.0)
@@ -0,0 +1,202 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SHARED_BACKEND, SHARED_DIR, REDIS_URL, HTTP_TIMEOUT
+
+REDIS_PREFIX = "frate4bot:"
+VERSION_SUFFIX = ":version"
+
+logger = logging.getLogger(__name__)
+
+
+# ======================
+# CHANNELS
+# ======================
+# Канал — общие данные воркера для webapp.py: метрики, снимок, сегменты истории.
+# Значение — bytes по ключу; append()/read() — для append-only сегментов истории.
+# На Heroku web и worker — разные дайно без общего диска: там нужен redis,
+# file — каталог на одной машине (локальный запуск, тесты, бенчмарки).
+
+class FileChannel:
+    name = "file"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def sub(self, name: str):
+        """Канал во вложенном пространстве ключей (подкаталог)"""
+        return FileChannel(self._path(name))
+
+    def put(self, key: str, blob: bytes):
+        # Пишем во временный файл и атомарно подменяем — читатель не видит полузаписанный файл
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def version(self, key: str):
+        """Меняется при каждом put(); None — ключа нет"""
+        try:
+            return os.stat(self._path(key)).st_mtime_ns
+        except OSError:
+            return None
+
+    def append(self, key: str, blob: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(key), "ab") as f:
+            f.write(blob)
+
+    def size(self, key: str) -> int:
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return 0
+
+    def read(self, key: str, start: int = 0, end: int = None) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read(-1 if end is None else max(end - start, 0))
+
+    def keys(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if not name.endswith(".tmp") and os.path.isfile(self._path(name)))
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class RedisChannel:
+    name = "redis"
+
+    def __init__(self, client, prefix: str = REDIS_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str):
+        import redis  # нужен только redis-каналу — локально бот и веб стартуют без него
+
+        # Heroku Redis отдаёт rediss:// с самоподписанным сертификатом
+        options = {"ssl_cert_reqs": None} if url.startswith("rediss://") else {}
+        return cls(redis.Redis.from_url(url, socket_timeout=HTTP_TIMEOUT, **options))
+
+    def sub(self, name: str):
+        return RedisChannel(self.client, f"{self.prefix}{name}:")
+
+    def put(self, key: str, blob: bytes):
+        key = self.prefix + key
+        # Значение и версия меняются в одной транзакции
+        self.client.pipeline().set(key, blob).incr(key + VERSION_SUFFIX).execute()
+
+    def get(self, key: str):
+        return self.client.get(self.prefix + key)
+
+    def version(self, key: str):
+        value = self.client.get(self.prefix + key + VERSION_SUFFIX)
+        return int(value) if value is not None else None
+
+    def append(self, key: str, blob: bytes):
+        self.client.append(self.prefix + key, blob)
+
+    def size(self, key: str) -> int:
+        return self.client.strlen(self.prefix + key)
+
+    def read(self, key: str, start: int = 0, end: int = None) -> bytes:
+        # GETRANGE включает правую границу
+        if end is not None and end <= start:
+            return b""
+        return self.client.getrange(self.prefix + key, start, -1 if end is None else end - 1)
+
+    def keys(self):
+        # Версии и вложенные пространства (с ":" после префикса) — не ключи этого канала
+        n = len(self.prefix)
+        names = (key.decode()[n:] for key in self.client.scan_iter(match=f"{self.prefix}*"))
+        return sorted(name for name in names if ":" not in name)
+
+    def delete(self, key: str):
+        key = self.prefix + key
+        self.client.delete(key, key + VERSION_SUFFIX)
+
+
+# ======================
+# BACKGROUND WRITES
+# ======================
+
+class BackgroundWriter:
+    """Канал воркера: запись — в одном фоновом потоке в порядке вызовов,
+    event loop не ждёт сеть. Чтение идёт напрямую в канал.
+
+    put() одного ключа, ещё не дошедший до канала, заменяется новым —
+    при недоступном канале очередь не растёт на каждом цикле.
+    """
+
+    def __init__(self, channel, executor: ThreadPoolExecutor = None):
+        self.channel = channel
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-writer")
+        self._pending = {}  # ключ -> последний не записанный put()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+
+    def sub(self, name: str):
+        return BackgroundWriter(self.channel.sub(name), self._executor)
+
+    def _run(self, write, *args):
+        try:
+            write(*args)
+        except Exception as e:
+            logger.error(f"❌ Shared channel write failed: {e!r}")
+
+    def _put_latest(self, key: str):
+        with self._lock:
+            blob = self._pending.pop(key)
+        self._run(self.channel.put, key, blob)
+
+    def put(self, key: str, blob: bytes):
+        with self._lock:
+            queued = key in self._pending
+            self._pending[key] = blob
+        if not queued:
+            self._executor.submit(self._put_latest, key)
+
+    def append(self, key: str, blob: bytes):
+        self._executor.submit(self._run, self.channel.append, key, blob)
+
+    def delete(self, key: str):
+        self._executor.submit(self._run, self.channel.delete, key)
+
+    def close(self):
+        """Дождаться записей в очереди (остановка воркера)"""
+        self._executor.shutdown(wait=True)
+
+
+def make_channel(kind: str = SHARED_BACKEND, directory: str = SHARED_DIR, url: str = REDIS_URL):
+    """Создаёт канал воркер -> webapp.py по имени из конфига"""
+    if kind == "redis":
+        if url:
+            return RedisChannel.from_url(url)
+        logger.warning("REDIS_URL not set. Falling back to file channel.")
+        return FileChannel(directory)
+    if kind == "file":
+        return FileChannel(directory)
+    raise ValueError(f"Unknown shared backend: {kind}")
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from config import SSE_BUFFER, SSE_POLL_INTERVAL, SSE_KEEPALIVE, SSE_MAX_CLIENTS, SSE_RETRY_MS
+from ticker_parser import dumps
+
+KEEPALIVE = b": keepalive\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+def event_id(fetched_at: float) -> int:
+    # id — время снимка в мс: одинаков во всех процессах и после рестарта,
+    # поэтому Last-Event-ID работает при переподключении к любому воркеру
+    return int(fetched_at * 1000)
+
+
+def format_event(kind: str, data: dict, eid: int) -> bytes:
+    return f"id: {eid}\nevent: {kind}\ndata: ".encode() + dumps(data) + b"\n\n"
+
+
+class EventHub:
+    """Live-поток изменений снимка для webapp.py (Server-Sent Events).
+
+    Один фоновый поток (гринлет под gevent) следит за снимком воркера и
+    кладёт в кольцо из SSE_BUFFER событий только изменившиеся ставки и
+    рыночные алерты цикла. Клиент хранит лишь позицию в кольце — очереди
+    на клиента нет, поэтому медленный клиент не раздувает память: отставший
+    получает одно слитое событие, а выпавший из кольца — полный снимок.
+
+    Поток публичный и без авторизации, поэтому в нём только рыночные
+    события; персональные пороги чатов (/settings) остаются в Telegram.
+    """
+
+    def __init__(self, api, buffer: int = SSE_BUFFER, poll_interval: float = SSE_POLL_INTERVAL,
+                 keepalive: float = SSE_KEEPALIVE, max_clients: int = SSE_MAX_CLIENTS):
+        self.api = api
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self.max_clients = max_clients
+        self.events = deque(maxlen=buffer)  # (id, {контракт: ставка}, алерты)
+        self.rates = {}
+        self.last_id = 0
+        self.clients = 0
+        self._evicted = 0   # id последнего вытесненного из кольца события
+        self._frames = {}   # (курсор, last_id) -> готовые байты события, общие для всех клиентов
+        self._cond = threading.Condition()
+        self._thread = None
+        self.stats = {"events": 0, "connections": 0, "rejected": 0, "snapshots": 0, "resumed": 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sse-poller", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"SSE poll failed: {e!r}")
+            time.sleep(self.poll_interval)
+
+    def poll(self) -> bool:
+        """Забирает новый снимок воркера; True — появилось событие"""
+        if not self.api.refresh():
+            return False
+        eid = event_id(self.api.fetched_at)
+        if eid <= self.last_id:
+            return False
+        rates = self.api.rates
+        # Первое событие процесса — разница с пустым снимком, т.е. все ставки
+        delta = {c: r for c, r in rates.items() if self.rates.get(c) != r}
+        with self._cond:
+            if len(self.events) == self.events.maxlen:
+                self._evicted = self.events[0][0]
+            self.events.append((eid, delta, self.api.alerts))
+            self.rates = rates
+            self.last_id = eid
+            self._frames = {}
+            self.stats["events"] += 1
+            self._cond.notify_all()
+        return True
+
+    def acquire(self) -> bool:
+        """Занимает слот клиента; False — лимит SSE_MAX_CLIENTS исчерпан"""
+        with self._cond:
+            if self.clients >= self.max_clients:
+                self.stats["rejected"] += 1
+                return False
+            self.clients += 1
+            self.stats["connections"] += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.clients -= 1
+
+    def _frame(self, cursor: int) -> bytes:
+        """Событие для клиента, получившего всё до cursor (вызывается под локом)"""
+        key = (cursor, self.last_id)
+        frame = self._frames.get(key)
+        if frame is not None:
+            return frame
+        if not cursor or cursor < self._evicted:
+            # Нового клиента и выпавшего из кольца догоняем полным снимком
+            self.stats["snapshots"] += 1
+            frame = format_event("snapshot", {"fetched_at": self.last_id / 1000, "rates": self.rates}, self.last_id)
+        else:
+            rates, alerts = {}, []
+            for eid, delta, event_alerts in self.events:
+                if eid > cursor:
+                    rates.update(delta)
+                    alerts.extend(event_alerts)
+            frame = format_event("delta", {"fetched_at": self.last_id / 1000, "rates": rates, "alerts": alerts},
+                                 self.last_id)
+        self._frames[key] = frame
+        return frame
+
+    def stream(self, last_event_id: str = None):
+        """Байты SSE для одного клиента (между acquire() и release()).
+
+        Запись в сокет идёт вне лока: медленный клиент задерживает только себя.
+        """
+        try:
+            cursor = int(last_event_id or 0)
+        except ValueError:
+            cursor = 0
+        if cursor and cursor >= self._evicted:
+            self.stats["resumed"] += 1
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.last_id > cursor, self.keepalive)
+                if self.last_id > cursor:
+                    chunk = self._frame(cursor)
+                    cursor = self.last_id
+                else:
+                    chunk = KEEPALIVE
+            yield chunk
@@ -0,0 +1,321 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from config import (
+    GITHUB_TOKEN,
+    GITHUB_GIST_ID,
+    GITHUB_API_URL,
+    STORAGE_BACKEND,
+    STORAGE_PATH,
+    PERSIST_DEBOUNCE,
+    STATE_CACHE_PATH,
+    HTTP_TIMEOUT,
+)
+import metrics
+
+GIST_FILENAME = "frate4bot-data.json"
+
+logger = logging.getLogger(__name__)
+
+
+def dumps(data) -> str:
+    """Компактная сериализация (без отступов и пробелов)"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+# ======================
+# BACKENDS
+# ======================
+# Бэкенд — синхронный объект с методами load() -> dict | None и save(blob: str).
+# Движок вызывает их в отдельном потоке, поэтому блокирующий I/O здесь допустим.
+
+class GistBackend:
+    name = "gist"
+    remote = True
+
+    def __init__(self, token: str, gist_id: str, filename: str = GIST_FILENAME):
+        import requests  # нужен только gist — локальные бэкенды стартуют без него
+
+        self.url = f"{GITHUB_API_URL}/gists/{gist_id}"
+        self.filename = filename
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"token {token}"
+
+    def load(self):
+        response = self.session.get(self.url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        files = response.json()["files"]
+        if self.filename not in files:
+            return None
+        return json.loads(files[self.filename]["content"])
+
+    def save(self, blob: str):
+        payload = {"files": {self.filename: {"content": blob}}}
+        response = self.session.patch(self.url, json=payload, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+
+
+class FileBackend:
+    name = "file"
+    remote = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, blob: str):
+        # Пишем во временный файл и атомарно подменяем — без полузаписанных файлов
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(blob)
+        os.replace(tmp_path, self.path)
+
+
+class SqliteBackend:
+    name = "sqlite"
+    remote = False
+
+    def __init__(self, path: str, key: str = GIST_FILENAME):
+        self.path = path
+        self.key = key
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def load(self):
+        with sqlite3.connect(self.path) as conn:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (self.key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, blob: str):
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (self.key, blob))
+
+
+class ChannelBackend:
+    """Бэкенд поверх общего канала (shared.py) — для локальной копии состояния:
+    в redis она переживает рестарт дайно, в отличие от файла"""
+
+    name = "channel"
+    remote = False
+
+    def __init__(self, channel, key: str):
+        self.channel = channel
+        self.key = key
+
+    def load(self):
+        blob = self.channel.get(self.key)
+        return json.loads(blob) if blob is not None else None
+
+    def save(self, blob: str):
+        self.channel.put(self.key, blob.encode())
+
+
+def make_backend(kind: str = STORAGE_BACKEND, path: str = STORAGE_PATH):
+    """Создаёт бэкенд хранения по имени из конфига"""
+    if kind == "gist":
+        if GITHUB_TOKEN and GITHUB_GIST_ID:
+            return GistBackend(GITHUB_TOKEN, GITHUB_GIST_ID)
+        logger.warning("GITHUB_TOKEN or GITHUB_GIST_ID not set. Falling back to file storage.")
+        return FileBackend(path)
+    if kind == "sqlite":
+        return SqliteBackend(path)
+    if kind == "file":
+        return FileBackend(path)
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+# ======================
+# WRITE-BEHIND ENGINE
+# ======================
+
+class PersistenceEngine:
+    """Отложенная запись состояния: изменения помечаются mark_dirty(),
+    а на бэкенд уходит не более одной записи за окно debounce.
+
+    serialize — функция без аргументов, возвращающая JSON-совместимый dict.
+    При удалённом бэкенде каждая запись дублируется в локальную копию (cache,
+    по умолчанию файл cache_path): с неё бот стартует без сети, а сверка
+    с бэкендом идёт в фоне (reconcile).
+
+    Пока состояние не загружено (ни с бэкенда, ни из локальной копии), flush()
+    ничего не пишет: настройки по умолчанию затёрли бы на бэкенде все чаты.
+    """
+
+    def __init__(self, backend, serialize, debounce: float = PERSIST_DEBOUNCE, cache_path: str = STATE_CACHE_PATH,
+                 cache=None, retry_delay: float = 5.0, retry_max: float = 300.0):
+        self.backend = backend
+        self.serialize = serialize
+        self.debounce = debounce
+        if not getattr(backend, "remote", False):
+            cache = None
+        elif cache is None and cache_path:
+            cache = FileBackend(cache_path)
+        self.cache = cache
+        self.retry_delay = retry_delay
+        self.retry_max = retry_max
+        self.loaded = False        # состояние загружено — записи разрешены
+        self.cached = None        # локальная копия, с которой стартовали (JSON)
+        self.cached_synced = None  # дошла ли она до бэкенда
+        self._version = 0
+        self._saved_version = 0
+        self._last_blob = None
+        self._dirty = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.stats = {"marks": 0, "writes": 0, "skipped": 0, "failures": 0, "loop_blocked_ms": 0.0}
+
+    @property
+    def dirty(self) -> bool:
+        return self._version != self._saved_version
+
+    def load(self):
+        """Синхронная загрузка (до запуска event loop)"""
+        data = self.backend.load()
+        self.loaded = True
+        if data is not None:
+            self._last_blob = dumps(data)
+        return data
+
+    def load_cached(self):
+        """Состояние из локальной копии (без сети); None — копии нет"""
+        if self.cache is None:
+            return None
+        try:
+            entry = self.cache.load()
+        except Exception as e:
+            logger.warning(f"Local state snapshot unreadable: {e!r}")
+            return None
+        if not entry or "data" not in entry:
+            return None
+        self.cached = dumps(entry["data"])
+        self.cached_synced = bool(entry.get("synced"))
+        self.loaded = True
+        return entry["data"]
+
+    async def reconcile(self, apply) -> bool:
+        """Сверка с бэкендом после старта с локальной копии (фоном, после запуска).
+
+        Бэкенд новее, если копии не было или она была записана на бэкенд, а он
+        с тех пор изменился (другой экземпляр) — тогда apply(data) подменяет
+        состояние. Копия, не дошедшая до бэкенда, дописывается следующей записью.
+        Без копии загрузка повторяется с нарастающей паузой, пока не пройдёт.
+        """
+        delay = self.retry_delay
+        while True:
+            try:
+                data = await asyncio.to_thread(self.backend.load)
+                break
+            except Exception as e:
+                if self.loaded:
+                    logger.error(f"❌ Failed to load from {self.backend.name}: {e}. Keeping local state.")
+                    return False
+                logger.error(f"❌ Failed to load from {self.backend.name}: {e}. "
+                             f"Saving is on hold, retry in {delay:.0f}s.")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+        if not self.loaded:
+            self.loaded = True
+            if self.dirty:
+                self._dirty.set()  # изменения, отложенные до загрузки
+        blob = dumps(data) if data is not None else None
+        self._last_blob = blob
+        if blob == self.cached:
+            logger.info(f"✅ Local state matches {self.backend.name}")
+            return False
+        if data is not None and self.cached_synced is not False:
+            apply(data)
+            self.cached, self.cached_synced = blob, True
+            if self.cache is not None:
+                await asyncio.to_thread(self._write_cache, blob, True)
+            logger.info(f"✅ State reconciled from {self.backend.name}")
+            return True
+        self.mark_dirty()
+        return False
+
+    def _write_cache(self, blob: str, synced: bool):
+        # blob уже сериализован — оборачиваем без повторного dumps
+        try:
+            self.cache.save(f'{{"synced":{"true" if synced else "false"},"data":{blob}}}')
+        except Exception as e:
+            logger.warning(f"Failed to write local state snapshot: {e}")
+
+    def mark_dirty(self):
+        self._version += 1
+        self.stats["marks"] += 1
+        self._dirty.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            # Все изменения за окно debounce уходят одной записью
+            await asyncio.sleep(self.debounce)
+            self._dirty.clear()
+            await self.flush()
+
+    def _prepare(self):
+        version = self._version
+        started = time.perf_counter()
+        blob = dumps(self.serialize())
+        self.stats["loop_blocked_ms"] += (time.perf_counter() - started) * 1000
+        return version, blob
+
+    def _commit(self, version: int, blob: str):
+        self._saved_version = max(self._saved_version, version)
+        self._last_blob = blob
+
+    async def flush(self) -> bool:
+        """Записывает состояние, если оно менялось с последней записи (ввод-вывод — в потоке)"""
+        async with self._lock:
+            if not self.dirty:
+                return False
+            if not self.loaded:
+                logger.warning(f"State not loaded from {self.backend.name} yet, saving is on hold")
+                return False
+            version, blob = self._prepare()
+            if blob == self._last_blob:
+                self.stats["skipped"] += 1
+                self._commit(version, blob)
+                return False
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.backend.save, blob)
+            except Exception as e:
+                self.stats["failures"] += 1
+                metrics.inc("persist_failures_total")
+                logger.error(f"❌ Failed to save to {self.backend.name}: {e}")
+                if self.cache is not None:
+                    await asyncio.to_thread(self._write_cache, blob, False)
+                self._dirty.set()  # повторим в следующем окне
+                return False
+            if self.cache is not None:
+                await asyncio.to_thread(self._write_cache, blob, True)
+            metrics.observe("persist_save_seconds", time.perf_counter() - started)
+            self.stats["writes"] += 1
+            metrics.inc("persist_writes_total")
+            self._commit(version, blob)
+            logger.info(f"✅ Data saved to {self.backend.name}")
+            return True
+
+    async def close(self):
+        """Останавливает фоновую задачу и сбрасывает несохранённые изменения"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
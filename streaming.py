@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+import websockets
+from config import (
+    GATEIO_WS_URL,
+    STREAM_APPLY_INTERVAL,
+    STREAM_STALE_TIMEOUT,
+    STREAM_MAX_BACKOFF,
+)
+from data_fetcher import current_snapshot, get_snapshot, put_snapshot
+from ticker_parser import loads
+
+CHANNEL = "futures.tickers"
+SUBSCRIBE_BATCH = 100  # контрактов в одном сообщении subscribe
+
+logger = logging.getLogger(__name__)
+
+
+def subscribe_messages(contracts):
+    now = int(time.time())
+    contracts = sorted(contracts)
+    for i in range(0, len(contracts), SUBSCRIBE_BATCH):
+        yield json.dumps({"time": now, "channel": CHANNEL, "event": "subscribe",
+                          "payload": contracts[i:i + SUBSCRIBE_BATCH]})
+
+
+def parse_frame(raw) -> dict:
+    """Обновления ставок из кадра futures.tickers: {контракт: ставка}"""
+    message = loads(raw)
+    if message.get("channel") != CHANNEL or message.get("event") != "update":
+        return {}
+    result = message.get("result") or []
+    if isinstance(result, dict):
+        result = [result]
+    updates = {}
+    for item in result:
+        rate = item.get("funding_rate")
+        if rate is not None and "contract" in item:
+            updates[item["contract"]] = float(rate)
+    return updates
+
+
+class TickerStream:
+    """Потоковый режим: инкрементальные обновления снимка из WebSocket Gate.io.
+
+    Перед каждым подключением (и после любого разрыва) снимок
+    пересинхронизируется через REST; обновления из канала копятся
+    и публикуются в кэш не чаще раза в STREAM_APPLY_INTERVAL, после чего
+    вызывается on_update(snapshot).
+    """
+
+    def __init__(self, on_update=None, url: str = GATEIO_WS_URL, apply_interval: float = STREAM_APPLY_INTERVAL,
+                 stale_timeout: float = STREAM_STALE_TIMEOUT, max_backoff: float = STREAM_MAX_BACKOFF):
+        self.url = url
+        self.on_update = on_update
+        self.apply_interval = apply_interval
+        self.stale_timeout = stale_timeout
+        self.max_backoff = max_backoff
+        self._pending = {}
+        self._task = None
+        self.connected = False
+        self.stats = {"frames": 0, "updates": 0, "published": 0, "reconnects": 0, "resyncs": 0}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _resync(self, since: float = 0.0):
+        """Полный снимок через REST — закрывает пропуски после разрыва.
+
+        Годится только снимок, полученный после since (момента разрыва): при
+        ошибке REST или разомкнутом breaker get_snapshot отдаёт старый снимок
+        из кэша, и пропуск остался бы незакрытым. None — ресинхронизации не было.
+        """
+        snapshot = await get_snapshot(max_age=0)
+        self._pending.clear()
+        if not snapshot or snapshot.fetched_at <= since:
+            return None
+        self.stats["resyncs"] += 1
+        self._notify(snapshot)
+        return snapshot
+
+    def _notify(self, snapshot):
+        if self.on_update is not None:
+            try:
+                self.on_update(snapshot)
+            except Exception as e:
+                logger.error(f"Stream update callback failed: {e!r}")
+
+    def _publish(self):
+        if not self._pending:
+            return
+        base = current_snapshot()
+        rates = dict(base.rates) if base is not None else {}
+        rates.update(self._pending)
+        self.stats["updates"] += len(self._pending)
+        self._pending = {}
+        self.stats["published"] += 1
+        self._notify(put_snapshot(rates))
+
+    async def _publisher(self):
+        while True:
+            await asyncio.sleep(self.apply_interval)
+            self._publish()
+
+    async def run(self):
+        backoff = 1.0
+        since = time.time()
+        while True:
+            publisher = None
+            try:
+                snapshot = await self._resync(since)
+                if not snapshot:
+                    raise ConnectionError("REST resync returned no fresh snapshot")
+                async with websockets.connect(self.url, ping_interval=20, ping_timeout=20) as ws:
+                    for message in subscribe_messages(snapshot.rates):
+                        await ws.send(message)
+                    self.connected = True
+                    backoff = 1.0
+                    logger.info(f"✅ Stream connected: {len(snapshot.rates)} contracts")
+                    publisher = asyncio.create_task(self._publisher())
+                    while True:
+                        # Тишина дольше stale_timeout считается разрывом
+                        raw = await asyncio.wait_for(ws.recv(), self.stale_timeout)
+                        self.stats["frames"] += 1
+                        self._pending.update(parse_frame(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stream disconnected: {e!r}. Reconnecting in {backoff:.0f}s")
+            finally:
+                self.connected = False
+                if publisher is not None:
+                    publisher.cancel()
+                    self._publish()
+            # Момент разрыва — после публикации хвоста: ресинхронизация должна быть новее
+            since = time.time()
+            self.stats["reconnects"] += 1
+            # Экспоненциальная задержка с джиттером, чтобы не штурмовать биржу
+            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            backoff = min(backoff * 2, self.max_backoff)
@@ -0,0 +1,83 @@
+from chat_settings import ChatRegistry, ChatSettings
+
+DEFAULTS = ChatSettings(True, -0.001, 0.001, ["BTC_USDT"])
+
+
+def matches(registry, rates, previous=None):
+    return sorted((chat_id, pair, side) for chat_id, pair, side, _, _ in registry.match_thresholds(rates, previous))
+
+
+def test_changed_rate_crossing():
+    registry = ChatRegistry(DEFAULTS)
+    registry.ensure(1)
+    assert matches(registry, {"BTC_USDT": 0.0002}) == []
+    assert matches(registry, {"BTC_USDT": 0.002}, {"BTC_USDT": 0.0002}) == [(1, "BTC_USDT", "short")]
+
+
+def test_lowered_threshold_crosses_without_rate_change():
+    registry = ChatRegistry(DEFAULTS)
+    registry.ensure(1)
+    rates = {"BTC_USDT": 0.0008}
+    assert matches(registry, rates) == []
+    registry.set_thresholds(1, short=0.0005)
+    assert matches(registry, rates, rates) == [(1, "BTC_USDT", "short")]
+    # Настройки не менялись и ставка та же — перепроверки нет
+    assert matches(registry, rates, rates) == []
+
+
+def test_added_pair_already_past_threshold():
+    registry = ChatRegistry(DEFAULTS)
+    registry.ensure(1)
+    rates = {"BTC_USDT": 0.0, "ETH_USDT": -0.003}
+    assert matches(registry, rates) == []
+    registry.add_pair(1, "ETH_USDT")
+    assert matches(registry, rates, rates) == [(1, "ETH_USDT", "long")]
+
+
+def test_touched_chat_does_not_duplicate_changed_pairs():
+    registry = ChatRegistry(DEFAULTS)
+    registry.ensure(1)
+    registry.ensure(2)
+    assert matches(registry, {"BTC_USDT": 0.002}, {"BTC_USDT": 0.0}) == [(1, "BTC_USDT", "short"),
+                                                                         (2, "BTC_USDT", "short")]
+
+
+def test_disabled_alerts_not_matched():
+    registry = ChatRegistry(DEFAULTS)
+    registry.set_alerts(1, False)
+    assert matches(registry, {"BTC_USDT": 0.002}) == []
+
+
+def test_unregistered_chat_is_not_subscribed():
+    registry = ChatRegistry(DEFAULTS)
+    settings = registry.get(5)
+    assert not settings.alerts_enabled
+    assert 5 not in registry
+    assert matches(registry, {"BTC_USDT": 0.002}) == []
+    assert registry.ensure(5).alerts_enabled
+
+
+def test_versions_unique_across_registries():
+    first = ChatRegistry(DEFAULTS)
+    first.ensure(1)
+    second = ChatRegistry.from_dict(first.to_dict(), DEFAULTS)
+    assert second.version(1) != first.version(1)
+    assert second.version(2) == 0
+
+
+def test_put_moves_chat_with_its_index_entries():
+    local = ChatRegistry(DEFAULTS)
+    since = local.mark()
+    local.set_thresholds(1, short=0.0005)
+    local.add_pair(1, "ETH_USDT")
+    assert local.changed_since(since) == [1]
+
+    remote = ChatRegistry.from_dict({"1": {"monitored_pairs": ["SOL_USDT"]}, "2": {}}, DEFAULTS)
+    remote.put(1, local.chats[1])
+    assert sorted(remote.chats[1].monitored_pairs) == ["BTC_USDT", "ETH_USDT"]
+    assert 1 not in remote.subscribers("SOL_USDT")
+    assert remote.subscribers("BTC_USDT") == {1, 2}
+    assert matches(remote, {"ETH_USDT": 0.0007}) == [(1, "ETH_USDT", "short")]
+    # Копия: дальнейшие правки в одном реестре не меняют другой
+    local.remove_pair(1, "ETH_USDT")
+    assert "ETH_USDT" in remote.chats[1].monitored_pairs
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import pytest
+
+import data_fetcher
+from benchmarks.fake_gateio import FakeGateRest, synthetic_tickers
+
+DELAY = 0.3
+CALLS = 8  # не больше HTTP_MAX_CONNECTIONS — иначе запросы честно ждут соединения
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    with FakeGateRest(synthetic_tickers(50), latency=DELAY) as fake:
+        monkeypatch.setattr(data_fetcher, "BASE_URL", fake.base_url)
+        yield fake
+
+
+def test_concurrent_fetches_are_not_serialized(gate):
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(data_fetcher.fetch_funding_rates() for _ in range(CALLS)))
+        elapsed = time.perf_counter() - started
+        await data_fetcher.close_client()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run())
+    assert gate.requests == CALLS
+    assert all(len(rates) == 50 for rates in results)
+    # Последовательно было бы CALLS * DELAY = 2.4 с
+    assert elapsed < 2 * DELAY
+
+
+def test_fetch_failure_returns_empty(monkeypatch):
+    monkeypatch.setattr(data_fetcher, "BASE_URL", "http://127.0.0.1:9")
+
+    async def run():
+        try:
+            return await data_fetcher.fetch_funding_rates(timeout=1)
+        finally:
+            await data_fetcher.close_client()
+
+    assert asyncio.run(run()) == {}
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+from telegram import Bot
+
+import metrics
+from benchmarks.fake_telegram import TOKEN, FakeTelegram
+from config import TG_CHAT_RATE, TG_GLOBAL_RATE
+from dispatcher import MESSAGE_LIMIT, MessageDispatcher
+
+
+class RecordingBot:
+    """Пропускает send_message в заглушку и запоминает время каждой попытки"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.calls = []  # (время, chat_id)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append((time.monotonic(), chat_id))
+        return await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+
+
+def run(fake, fill, timeout: float = 30):
+    async def main():
+        async with Bot(TOKEN, base_url=fake.base_url) as bot:
+            recorder = RecordingBot(bot)
+            dispatcher = MessageDispatcher(recorder)
+            dispatcher.start()
+            fill(dispatcher)
+            await dispatcher.stop(timeout=timeout)
+            return recorder, dispatcher
+
+    return asyncio.run(main())
+
+
+def digest(chat_id: int, parts: int):
+    # Каждая часть — свой блок строк с номером, длиной ровно под лимит сообщения
+    lines_per_part = MESSAGE_LIMIT // 100
+    return [f"{chat_id}:{part}:{line}".ljust(99, ".") for part in range(parts) for line in range(lines_per_part)]
+
+
+def test_rates_stay_within_limits():
+    with FakeTelegram(latency=0.005) as fake:
+        def fill(dispatcher):
+            for chat_id in range(1, 41):
+                dispatcher.enqueue(chat_id, f"alert {chat_id}")
+            for n in range(3):
+                dispatcher.enqueue(1000, f"burst {n}")
+
+        recorder, dispatcher = run(fake, fill)
+    assert dispatcher.stats["sent"] == 43 and dispatcher.stats["failed"] == 0
+    times = sorted(t for t, _ in recorder.calls)
+    # Не больше TG_GLOBAL_RATE попыток в любом окне в 1 секунду
+    assert max(sum(1 for u in times[i:] if u - t < 1.0) for i, t in enumerate(times)) <= TG_GLOBAL_RATE
+    burst = [t for t, chat_id in recorder.calls if chat_id == 1000]
+    assert all(b - a >= 1 / TG_CHAT_RATE - 0.01 for a, b in zip(burst, burst[1:]))
+
+
+def test_retry_after_is_honoured():
+    # Заглушка строже лимита бота: каждое второе сообщение в чат получает 429 retry_after=1
+    with FakeTelegram(latency=0.005, chat_rate=0.5) as fake:
+        recorder, dispatcher = run(fake, lambda d: [d.enqueue(7, f"m{n}") for n in range(3)])
+        rejected, delivered = fake.rejected, [text for _, text in fake.delivered]
+    assert rejected > 0
+    assert dispatcher.stats["retries"] == rejected
+    assert dispatcher.stats["sent"] == 3 and dispatcher.stats["failed"] == 0
+    assert delivered == ["m0", "m1", "m2"]
+    gaps = [b - a for (a, _), (b, _) in zip(recorder.calls, recorder.calls[1:])]
+    assert min(gaps) >= 1.0 - 0.01  # повтор — не раньше retry_after
+
+
+@pytest.mark.parametrize("chat_rate", [1.0, 0.5])
+def test_digest_parts_arrive_in_order(chat_rate):
+    with FakeTelegram(latency=0.005, chat_rate=chat_rate) as fake:
+        recorder, dispatcher = run(fake, lambda d: d.send_digest(42, digest(42, 3)))
+        texts = [text for chat_id, text in fake.delivered if chat_id == 42]
+    assert dispatcher.stats["sent"] == len(texts) >= 3
+    first_parts = [int(text.splitlines()[-1].split(":")[1]) for text in texts]
+    assert first_parts == sorted(first_parts)
+    assert "\n".join(texts).count("42:") == len(digest(42, 3))
+
+
+def test_throttled_group_does_not_delay_other_chats():
+    # Группа — TG_GROUP_RATE в минуту: её очередь ждёт секундами, личный чат ждать не должен
+    with FakeTelegram(latency=0.005) as fake:
+        def fill(dispatcher):
+            for n in range(9):
+                dispatcher.enqueue(-100, f"group {n}")
+            dispatcher.enqueue(5, "private")
+
+        started = time.monotonic()
+        recorder, dispatcher = run(fake, fill, timeout=1)
+    private = [t - started for t, chat_id in recorder.calls if chat_id == 5]
+    assert private and private[0] < 0.5
+    assert [chat_id for _, chat_id in recorder.calls].count(-100) == 1
+
+
+def test_queue_overflow_is_counted(caplog):
+    dispatcher = MessageDispatcher(max_queue=2)
+    before = metrics.snapshot()["telegram_dropped_total"]
+    assert dispatcher.enqueue(1, "a") and dispatcher.enqueue(2, "b")
+    with caplog.at_level("WARNING", logger="dispatcher"):
+        for _ in range(5):
+            assert not dispatcher.enqueue(3, "c")
+    assert dispatcher.stats["dropped"] == 5
+    assert metrics.snapshot()["telegram_dropped_total"] - before == 5
+    assert len([r for r in caplog.records if "queue full" in r.message]) == 1
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import pytest
+
+import data_fetcher
+from benchmarks.fake_gateio import synthetic_tickers
+from benchmarks.fake_venues import FakeVenue, binance_body, bybit_body, okx_body, venue_rates
+from exchanges import BinanceAdapter, BybitAdapter, OkxAdapter, SpreadTable, VenueBoard
+
+TIMEOUT = 0.5
+
+
+def run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await data_fetcher.close_client()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(scope="module")
+def tickers():
+    return synthetic_tickers(30)
+
+
+def test_symbol_normalization():
+    binance = BinanceAdapter("http://unused").symbols
+    assert binance.normalize({
+        "BTCUSDT": 0.0001,
+        "1000PEPEUSDT": 0.0002,    # множитель в тикере
+        "1000000MOGUSDT": 0.0003,
+        "BTCUSDT_260327": 0.0004,  # квартальный
+        "ETHUSDC": 0.0005,         # не USDT
+        "BTCPERP": 0.0006,
+    }) == {"BTC_USDT": 0.0001, "PEPE_USDT": 0.0002, "MOG_USDT": 0.0003}
+    okx = OkxAdapter("http://unused", instruments=[]).symbols
+    assert okx.normalize({
+        "BTC-USDT-SWAP": 0.0001,
+        "1000PEPE-USDT-SWAP": 0.0002,
+        "BTC-USD-SWAP": 0.0003,    # инверсный — сравнивается только с USD-котировкой
+        "BTC-USDT-260327": 0.0004,
+    }) == {"BTC_USDT": 0.0001, "PEPE_USDT": 0.0002, "BTC_USD": 0.0003}
+
+
+def test_adapters_parse_fake_venues(tickers):
+    rates = venue_rates(tickers, seed=1)
+    with FakeVenue(binance_body, rates) as binance, FakeVenue(bybit_body, rates) as bybit:
+        binance_rates = run(BinanceAdapter(binance.base_url).fetch())
+        bybit_rates = run(BybitAdapter(bybit.base_url).fetch())
+    expected = {f"{base}_USDT" for base, _ in rates}
+    assert set(binance_rates) == expected == set(bybit_rates)
+    # 1000C0USDT на бирже — C0_USDT с той же ставкой
+    assert binance_rates["C0_USDT"] == pytest.approx(rates[("C0", 1000)], abs=1e-8)
+    assert "BTC_USDT" not in binance_rates  # квартальный BTCUSDT_260327 отброшен
+
+
+def test_slow_venue_is_dropped_without_stalling_others(tickers):
+    with FakeVenue(binance_body, venue_rates(tickers, seed=1)) as binance, \
+            FakeVenue(bybit_body, venue_rates(tickers, seed=2), latency=5 * TIMEOUT) as bybit:
+        board = VenueBoard([BinanceAdapter(binance.base_url), BybitAdapter(bybit.base_url)], timeout=TIMEOUT)
+        started = time.perf_counter()
+        table = run(board.refresh())
+        elapsed = time.perf_counter() - started
+    assert elapsed < 2 * TIMEOUT
+    assert board.missing() == ["Bybit"]
+    assert board.stats["Bybit"]["timeouts"] == 1 and board.stats["Binance"]["ok"] == 1
+    assert len(board.rates["Binance"]) == len(tickers) + 10
+    assert len(table) == 0  # одна биржа — сравнивать не с чем
+
+
+def test_okx_tolerates_failing_instruments(tickers):
+    rates = venue_rates(tickers, seed=3)
+    instruments = ["C1-USDT-SWAP", "C2-USDT-SWAP", "C3-USDT-SWAP"]
+    with FakeVenue(okx_body, rates) as okx:
+        okx.failing = {"C2-USDT-SWAP"}
+        adapter = OkxAdapter(okx.base_url, instruments=instruments)
+        assert set(run(adapter.fetch())) == {"C1_USDT", "C3_USDT"}
+
+        okx.failing = set(instruments)
+        board = VenueBoard([adapter], timeout=TIMEOUT)
+        run(board.refresh())
+        assert board.missing() == ["OKX"] and board.stats["OKX"]["errors"] == 1
+
+
+def test_spread_table_legs():
+    table = SpreadTable({
+        "Gate": {"BTC_USDT": 0.0010, "ETH_USDT": 0.0002, "DOGE_USDT": 0.0001},
+        "Binance": {"BTC_USDT": -0.0005, "ETH_USDT": 0.0001, "SOL_USDT": 0.0100},
+        "OKX": {"BTC_USDT": 0.0003, "ETH_USDT": 0.0004},
+    })
+    # SOL и DOGE есть только на одной бирже — не сравниваются
+    assert table.contracts == ["BTC_USDT", "ETH_USDT"]
+    btc, eth = table.top()
+    assert (btc.low_venue, btc.low, btc.high_venue, btc.high) == ("Binance", -0.0005, "Gate", 0.0010)
+    assert btc.spread == pytest.approx(0.0015) and btc.venues == 3
+    assert (eth.low_venue, eth.high_venue) == ("Binance", "OKX")
+    assert table.get("SOL_USDT") is None
+    assert table.as_dict()["ETH_USDT"] == pytest.approx(0.0003)
+
+
+def test_spreads_compare_rates_over_the_same_period(tickers):
+    # Одинаковая ставка за 8 ч: на Binance выплата раз в 4 ч (вдвое меньше за выплату), на OKX — раз в час
+    with FakeVenue(binance_body, {("AAA", 1): 0.0004, ("BBB", 1): 0.0008}) as binance, \
+            FakeVenue(okx_body, {("AAA", 1): 0.0001, ("BBB", 1): 0.0001}) as okx:
+        binance.intervals = {("AAA", 1): 4}
+        okx.intervals = {("AAA", 1): 1}
+        board = VenueBoard([BinanceAdapter(binance.base_url),
+                            OkxAdapter(okx.base_url, instruments=["AAA-USDT-SWAP", "BBB-USDT-SWAP"])], timeout=TIMEOUT)
+        table = run(board.refresh())
+    assert board.adapters[0].intervals == {"AAA_USDT": 4.0}
+    assert board.adapters[1].intervals == {"AAA_USDT": 1.0, "BBB_USDT": 8.0}
+    aaa, bbb = table.get("AAA_USDT"), table.get("BBB_USDT")
+    assert aaa.spread == pytest.approx(0.0)  # 0.0004 * 8/4 == 0.0001 * 8/1
+    assert (aaa.low, aaa.high) == (pytest.approx(0.0008), pytest.approx(0.0008))
+    assert bbb.spread == pytest.approx(0.0007)  # оба — 8 ч, без пересчёта
+    # Без интервалов — как раньше, ставки за выплату
+    assert SpreadTable(board.rates).get("AAA_USDT").spread == pytest.approx(0.0003)
@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+
+from history_store import HistoryStore
+from shared import BackgroundWriter, FileChannel
+
+
+def test_reader_follows_writer_through_channel(tmp_path):
+    channel = FileChannel(str(tmp_path / "history"))
+    writer = HistoryStore(channel).load()
+    now = int(time.time())
+    writer.append_snapshot({"BTC_USDT": 0.0001, "ETH_USDT": -0.0002}, now - 180)
+
+    reader = HistoryStore(channel, read_only=True).load()
+    assert "BTC_USDT" in reader and "ETH_USDT" in reader
+
+    # Новый контракт воркера: имя дописывается раньше записей, читатель подхватывает оба
+    writer.append_snapshot({"BTC_USDT": 0.0003, "SOL_USDT": 0.0005}, now - 90)
+    assert reader.refresh() == 2
+    ts, rates = reader.last("BTC_USDT", 10)
+    assert ts.tolist() == [now - 180, now - 90]
+    assert rates.tolist() == [0.0001, 0.0003]
+    assert reader.last("SOL_USDT", 10)[1].tolist() == [0.0005]
+    assert reader.refresh() == 0
+
+
+def test_restart_restores_and_prunes(tmp_path):
+    channel = FileChannel(str(tmp_path))
+    store = HistoryStore(channel, retention_days=1).load()
+    now = int(time.time())
+    store.append_snapshot({"BTC_USDT": 0.0001}, now - 3 * 86400)
+    store.append_snapshot({"BTC_USDT": 0.0002}, now)
+    store.close()
+
+    restored = HistoryStore(channel, retention_days=1).load()
+    ts, rates = restored.range("BTC_USDT")
+    assert ts.tolist() == [now] and rates.tolist() == [0.0002]
+    assert len([name for name in channel.keys() if name.endswith(".seg")]) == 1
+
+
+def test_background_writer_keeps_order_and_latest_put(tmp_path):
+    channel = FileChannel(str(tmp_path))
+    writer = BackgroundWriter(channel)
+    history = writer.sub("history")
+    for i in range(50):
+        history.append("day.seg", np.array([i], dtype=np.uint32).tobytes())
+        writer.put("snapshot.json", str(i).encode())
+    writer.close()
+    assert np.frombuffer(channel.sub("history").read("day.seg"), dtype=np.uint32).tolist() == list(range(50))
+    assert channel.get("snapshot.json") == b"49"
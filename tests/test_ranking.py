@@ -0,0 +1,23 @@
+from data_fetcher import SnapshotCache
+from ranking import RankedView, ranked_view
+
+
+def fetch():
+    raise AssertionError("не используется")
+
+
+def test_change_is_against_previous_cycle_not_previous_view():
+    cache = SnapshotCache(fetch, ttl=30)
+    ranked_view(cache.put({"A_USDT": 0.0001, "B_USDT": 0.0001}, fetched_at=1))
+    cache.put({"A_USDT": 0.0030, "B_USDT": 0.0001}, fetched_at=2)  # цикл, который никто не смотрел
+    view = ranked_view(cache.put({"A_USDT": 0.0030, "B_USDT": 0.0005}, fetched_at=3))
+    # За последний цикл сдвинулась только B; A — к снимку 2, а не к последнему просмотру
+    assert view.top("change", 1) == [("B_USDT", 0.0005)]
+    assert dict(zip(view.contracts, view.change()))["A_USDT"] == 0
+
+
+def test_page_orders():
+    view = RankedView({"A_USDT": -0.003, "B_USDT": 0.001, "C_USDT": 0.002})
+    assert [c for c, _ in view.top("abs")] == ["A_USDT", "C_USDT", "B_USDT"]
+    assert [c for c, _ in view.top("neg", 1)] == ["A_USDT"]
+    assert view.page("pos", 1, 1) == [("B_USDT", 0.001)]
@@ -0,0 +1,54 @@
+import time
+from datetime import datetime, timezone
+
+from rollups import Rollup, RollupStore, period_bounds
+from shared import FileChannel
+
+
+def store_with_days(tmp_path, closed: int) -> RollupStore:
+    """closed закрытых суток и текущие, по одной точке BTC_USDT в каждых"""
+    store = RollupStore(FileChannel(str(tmp_path)))
+    store.current = Rollup(*period_bounds(time.time() - closed * 86400))
+    for day in range(closed + 1):
+        store.update({"BTC_USDT": 0.0001 * (day + 1)}, store.current.start + 60)
+        if day < closed:
+            store.roll(store.current.end)
+    return store
+
+
+def days_covered(summary) -> int:
+    return summary.rows(["BTC_USDT"])[0].count
+
+
+def test_report_days_include_current_day(tmp_path):
+    store = store_with_days(tmp_path, closed=5)
+    # /report N: текущие сутки + N - 1 закрытых — ровно N дней, как в заголовке
+    assert days_covered(store.summary(3, include_current=True)) == 3
+    assert days_covered(store.summary(1, include_current=True)) == 1
+    assert days_covered(store.summary(0, include_current=True)) == 1
+    assert days_covered(store.summary(6, include_current=True)) == 6
+    # Больше, чем есть на диске, — всё, что есть
+    assert days_covered(store.summary(30, include_current=True)) == 6
+
+
+def test_summary_of_closed_days(tmp_path):
+    store = store_with_days(tmp_path, closed=5)
+    summary = store.summary(3)
+    assert days_covered(summary) == 3
+    assert summary.rows(["BTC_USDT"])[0].max == 0.0005
+    assert store.summary(0) is None
+
+
+def test_days_survive_restart_through_channel(tmp_path):
+    store = store_with_days(tmp_path, closed=2)
+    channel = store.channel
+    store.roll(store.current.end)
+    store.checkpoint()
+    # Новый процесс (другой dyno): закрытые дни и незакрытые сутки — из канала
+    restored = RollupStore(channel).load()
+    assert days_covered(restored.summary(1)) == 1
+    assert restored.current.start == store.current.start
+
+    pruned = RollupStore(channel, retention_days=0)
+    pruned._prune(datetime.fromtimestamp(store.current.start, timezone.utc))
+    assert pruned._days() == []
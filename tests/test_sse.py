@@ -0,0 +1,39 @@
+import time
+
+from alert_engine import Trigger
+from config import SSE_MAX_CLIENTS, WEB_CONNECTIONS
+from data_fetcher import FundingSnapshot
+from funding_api import FundingAPI, publish_snapshot
+from shared import FileChannel
+from sse import EventHub
+
+
+def test_client_cap_leaves_room_for_other_requests():
+    assert SSE_MAX_CLIENTS < WEB_CONNECTIONS
+    hub = EventHub(api=None, max_clients=2)
+    assert hub.acquire() and hub.acquire()
+    assert not hub.acquire()
+    hub.release()
+    assert hub.acquire()
+    assert hub.stats["rejected"] == 1
+
+
+def test_events_come_from_worker_channel(tmp_path):
+    channel = FileChannel(str(tmp_path))
+    hub = EventHub(FundingAPI(channel))
+    assert not hub.poll()
+
+    now = time.time()
+    publish_snapshot(FundingSnapshot({"BTC_USDT": 0.0001, "ETH_USDT": 0.0002}, now), channel)
+    assert hub.poll()
+    frames = hub.stream()
+    next(frames)  # retry:
+    assert b"event: snapshot" in next(frames)
+
+    trigger = Trigger("BTC_USDT", "change", 0.0009, 0.0001)
+    publish_snapshot(FundingSnapshot({"BTC_USDT": 0.0009, "ETH_USDT": 0.0002}, now + 1), channel, alerts=[trigger])
+    assert hub.poll()
+    delta = next(frames)
+    assert b"event: delta" in delta
+    assert b'"BTC_USDT":0.0009' in delta and b"ETH_USDT" not in delta
+    assert b'["BTC_USDT","change",0.0009,0.0001]' in delta
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+from shared import FileChannel
+from storage import ChannelBackend, PersistenceEngine
+
+REMOTE = {"chats": {"7": {"alerts_enabled": True}}, "alert_state": []}
+
+
+class Remote:
+    """Удалённый бэкенд в памяти (как gist, но без сети)"""
+
+    name = "remote"
+    remote = True
+
+    def __init__(self, data):
+        self.data = data
+        self.saved = []
+
+    def load(self):
+        return self.data
+
+    def save(self, blob: str):
+        self.saved.append(json.loads(blob))
+
+
+def test_reconcile_with_state_cache_in_channel(tmp_path):
+    cache = ChannelBackend(FileChannel(str(tmp_path)), "state.json")
+    cache.save(json.dumps({"synced": True, "data": {"chats": {}}}))
+    engine = PersistenceEngine(Remote(REMOTE), lambda: REMOTE, cache=cache)
+    assert engine.load_cached() == {"chats": {}}
+
+    applied = []
+    assert asyncio.run(engine.reconcile(applied.append))
+    assert applied == [REMOTE]
+    assert cache.load() == {"synced": True, "data": REMOTE}
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    # Файловые хранилища бота (состояние, сводки, общий канал) — во временном каталоге
+    monkeypatch.chdir(tmp_path)
+    import bot
+
+    monkeypatch.setattr(bot, "registry", bot.load_registry({"chats": {}}))
+    return bot
+
+
+def test_apply_state_keeps_chats_changed_during_reconcile(bot):
+    since = bot.registry.mark()
+    bot.registry.set_thresholds(42, long=-0.002)  # пользователь меняет порог, пока идёт сверка
+    remote = {
+        "chats": {"42": {"critical_fr_long": -0.005, "monitored_pairs": ["XRP_USDT"]},
+                  "7": {"monitored_pairs": ["SOL_USDT"]}},
+        "alert_state": [[7, "SOL_USDT", "short", "fired", 100.0]],
+    }
+    bot.apply_state(remote, since)
+    assert bot.registry.get(42).critical_fr_long == -0.002
+    assert 42 not in bot.registry.subscribers("XRP_USDT")
+    assert bot.registry.get(7).monitored_pairs == {"SOL_USDT"}
+    assert bot.alert_states.state((7, "SOL_USDT", "short")) == "fired"
+    assert bot.persistence.dirty
+
+    # Без изменений за время сверки побеждает бэкенд
+    bot.apply_state(remote, bot.registry.mark())
+    assert bot.registry.get(42).critical_fr_long == -0.005
+
+
+class Flaky(Remote):
+    """Бэкенд, недоступный первые failures загрузок"""
+
+    def __init__(self, data, failures: int):
+        super().__init__(data)
+        self.failures = failures
+
+    def load(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("gist unavailable")
+        return super().load()
+
+
+def test_saving_waits_until_backend_is_loaded(tmp_path):
+    # Нет локальной копии, бэкенд недоступен: состояние по умолчанию не должно затереть бэкенд
+    backend = Flaky(REMOTE, failures=2)
+    engine = PersistenceEngine(backend, lambda: {"chats": {}}, cache=ChannelBackend(FileChannel(str(tmp_path)), "s"),
+                               retry_delay=0.01)
+    assert engine.load_cached() is None and not engine.loaded
+
+    async def main():
+        applied = []
+        reconcile = asyncio.create_task(engine.reconcile(applied.append))
+        await asyncio.sleep(0)
+        engine.mark_dirty()
+        assert not await engine.flush()
+        assert backend.saved == [] and engine.dirty
+        await reconcile
+        return applied
+
+    assert asyncio.run(main()) == [REMOTE]
+    assert engine.loaded and backend.failures == 0
+    assert asyncio.run(engine.flush())
+    assert backend.saved == [{"chats": {}}]
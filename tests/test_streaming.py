@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+import data_fetcher
+from benchmarks.fake_gateio import FakeGateRest, FakeGateWs, load_frames, synthetic_tickers
+from streaming import TickerStream, parse_frame
+
+# Кадры в формате канала futures.tickers (подтверждение подписки, update, pong)
+FRAMES = load_frames(os.path.join(os.path.dirname(__file__), "fixtures", "gateio_futures_tickers.jsonl"))
+CONTRACTS = sorted({item["contract"] for frame in FRAMES if frame["event"] == "update" for item in frame["result"]})
+
+
+def rest_tickers():
+    return [dict(item, contract=contract, funding_rate="0.000000")
+            for item, contract in zip(synthetic_tickers(len(CONTRACTS)), CONTRACTS)]
+
+
+def expected_rates():
+    rates = {contract: 0.0 for contract in CONTRACTS}
+    for frame in FRAMES:
+        rates.update(parse_frame(frame_bytes(frame)))
+    return rates
+
+
+def frame_bytes(frame) -> bytes:
+    return json.dumps(frame).encode()
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = data_fetcher.SnapshotCache(data_fetcher._request_tickers, ttl=30)
+    monkeypatch.setattr(data_fetcher, "_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def rest(monkeypatch):
+    with FakeGateRest(rest_tickers()) as fake:
+        monkeypatch.setattr(data_fetcher, "BASE_URL", fake.base_url)
+        yield fake
+
+
+def test_parse_recorded_frames():
+    updates = [parse_frame(frame_bytes(frame)) for frame in FRAMES]
+    assert updates[0] == {}  # подтверждение подписки
+    assert sum(1 for u in updates if not u) == 2  # + futures.pong
+    assert all(isinstance(rate, float) for u in updates for rate in u.values())
+
+
+async def replay(ws_frames, drop_after=None):
+    published = []
+    async with FakeGateWs(ws_frames, interval=0.005, drop_after=drop_after) as ws:
+        stream = TickerStream(on_update=published.append, url=ws.url, apply_interval=0.05, stale_timeout=5,
+                              max_backoff=1)
+        stream.start()
+        deadline = time.monotonic() + 15
+        while len(ws.sent_at) < len(ws_frames) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.2)
+        await stream.stop()
+        await data_fetcher.close_client()
+    return stream, ws, published
+
+
+@pytest.mark.parametrize("drop_after", [None, len(FRAMES) // 2])
+def test_replay_builds_snapshot(cache, rest, drop_after):
+    stream, ws, published = asyncio.run(replay(FRAMES, drop_after))
+    assert cache.snapshot.rates == expected_rates()
+    assert published and published[-1].rates == cache.snapshot.rates
+    connections = 1 if drop_after is None else 2
+    assert ws.connections == connections
+    assert stream.stats["resyncs"] == rest.requests == connections
+
+
+def test_resync_rejects_stale_cached_snapshot(cache, monkeypatch):
+    # REST недоступен, в кэше — снимок до разрыва: get_snapshot отдаёт его, но пропуск не закрыт
+    cache.put({"BTC_USDT": 0.0001}, fetched_at=time.time() - 60)
+    monkeypatch.setattr(data_fetcher, "BASE_URL", "http://127.0.0.1:9")
+    published = []
+    stream = TickerStream(on_update=published.append)
+
+    async def run():
+        try:
+            return await stream._resync(since=time.time() - 1)
+        finally:
+            await data_fetcher.close_client()
+
+    assert asyncio.run(run()) is None
+    assert stream.stats["resyncs"] == 0 and not published
+
+
+def test_resync_rejects_open_breaker(cache, rest):
+    cache.put({"BTC_USDT": 0.0001}, fetched_at=time.time() - 60)
+    cache.breaker.failures = cache.breaker.threshold
+    cache.breaker.retry_at = time.time() + 60
+    stream = TickerStream()
+    assert asyncio.run(stream._resync(since=time.time() - 1)) is None
+    assert rest.requests == 0
@@ -0,0 +1,41 @@
+import json
+import math
+
+import pytest
+
+import ticker_parser
+from ticker_parser import ContractIndex, parse_tickers
+
+TICKERS = [
+    {"contract": "BTC_USDT", "funding_rate": "0.0001", "funding_rate_indicative": "0.00012", "mark_price": "67000.5",
+     "volume_24h_quote": "123456789", "funding_next_apply": 1718006400, "last": "67001"},
+    {"contract": "ETH_USDT", "funding_rate": "-0.0002", "funding_rate_indicative": "", "mark_price": "3500",
+     "volume_24h_quote": "987654", "funding_next_apply": 1718006400},
+    {"contract": "NEW_USDT", "funding_rate": "0.0003"},  # неполный тикер
+    {"contract": "BROKEN_USDT", "funding_rate": None},  # без ставки — пропускается
+]
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def parser(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(ticker_parser, "orjson", None)
+    elif ticker_parser.orjson is None:
+        pytest.skip("orjson не установлен")
+
+
+def test_columns(parser):
+    table = parse_tickers(json.dumps(TICKERS).encode())
+    assert table.rates() == {"BTC_USDT": 0.0001, "ETH_USDT": -0.0002, "NEW_USDT": 0.0003}
+    assert table.mark_price[0] == 67000.5 and table.volume[1] == 987654
+    assert math.isnan(table.funding_rate_indicative[1]) and math.isnan(table.mark_price[2])
+    assert table.next_apply.tolist() == [1718006400, 1718006400, 0]
+
+
+def test_index_is_stable_between_snapshots(parser):
+    index = ContractIndex()
+    first = parse_tickers(json.dumps(TICKERS[:2]), index)
+    second = parse_tickers(json.dumps(TICKERS[::-1]), index)
+    assert first.ids.tolist() == [0, 1]
+    assert second.contracts == ["NEW_USDT", "ETH_USDT", "BTC_USDT"]
+    assert second.ids.tolist() == [2, 1, 0]
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import metrics
+import webapp
+from data_fetcher import FundingSnapshot
+from funding_api import FundingAPI, publish_snapshot
+from history_store import HistoryStore
+from shared import FileChannel
+
+
+@pytest.fixture
+def channel(tmp_path, monkeypatch):
+    channel = FileChannel(str(tmp_path / "shared"))
+    monkeypatch.setattr(webapp, "channel", channel)
+    return channel
+
+
+@pytest.fixture
+def client():
+    return webapp.app.test_client()
+
+
+def publish_metrics(channel, last_cycle: float):
+    metrics.set_gauge("last_cycle_timestamp", last_cycle)
+    channel.put(metrics.METRICS_KEY, metrics.encode())
+
+
+def test_health_without_worker_metrics(channel, client):
+    # Воркер в другом дайно ещё ничего не опубликовал — веб-процесс при этом здоров
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json["status"] == "ok"
+    assert response.json["worker"]["status"] == "unknown"
+    assert client.get("/health/worker").status_code == 200
+    assert client.get("/metrics").status_code == 503
+
+
+def test_health_reports_worker_state(channel, client):
+    publish_metrics(channel, time.time())
+    assert client.get("/health").json["worker"]["status"] == "ok"
+    assert client.get("/health/worker").status_code == 200
+    body = client.get("/metrics").get_data(as_text=True)
+    assert "frate4bot_last_cycle_timestamp" in body
+
+    publish_metrics(channel, time.time() - 2 * webapp.HEALTH_MAX_AGE)
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json["worker"]["status"] == "stale"
+    assert client.get("/health/worker").status_code == 503
+
+
+def test_metrics_publisher_writes_to_channel(tmp_path):
+    channel = FileChannel(str(tmp_path))
+    publisher = metrics.MetricsPublisher(channel, collect=lambda: metrics.set_gauge("telegram_queue_depth", 7))
+
+    async def run():
+        publisher.start()
+        await asyncio.sleep(0.05)
+        await publisher.stop()
+
+    asyncio.run(run())
+    data = json.loads(channel.get(metrics.METRICS_KEY))
+    assert data["telegram_queue_depth"] == 7
+    assert metrics.read_published(channel)["published_timestamp"] > 0
+
+
+def test_funding_api_reads_snapshot_and_lazy_history(channel, client, monkeypatch):
+    now = int(time.time())
+    writer = HistoryStore(channel.sub("history"))
+    writer.append_snapshot({"BTC_USDT": 0.0001, "ETH_USDT": -0.0003}, now - 90)
+    publish_snapshot(FundingSnapshot({"BTC_USDT": 0.0002, "ETH_USDT": -0.0003}, now), channel)
+
+    store = HistoryStore(channel.sub("history"), read_only=True)
+    monkeypatch.setattr(webapp, "funding_api", FundingAPI(channel, store=store))
+    response = client.get("/api/funding?sort=abs")
+    assert response.status_code == 200
+    assert [item["contract"] for item in response.json["items"]] == ["ETH_USDT", "BTC_USDT"]
+    assert len(store) == 0  # история не читается, пока её не запросили
+
+    history = client.get("/api/funding/btc_usdt/history")
+    assert history.json["points"] == [[now - 90, 0.0001]]
+
+    # Новые записи воркера подхватываются со следующим снимком
+    writer.append_snapshot({"BTC_USDT": 0.0002}, now)
+    publish_snapshot(FundingSnapshot({"BTC_USDT": 0.0002, "ETH_USDT": -0.0003}, now + 1), channel)
+    history = client.get("/api/funding/BTC_USDT/history")
+    assert history.json["points"] == [[now - 90, 0.0001], [now, 0.0002]]
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-5"])
+def test_funding_rejects_bad_limit(channel, client, monkeypatch, query):
+    publish_snapshot(FundingSnapshot({"BTC_USDT": 0.0002, "ETH_USDT": -0.0003}, time.time()), channel)
+    monkeypatch.setattr(webapp, "funding_api", FundingAPI(channel))
+    response = client.get(f"/api/funding?{query}")
+    assert response.status_code == 400 and "limit" in response.json["error"]
+    assert len(client.get("/api/funding?limit=1").json["items"]) == 1
+
+
+@pytest.mark.parametrize("query", ["points=0", "points=-3"])
+def test_history_rejects_bad_points(channel, client, monkeypatch, query):
+    now = int(time.time())
+    writer = HistoryStore(channel.sub("history"))
+    for t in range(5):
+        writer.append_snapshot({"BTC_USDT": 0.0001 * t}, now - (5 - t) * 90)
+    publish_snapshot(FundingSnapshot({"BTC_USDT": 0.0004}, now), channel)
+    monkeypatch.setattr(webapp, "funding_api",
+                        FundingAPI(channel, store=HistoryStore(channel.sub("history"), read_only=True)))
+    response = client.get(f"/api/funding/BTC_USDT/history?{query}")
+    assert response.status_code == 400 and "points" in response.json["error"]
+    assert len(client.get("/api/funding/BTC_USDT/history?points=2").json["points"]) == 2
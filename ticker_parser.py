@@ -0,0 +1,117 @@
+import json
+from operator import itemgetter
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него — stdlib json
+    orjson = None
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+def dumps(data) -> bytes:
+    """Компактный JSON в байтах (orjson пишет NaN как null)"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+# Поля тикера, которые попадают в TickerTable (остальные ~20 полей ответа отбрасываются)
+_KEYS = ("contract", "funding_rate", "funding_rate_indicative", "mark_price", "volume_24h_quote", "funding_next_apply")
+_FLOAT_FIELDS = _KEYS[1:5]
+
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ContractIndex:
+    """Постоянная таблица интернирования «контракт -> индекс» между снимками"""
+
+    __slots__ = ("names", "index")
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, contract: str) -> int:
+        idx = self.index.get(contract)
+        if idx is None:
+            idx = self.index[contract] = len(self.names)
+            self.names.append(contract)
+        return idx
+
+
+class TickerTable:
+    """Колоночный снимок тикеров: только нужные поля в типизированных массивах"""
+
+    __slots__ = ("index", "ids", "funding_rate", "funding_rate_indicative", "mark_price", "volume", "next_apply")
+
+    def __init__(self, index: ContractIndex, ids, columns: dict):
+        self.index = index
+        self.ids = ids
+        self.funding_rate = columns["funding_rate"]
+        self.funding_rate_indicative = columns["funding_rate_indicative"]
+        self.mark_price = columns["mark_price"]
+        self.volume = columns["volume_24h_quote"]
+        self.next_apply = columns["funding_next_apply"]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def contracts(self):
+        names = self.index.names
+        return [names[i] for i in self.ids.tolist()]
+
+    def rates(self) -> dict:
+        """{контракт: funding_rate} — формат, с которым работает остальной код"""
+        return dict(zip(self.contracts, self.funding_rate.tolist()))
+
+
+_FIELDS = itemgetter(*_KEYS)
+
+
+def _rows(raw):
+    # Полный разбор + выборка полей: orjson.loads быстрее любой выборочной проекции на Python
+    items = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    try:
+        return list(map(_FIELDS, items))
+    except KeyError:
+        # Неполные тикеры (редкость) — медленный путь с пропусками
+        return [tuple(item.get(key) for key in _KEYS) for item in items]
+
+
+def _column(values, dtype=np.float64):
+    fast, safe = (float, _float) if dtype is np.float64 else (int, _int)
+    try:
+        return np.fromiter(map(fast, values), dtype=dtype, count=len(values))
+    except (TypeError, ValueError):
+        # Пустые строки/None в отдельных тикерах: NaN (для времени — 0)
+        return np.fromiter(map(safe, values), dtype=dtype, count=len(values))
+
+
+def parse_tickers(raw, index: ContractIndex = None) -> TickerTable:
+    """Разбирает ответ /futures/usdt/tickers (bytes или str) в TickerTable"""
+    index = index if index is not None else ContractIndex()
+    rows = [row for row in _rows(raw) if row[0] is not None and row[1] is not None]
+    contracts, *values = zip(*rows) if rows else ((),) * len(_KEYS)
+    intern = index.intern
+    ids = np.fromiter(map(intern, contracts), dtype=np.int32, count=len(contracts))
+    columns = {field: _column(column) for field, column in zip(_FLOAT_FIELDS, values)}
+    columns["funding_next_apply"] = _column(values[-1], np.int64)
+    return TickerTable(index, ids, columns)
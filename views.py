@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from telegram.error import BadRequest
+from config import VIEW_CACHE_SIZE, VIEW_MESSAGES, EDIT_DEBOUNCE
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCache:
+    """Готовые экраны (текст, клавиатура) по ключу «экран + версии состояния».
+
+    В ключ входят версии всего, что попадает на экран (настройки чата,
+    снимок, аналитика), поэтому сбрасывать кэш не нужно: экран старой
+    версии больше не запрашивается и вытесняется по LRU.
+    """
+
+    def __init__(self, size: int = VIEW_CACHE_SIZE):
+        self.size = size
+        self._cache = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, key, render):
+        """Экран из кэша; render() вызывается только при промахе"""
+        view = self._cache.get(key)
+        if view is not None:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return view
+        self.stats["misses"] += 1
+        view = self._cache[key] = render()
+        if len(self._cache) > self.size:
+            self._cache.popitem(last=False)
+        return view
+
+
+class MessageViews:
+    """Что показано в каждом сообщении бота: правки без изменений не отправляются.
+
+    Частые нажатия (➕/➖ порогов) откладываются на delay: вся серия —
+    одна правка с последним состоянием.
+    """
+
+    def __init__(self, size: int = VIEW_MESSAGES, delay: float = EDIT_DEBOUNCE):
+        self.size = size
+        self.delay = delay
+        self._shown = OrderedDict()  # (chat_id, message_id) -> экран
+        self._pending = {}           # (chat_id, message_id) -> отложенная правка
+        self.stats = {"edits": 0, "skipped": 0, "deferred": 0}
+
+    def _remember(self, key, view):
+        self._shown[key] = view
+        self._shown.move_to_end(key)
+        if len(self._shown) > self.size:
+            self._shown.popitem(last=False)
+
+    async def reply(self, message, view):
+        """Новое сообщение с экраном"""
+        text, reply_markup = view
+        sent = await message.reply_text(text, reply_markup=reply_markup)
+        self._remember((sent.chat_id, sent.message_id), view)
+        return sent
+
+    async def edit(self, query, view) -> bool:
+        """Правка сообщения кнопки; False — на экране уже то же самое"""
+        key = (query.message.chat_id, query.message.message_id)
+        if self._shown.get(key) == view:
+            self.stats["skipped"] += 1
+            return False
+        text, reply_markup = view
+        try:
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        except BadRequest as e:
+            # Экран мог быть показан до рестарта — Telegram отвечает ошибкой, но состояние то же
+            if "not modified" not in str(e).lower():
+                raise
+            self.stats["skipped"] += 1
+        else:
+            self.stats["edits"] += 1
+        self._remember(key, view)
+        return True
+
+    def defer(self, query, render):
+        """Отложенная правка: нажатия в течение delay сливаются, экран — render() на момент правки"""
+        key = (query.message.chat_id, query.message.message_id)
+        self.stats["deferred"] += 1
+        if key not in self._pending:
+            self._pending[key] = asyncio.create_task(self._edit_later(key, query, render))
+
+    async def _edit_later(self, key, query, render):
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            # Нажатие во время самой правки запланирует следующую
+            self._pending.pop(key, None)
+        try:
+            await self.edit(query, render())
+        except Exception as e:
+            logger.error(f"Failed to update message {key}: {e}")
+
+    async def flush(self):
+        """Дождаться отложенных правок (остановка бота)"""
+        await asyncio.gather(*self._pending.values(), return_exceptions=True)
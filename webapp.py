@@ -1,10 +1,122 @@
-from flask import Flask, jsonify
+import time
+
+from flask import Flask, Response, jsonify, request
+from config import HEALTH_MAX_AGE
+from metrics import read_published, render_prometheus
+from funding_api import FundingAPI
+from history_store import HistoryStore
+from shared import make_channel
+from sse import EventHub
 
 app = Flask(__name__)
+started_at = time.time()
+
+# Метрики, снимок и история воркера — из общего канала (на Heroku воркер в другом дайно);
+# Gate.io из веб-процесса не запрашивается, история читается при первом запросе к ней
+channel = make_channel()
+funding_api = FundingAPI(channel, store=HistoryStore(channel.sub("history"), read_only=True))
+# Live-поток: один опрос снимка на процесс, клиенты — гринлеты (gunicorn -k gevent)
+event_hub = EventHub(funding_api)
+
+def worker_status() -> dict:
+    """Состояние воркера по опубликованным метрикам: ok | stale | unknown"""
+    data = read_published(channel)
+    if data is None:
+        return {"status": "unknown", "detail": "worker metrics not published"}
+    now = time.time()
+    last_cycle = data.get("last_cycle_timestamp") or 0
+    cycle_age = now - last_cycle if last_cycle else None
+    healthy = cycle_age is not None and cycle_age <= HEALTH_MAX_AGE
+    return {
+        "status": "ok" if healthy else "stale",
+        "last_cycle_age": round(cycle_age, 1) if cycle_age is not None else None,
+        "metrics_age": round(now - data.get("published_timestamp", 0), 1),
+        "max_age": HEALTH_MAX_AGE
+    }
 
 @app.route('/health')
 def health():
-    return jsonify({"status": "ok"}), 200
+    # Проверка самого веб-процесса; воркер — справочно, на код ответа не влияет
+    return jsonify({
+        "status": "ok",
+        "uptime": round(time.time() - started_at, 1),
+        "worker": worker_status()
+    })
+
+@app.route('/health/worker')
+def health_worker():
+    # Для алертинга по воркеру: 503 — только если он точно отстал, неизвестное состояние — 200
+    status = worker_status()
+    return jsonify(status), 503 if status["status"] == "stale" else 200
+
+@app.route('/metrics')
+def prometheus_metrics():
+    data = read_published(channel)
+    if data is None:
+        return Response("# worker metrics not published\n", status=503, mimetype="text/plain")
+    return Response(render_prometheus(data), mimetype="text/plain; version=0.0.4")
+
+# ======================
+# JSON API
+# ======================
+
+def cached_response(cached):
+    # Один и тот же снимок -> тот же ETag: повторный запрос клиента получает 304
+    response = Response(cached.body, mimetype="application/json")
+    response.set_etag(cached.etag)
+    response.last_modified = cached.last_modified
+    response.cache_control.public = True
+    response.cache_control.no_cache = True  # можно хранить, но перед использованием — revalidate
+    return response.make_conditional(request)
+
+@app.route('/api/funding')
+def api_funding():
+    args = request.args
+    try:
+        cached = funding_api.funding(
+            sort=args.get("sort", "abs"),
+            limit=args.get("limit", type=int),
+            offset=args.get("offset", 0, type=int),
+            contracts=[c for c in args.get("contracts", "").split(",") if c],
+            q=args.get("q"),
+            min_rate=args.get("min", type=float),
+            max_rate=args.get("max", type=float)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if cached is None:
+        return jsonify({"error": "snapshot not published yet"}), 503
+    return cached_response(cached)
+
+@app.route('/api/funding/<contract>/history')
+def api_funding_history(contract):
+    args = request.args
+    try:
+        cached = funding_api.history(
+            contract,
+            start=args.get("start", type=float),
+            end=args.get("end", type=float),
+            hours=args.get("hours", type=float),
+            points=args.get("points", type=int)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if cached is None:
+        return jsonify({"error": f"no history for {contract.upper()}"}), 404
+    return cached_response(cached)
+
+@app.route('/api/stream')
+def api_stream():
+    if not event_hub.acquire():
+        return jsonify({"error": "too many live connections"}), 503
+    event_hub.start()
+    # EventSource при переподключении сам присылает Last-Event-ID
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("lastEventId")
+    response = Response(event_hub.stream(last_event_id), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    response.call_on_close(event_hub.release)
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)